@@ -0,0 +1,51 @@
+"""Micro-benchmark of `ratelimit` decorator per-request overhead.
+
+Run with `python -m benchmarks.decorator`.
+"""
+
+import os
+import timeit
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_app.settings")
+django.setup()
+
+from django.http import HttpRequest, HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from limits.storage import MemoryStorage  # noqa: E402
+
+from django_ratelimiter import ratelimit  # noqa: E402
+
+NUMBER = 100_000
+LIMIT = f"{NUMBER * 10}/hour"
+
+
+def view(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+def main() -> None:
+    request = RequestFactory().get("/")
+    request.user = "user"  # type: ignore[assignment]
+    views = {
+        "static rate": ratelimit(LIMIT, storage=MemoryStorage())(view),
+        "callable rate": ratelimit(lambda _: LIMIT, storage=MemoryStorage())(view),
+        "key": ratelimit(LIMIT, key="user", storage=MemoryStorage())(view),
+        "methods": ratelimit(LIMIT, methods=["GET"], storage=MemoryStorage())(view),
+        "not limited method": ratelimit(
+            LIMIT, methods=["POST"], storage=MemoryStorage()
+        )(view),
+    }
+    baseline = min(timeit.repeat(lambda: view(request), number=NUMBER, repeat=5))
+    print(f"{'undecorated':<20} {baseline / NUMBER * 1e6:8.2f} us/request")
+    for name, decorated in views.items():
+        elapsed = min(
+            timeit.repeat(lambda: decorated(request), number=NUMBER, repeat=5)
+        )
+        overhead = (elapsed - baseline) / NUMBER * 1e6
+        print(f"{name:<20} {overhead:8.2f} us/request overhead")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Benchmarks of rate limiting hot paths for every strategy and storage available locally.
+
+Each scenario reports per-hit latency percentiles, backend calls per hit
+(cache round trips for `CacheStorage`, storage calls otherwise),
+peak memory allocated per hit and throughput of concurrent threads.
+
+Run with `python -m benchmarks.hot_paths`, store a baseline with `--save benchmarks/baseline.json`
+and compare with it with `--compare benchmarks/baseline.json`, exits with status 1 on regressions.
+Only backend calls and allocations are compared, latency and throughput depend on the machine.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+import django
+import freezegun
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_app.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.http import HttpRequest, HttpResponse  # noqa: E402
+from django.test import Client, RequestFactory, override_settings  # noqa: E402
+from django.urls import path  # noqa: E402
+from limits.storage import MemoryStorage, Storage  # noqa: E402
+
+from django_ratelimiter import ratelimit  # noqa: E402
+from django_ratelimiter.middleware import AbstractRateLimiterMiddleware  # noqa: E402
+from django_ratelimiter.shared_memory import SharedMemoryStorage  # noqa: E402
+from django_ratelimiter.storage import CacheStorage, DatabaseStorage  # noqa: E402
+from tests.utils import CallCounter  # noqa: E402
+
+LIMIT = "1000000000/hour"
+STRATEGIES = [
+    "fixed-window",
+    "fixed-window-elastic-expiry",
+    "moving-window",
+    "sliding-window-counter",
+    "gcra",
+]
+STORAGE_METHODS = [
+    "incr",
+    "get",
+    "get_expiry",
+    "acquire_entry",
+    "get_moving_window",
+    "acquire_sliding_window_entry",
+    "get_sliding_window",
+    "acquire_gcra_entry",
+    "get_gcra",
+]
+# metrics compared with the baseline, with allowed relative increase
+COMPARED = {"calls": False, "alloc_bytes": True}
+# alias of a file database, so it's shared by threads
+DATABASE = "benchmark"
+# views and middleware of each scenario get a unique name, so they don't share rate limit keys
+scenarios = itertools.count()
+
+
+def view(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+urlpatterns = [
+    path("unlimited/", view),
+    path("limited/", ratelimit(LIMIT)(view)),
+]
+
+
+def counted(storage: Storage) -> Callable[[], int]:
+    """Counts backend calls of the storage, returns a function returning the count."""
+    if isinstance(storage, CacheStorage):
+        counter = CallCounter(storage.versioned_cache)
+        storage.cache = counter  # type: ignore[assignment]
+        return lambda: len(counter.calls)
+    calls = [0]
+    for name in STORAGE_METHODS:
+        if method := getattr(storage, name, None):
+
+            def wrapper(*args: Any, method: Any = method, **kwargs: Any) -> Any:
+                calls[0] += 1
+                return method(*args, **kwargs)
+
+            setattr(storage, name, wrapper)
+    return lambda: calls[0]
+
+
+def storage_factories(tmp: str) -> dict[str, Callable[[], Storage]]:
+    factories: dict[str, Callable[[], Storage]] = {
+        "memory": MemoryStorage,
+        "locmem": lambda: CacheStorage("locmem"),
+        "shared-memory": lambda: SharedMemoryStorage(os.path.join(tmp, "shm")),
+        "database": lambda: DatabaseStorage(using=DATABASE),
+    }
+    for cache in ("redis", "memcached"):
+        if available(cache):
+            factories[cache] = lambda cache=cache: CacheStorage(cache)  # type: ignore[misc]
+    return factories
+
+
+def available(cache: str) -> bool:
+    # memcached client ignores connection errors, so a value is read back
+    try:
+        caches[cache].set("django-ratelimiter-benchmark", 1)
+        return caches[cache].get("django-ratelimiter-benchmark") == 1
+    except Exception:
+        return False
+
+
+def decorated(strategy: str, storage: Storage) -> Callable[[HttpRequest], Any]:
+    def benchmark_view(request: HttpRequest) -> HttpResponse:
+        return view(request)
+
+    # rate limit keys are based on the qualified name of the view
+    benchmark_view.__qualname__ = f"benchmark_view_{next(scenarios)}"
+    return ratelimit(LIMIT, strategy=strategy, storage=storage)(benchmark_view)  # type: ignore[arg-type]
+
+
+def middleware(strategy: str, storage: Storage) -> Callable[[HttpRequest], Any]:
+    class BenchmarkMiddleware(AbstractRateLimiterMiddleware):
+        STRATEGY = strategy
+
+        def storage_for(self, request: HttpRequest) -> Storage:
+            return storage
+
+        def rate_for(self, request: HttpRequest) -> str:
+            return LIMIT
+
+    BenchmarkMiddleware.__qualname__ = f"BenchmarkMiddleware{next(scenarios)}"
+    return BenchmarkMiddleware(view)
+
+
+@contextmanager
+def file_database(name: str) -> Iterator[None]:
+    """Adds `DATABASE` alias of a sqlite file database with migrated tables."""
+    databases = {
+        **settings.DATABASES,
+        DATABASE: {**settings.DATABASES["default"], "NAME": name},
+    }
+    try:
+        with warnings.catch_warnings():
+            # connections are reset by configure_connections
+            warnings.filterwarnings("ignore", "Overriding setting DATABASES")
+            with override_settings(DATABASES=databases):
+                configure_connections()
+                call_command(
+                    "migrate", "django_ratelimiter", database=DATABASE, verbosity=0
+                )
+                try:
+                    yield
+                finally:
+                    connections[DATABASE].close()
+    finally:
+        configure_connections()
+
+
+def configure_connections() -> None:
+    # override_settings doesn't reset connection settings cached by the handler
+    connections._settings = connections.settings = connections.configure_settings(None)  # type: ignore[attr-defined]
+
+
+def measure(
+    call: Callable[[], Any], calls: Optional[Callable[[], int]], number: int
+) -> dict[str, float]:
+    for _ in range(number // 10):
+        call()
+    samples = []
+    for _ in range(number):
+        sample_started = time.perf_counter_ns()
+        call()
+        samples.append(time.perf_counter_ns() - sample_started)
+    percentiles = statistics.quantiles(samples, n=100)
+    result: dict[str, float] = {
+        "p50_us": percentiles[49] / 1000,
+        "p90_us": percentiles[89] / 1000,
+        "p99_us": percentiles[98] / 1000,
+    }
+
+    # arrival times of GCRA fall behind the clock on slow hits, which takes an extra call
+    with freezegun.freeze_time():
+        call()
+        before = calls() if calls else 0
+        for _ in range(100):
+            call()
+        result["calls"] = (calls() - before) / 100 if calls else 0
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(100):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        call()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    result["alloc_bytes"] = statistics.median(peaks)
+
+    threads = 4
+    per_thread = max(number // threads, 1)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        futures = [
+            executor.submit(lambda: [call() for _ in range(per_thread)])
+            for _ in range(threads)
+        ]
+        for future in futures:
+            future.result()
+    result["throughput"] = threads * per_thread / (time.perf_counter() - started)
+    return result
+
+
+def run(number: int) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {}
+    request = RequestFactory().get("/")
+    results["view/undecorated"] = measure(lambda: view(request), None, number)
+
+    with tempfile.TemporaryDirectory() as tmp, file_database(
+        os.path.join(tmp, "db.sqlite3")
+    ):
+        for storage_name, factory in storage_factories(tmp).items():
+            for strategy in STRATEGIES:
+                for kind, wrap in (
+                    ("decorator", decorated),
+                    ("middleware", middleware),
+                ):
+                    storage = factory()
+                    try:
+                        limited = wrap(strategy, storage)
+                        limited(request)
+                    except (NotImplementedError, ValueError):
+                        continue  # strategy is not supported by the storage
+                    calls = counted(storage)
+                    results[f"{kind}/{strategy}/{storage_name}"] = measure(
+                        lambda: limited(request), calls, number
+                    )
+
+    with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=["testserver"]):
+        client = Client()
+        for url in ("unlimited", "limited"):
+            results[f"client/{url}"] = measure(
+                lambda: client.get(f"/{url}/"), None, max(number // 10, 10)
+            )
+    return results
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """Returns regressions of the results compared with the baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric, relative in COMPARED.items():
+            allowed = baseline[name][metric] * (1 + threshold if relative else 1)
+            if result[metric] > allowed + 1e-9:
+                regressions.append(
+                    f"{name} {metric}: {result[metric]:.2f} > {baseline[name][metric]:.2f}"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="hits per scenario")
+    parser.add_argument("--save", help="store results as a baseline")
+    parser.add_argument("--compare", help="compare results with a baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed relative increase of allocations",
+    )
+    args = parser.parse_args()
+
+    results = run(args.number)
+    print(
+        f"{'scenario':<58} {'p50 us':>8} {'p90 us':>8} {'p99 us':>8} "
+        f"{'calls':>6} {'alloc B':>8} {'hits/s':>9}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<58} {result['p50_us']:8.2f} {result['p90_us']:8.2f} "
+            f"{result['p99_us']:8.2f} {result['calls']:6.2f} "
+            f"{result['alloc_bytes']:8.0f} {result['throughput']:9.0f}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,23 @@
+from django_ratelimiter.concurrency import concurrency_limit
 from django_ratelimiter.decorator import ratelimit
-from django_ratelimiter.storage import CacheStorage
+from django_ratelimiter.circuit_breaker import (
+    AsyncCircuitBreakerStorage,
+    CircuitBreakerStorage,
+)
+from django_ratelimiter.storage import (
+    AsyncCacheStorage,
+    AsyncDatabaseStorage,
+    CacheStorage,
+    DatabaseStorage,
+)
 
-__all__ = ["ratelimit", "CacheStorage"]
+__all__ = [
+    "ratelimit",
+    "concurrency_limit",
+    "CacheStorage",
+    "AsyncCacheStorage",
+    "DatabaseStorage",
+    "AsyncDatabaseStorage",
+    "CircuitBreakerStorage",
+    "AsyncCircuitBreakerStorage",
+]
@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Literal, Optional, Sequence, Union
+
+from limits.aio.storage import (
+    MemoryStorage as AsyncMemoryStorage,
+    Storage as AsyncStorage,
+)
+from limits.storage import MemoryStorage, Storage
+
+logger = logging.getLogger(__name__)
+
+Fallback = Literal["memory", "allow", "deny"]
+
+# counter returned by failed storage calls when requests are denied
+EXHAUSTED = sys.maxsize
+# GCRA arrival time returned when requests are denied, later than any limit period
+DENIED_ARRIVAL_DELAY = 366 * 24 * 60 * 60
+
+
+def fallback_result(method: str, allow: bool, *args: Any) -> Any:
+    """Returns a result of a storage method that either allows or denies all requests."""
+    now = time.time()
+    count = 0 if allow else EXHAUSTED
+    if method in (
+        "acquire_entry",
+        "acquire_sliding_window_entry",
+        "acquire_gcra_entry",
+    ):
+        return allow
+    if method in ("incr", "get"):
+        return count
+    if method == "get_many":
+        return [count] * len(args[0])
+    if method == "incr_many":
+        return [(count, int(now) + expiry) for _, expiry in args[0]]
+    if method == "get_expiry":
+        return now
+    if method == "get_moving_window":
+        return now, count
+    if method == "get_sliding_window":
+        expiry = args[1]
+        return 0, 0.0, count, float(expiry)
+    if method == "get_gcra":
+        return 0.0 if allow else now + DENIED_ARRIVAL_DELAY
+    if method == "check":
+        return False
+    return None
+
+
+def memory_call(storage: MemoryStorage, method: str, *args: Any, **kwargs: Any) -> Any:
+    """Calls a method of the memory fallback, batched methods of `CacheStorage`
+    are emulated with single key calls."""
+    if method == "incr_many":
+        entries, amount = args
+        return [
+            (storage.incr(key, expiry, amount=amount), int(storage.get_expiry(key)))
+            for key, expiry in entries
+        ]
+    if method == "get_many":
+        return [storage.get(key) for key in args[0]]
+    if method == "decr_many":
+        keys, amount = args
+        for key in keys:
+            if storage.get(key):
+                storage.incr(key, 0, amount=-amount)
+        return None
+    return getattr(storage, method)(*args, **kwargs)
+
+
+async def amemory_call(
+    storage: AsyncMemoryStorage, method: str, *args: Any, **kwargs: Any
+) -> Any:
+    """Async version of `memory_call`."""
+    if method == "incr_many":
+        entries, amount = args
+        return [
+            (
+                await storage.incr(key, expiry, amount=amount),
+                int(await storage.get_expiry(key)),
+            )
+            for key, expiry in entries
+        ]
+    if method == "get_many":
+        return [await storage.get(key) for key in args[0]]
+    if method == "decr_many":
+        keys, amount = args
+        for key in keys:
+            if await storage.get(key):
+                await storage.incr(key, 0, amount=-amount)
+        return None
+    return await getattr(storage, method)(*args, **kwargs)
+
+
+BATCHED_METHODS = ("incr_many", "get_many", "decr_many")
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures of storage calls.
+
+    The circuit is opened after `failures` consecutive calls raised an exception
+    or took longer than `timeout` seconds, and closed once the storage is healthy again.
+    """
+
+    def __init__(self, failures: int, timeout: float) -> None:
+        self.failures = failures
+        self.timeout = timeout
+        self.consecutive_failures = 0
+        self.is_open = False
+        self.lock = threading.Lock()
+
+    def record(self, elapsed: Optional[float]) -> bool:
+        """Records a call which took `elapsed` seconds, or failed if `None`.
+
+        Returns `True` if the circuit was opened by the call.
+        """
+        if elapsed is not None and elapsed <= self.timeout:
+            self.consecutive_failures = 0
+            return False
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.is_open or self.consecutive_failures < self.failures:
+                return False
+            self.is_open = True
+            return True
+
+    def close(self) -> None:
+        with self.lock:
+            self.consecutive_failures = 0
+            self.is_open = False
+
+
+class CircuitBreakerStorage(Storage):
+    """Storage wrapper that stops using a failing storage.
+
+    Calls to the wrapped storage which raise an exception or exceed the `timeout`
+    are counted as failures, after `failures` consecutive failures the circuit is opened
+    and calls are handled by the fallback:
+
+    - `memory` - in-process `MemoryStorage`, limits are applied per process
+      (strategies not supported by `MemoryStorage`, i.e. GCRA, allow all requests)
+    - `allow` - all requests are allowed (fail-open)
+    - `deny` - all requests are rate limited (fail-closed)
+
+    The wrapped storage is probed with `check()` every `probe_interval` seconds
+    in a background thread while the circuit is open, and used again once it's healthy.
+    Slow calls are not interrupted, timeouts of the cache client should be configured
+    to bound the latency of a single call.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        fallback: Fallback = "memory",
+        failures: int = 5,
+        timeout: float = 0.1,
+        probe_interval: float = 1.0,
+    ) -> None:
+        if fallback not in ("memory", "allow", "deny"):
+            raise ValueError(f"Unknown fallback {fallback}")
+        self.storage = storage
+        self.fallback = fallback
+        self.fallback_storage = MemoryStorage() if fallback == "memory" else None
+        self.probe_interval = probe_interval
+        self.circuit_breaker = CircuitBreaker(failures, timeout)
+        super().__init__(uri=None)
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return Exception
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        # optional storage methods (moving window, sliding window counter, ...)
+        if name.startswith("_") or "storage" not in self.__dict__:
+            raise AttributeError(name)
+        getattr(self.storage, name)
+        return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        if not self.circuit_breaker.is_open:
+            started = time.monotonic()
+            try:
+                result = getattr(self.storage, method)(*args, **kwargs)
+            except Exception:
+                logger.exception("Rate limit storage call failed")
+                self._record(None)
+            else:
+                self._record(time.monotonic() - started)
+                return result
+        if self.fallback_storage is not None and (
+            method in BATCHED_METHODS or hasattr(self.fallback_storage, method)
+        ):
+            return memory_call(self.fallback_storage, method, *args, **kwargs)
+        return fallback_result(method, self.fallback != "deny", *args)
+
+    def _record(self, elapsed: Optional[float]) -> None:
+        if self.circuit_breaker.record(elapsed):
+            logger.warning(
+                "Rate limit storage circuit opened, using %s fallback", self.fallback
+            )
+            threading.Thread(target=self._probe, daemon=True).start()
+
+    def _probe(self) -> None:
+        while True:
+            time.sleep(self.probe_interval)
+            try:
+                if self.storage.check():
+                    break
+            except Exception:
+                pass
+        self.circuit_breaker.close()
+        logger.warning("Rate limit storage circuit closed")
+
+    def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        return self._call("incr", key, expiry, elastic_expiry, amount)
+
+    def get(self, key: str) -> int:
+        return self._call("get", key)
+
+    def get_expiry(self, key: str) -> float:
+        return self._call("get_expiry", key)
+
+    def incr_many(
+        self, entries: Sequence[tuple[str, int]], amount: int = 1
+    ) -> list[tuple[int, int]]:
+        return self._call("incr_many", entries, amount)
+
+    def get_many(self, keys: Sequence[str]) -> list[int]:
+        return self._call("get_many", keys)
+
+    def decr_many(self, keys: Sequence[str], amount: int = 1) -> None:
+        self._call("decr_many", keys, amount)
+
+    def check(self) -> bool:
+        return not self.circuit_breaker.is_open and self.storage.check()
+
+    def reset(self) -> Optional[int]:
+        return self.storage.reset()
+
+    def clear(self, key: str) -> None:
+        self._call("clear", key)
+
+
+class AsyncCircuitBreakerStorage(AsyncStorage):
+    """Async version of `CircuitBreakerStorage`, the wrapped storage
+    is probed in a background task.
+
+    Calls exceeding the `timeout` are cancelled and handled by the fallback,
+    a cancelled call may still be applied by the wrapped storage.
+    """
+
+    def __init__(
+        self,
+        storage: AsyncStorage,
+        fallback: Fallback = "memory",
+        failures: int = 5,
+        timeout: float = 0.1,
+        probe_interval: float = 1.0,
+    ) -> None:
+        if fallback not in ("memory", "allow", "deny"):
+            raise ValueError(f"Unknown fallback {fallback}")
+        self.storage = storage
+        self.fallback = fallback
+        self.fallback_storage = AsyncMemoryStorage() if fallback == "memory" else None
+        self.probe_interval = probe_interval
+        self.circuit_breaker = CircuitBreaker(failures, timeout)
+        self.probe_task: Optional[asyncio.Task[None]] = None
+        super().__init__(uri=None)
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return Exception
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        if name.startswith("_") or "storage" not in self.__dict__:
+            raise AttributeError(name)
+        getattr(self.storage, name)
+        return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+
+    async def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        if not self.circuit_breaker.is_open:
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    getattr(self.storage, method)(*args, **kwargs),
+                    self.circuit_breaker.timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Rate limit storage call timed out")
+                self._record(None)
+            except Exception:
+                logger.exception("Rate limit storage call failed")
+                self._record(None)
+            else:
+                self._record(time.monotonic() - started)
+                return result
+        if self.fallback_storage is not None and (
+            method in BATCHED_METHODS or hasattr(self.fallback_storage, method)
+        ):
+            return await amemory_call(self.fallback_storage, method, *args, **kwargs)
+        return fallback_result(method, self.fallback != "deny", *args)
+
+    def _record(self, elapsed: Optional[float]) -> None:
+        if self.circuit_breaker.record(elapsed):
+            logger.warning(
+                "Rate limit storage circuit opened, using %s fallback", self.fallback
+            )
+            self.probe_task = asyncio.get_running_loop().create_task(self._probe())
+
+    async def _probe(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                if await self.storage.check():
+                    break
+            except Exception:
+                pass
+        self.circuit_breaker.close()
+        logger.warning("Rate limit storage circuit closed")
+
+    async def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        return await self._call("incr", key, expiry, elastic_expiry, amount)
+
+    async def get(self, key: str) -> int:
+        return await self._call("get", key)
+
+    async def get_expiry(self, key: str) -> float:
+        return await self._call("get_expiry", key)
+
+    async def incr_many(
+        self, entries: Sequence[tuple[str, int]], amount: int = 1
+    ) -> list[tuple[int, int]]:
+        return await self._call("incr_many", entries, amount)
+
+    async def get_many(self, keys: Sequence[str]) -> list[int]:
+        return await self._call("get_many", keys)
+
+    async def decr_many(self, keys: Sequence[str], amount: int = 1) -> None:
+        await self._call("decr_many", keys, amount)
+
+    async def check(self) -> bool:
+        return not self.circuit_breaker.is_open and await self.storage.check()
+
+    async def reset(self) -> Optional[int]:
+        return await self.storage.reset()
+
+    async def clear(self, key: str) -> None:
+        await self._call("clear", key)
@@ -0,0 +1,114 @@
+from functools import lru_cache, wraps
+from typing import Any, Callable, Optional, Sequence, Union
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from django_ratelimiter.sharding import (
+    AsyncShardedCacheStorage,
+    ShardedCacheStorage,
+    async_cache_storage,
+    cache_storage,
+)
+from django_ratelimiter.storage import AsyncCacheStorage, CacheStorage
+from django_ratelimiter.types import AnyViewFunc
+from django_ratelimiter.utils import compile_identifiers
+
+
+def semaphore_key(identifiers: Sequence[str]) -> str:
+    return "/".join(("CONCURRENCY", *identifiers))
+
+
+@lru_cache(maxsize=None)
+def get_semaphore_storage(
+    cache: Optional[str] = None,
+) -> Union[CacheStorage, ShardedCacheStorage]:
+    """Returns a storage for concurrency limits, `DJANGO_RATELIMITER_CACHE`
+    is used if cache name is not specified."""
+    return cache_storage(
+        cache or getattr(settings, "DJANGO_RATELIMITER_CACHE", None) or "default"
+    )
+
+
+@lru_cache(maxsize=None)
+def get_async_semaphore_storage(
+    cache: Optional[str] = None,
+) -> Union[AsyncCacheStorage, AsyncShardedCacheStorage]:
+    """Async version of `get_semaphore_storage`."""
+    return async_cache_storage(
+        cache or getattr(settings, "DJANGO_RATELIMITER_CACHE", None) or "default"
+    )
+
+
+def concurrency_limit(
+    limit: int,
+    key: Union[str, Callable[[HttpRequest], Any], None] = None,
+    methods: Union[str, Sequence[str], None] = None,
+    timeout: int = 60,
+    response: Optional[HttpResponse] = None,
+    cache: Optional[str] = None,
+) -> Callable[[AnyViewFunc], AnyViewFunc]:
+    """Decorator limiting the number of concurrent requests to a view.
+
+    A slot of a semaphore stored in django cache is acquired before the view
+    and released after the response or an exception.
+
+    Arguments:
+        limit: maximum number of concurrent requests
+        key: request attribute or callable that returns a string to be used as identifier
+        methods: only limit specified method(s)
+        timeout: slot lease time in seconds, slots of crashed processes are released
+            after it expires, should be longer than the view response time
+        response: custom response instance, returned when all slots are taken
+        cache: override default cache name
+    """
+
+    def decorator(func: AnyViewFunc) -> AnyViewFunc:
+        identifiers_for = compile_identifiers(func, key, methods)
+
+        def limited_response() -> HttpResponse:
+            return response or HttpResponse("Too Many Requests", status=429)
+
+        if iscoroutinefunction(func):
+            async_storage = get_async_semaphore_storage(cache)
+
+            @wraps(func)
+            async def async_wrapper(
+                request: HttpRequest, *args: Any, **kwargs: Any
+            ) -> HttpResponse:
+                identifiers = identifiers_for(request)
+                if identifiers is None:
+                    return await func(request, *args, **kwargs)  # type: ignore[misc]
+                lease = await async_storage.acquire_semaphore(
+                    semaphore_key(identifiers), limit, timeout
+                )
+                if lease is None:
+                    return limited_response()
+                try:
+                    return await func(request, *args, **kwargs)  # type: ignore[misc]
+                finally:
+                    await async_storage.release_semaphore(*lease)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        storage = get_semaphore_storage(cache)
+
+        @wraps(func)
+        def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+            identifiers = identifiers_for(request)
+            if identifiers is None:
+                return func(request, *args, **kwargs)  # type: ignore[return-value]
+            lease = storage.acquire_semaphore(
+                semaphore_key(identifiers), limit, timeout
+            )
+            if lease is None:
+                return limited_response()
+            try:
+                return func(request, *args, **kwargs)  # type: ignore[return-value]
+            finally:
+                storage.release_semaphore(*lease)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
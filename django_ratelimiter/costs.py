@@ -0,0 +1,58 @@
+import math
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest, HttpResponse
+
+
+def tracked(response_cost: Any, request: HttpRequest) -> Any:
+    """Returns a context manager measuring the view for `response_cost`,
+    if it defines `track(request)`."""
+    track = getattr(response_cost, "track", None)
+    return track(request) if track else nullcontext()
+
+
+class ResponseSize:
+    """Response cost of one hit per `unit` bytes of the response content.
+
+    Streaming responses are not counted.
+    """
+
+    def __init__(self, unit: int = 1024) -> None:
+        self.unit = unit
+
+    def __call__(self, request: HttpRequest, response: HttpResponse) -> int:
+        if getattr(response, "streaming", False):
+            return 0
+        return math.ceil(len(response.content) / self.unit)
+
+
+class QueryCount:
+    """Response cost of one hit per `per_query` database queries executed by the view.
+
+    Queries are counted on the connection of the thread running the view,
+    so only sync views (and middleware under WSGI) are measured.
+    """
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS, per_query: int = 1) -> None:
+        self.using = using
+        self.per_query = per_query
+
+    @contextmanager
+    def track(self, request: HttpRequest) -> Iterator[None]:
+        queries = 0
+
+        def count(execute: Callable[..., Any], *args: Any) -> Any:
+            nonlocal queries
+            queries += 1
+            return execute(*args)
+
+        try:
+            with connections[self.using].execute_wrapper(count):
+                yield
+        finally:
+            request._ratelimiter_queries = queries  # type: ignore[attr-defined]
+
+    def __call__(self, request: HttpRequest, response: HttpResponse) -> int:
+        return math.ceil(getattr(request, "_ratelimiter_queries", 0) / self.per_query)
@@ -1,63 +1,292 @@
 from typing import Callable, Literal, Sequence, Union, Optional
 from functools import wraps
 
-from django.db import models
+from asgiref.sync import iscoroutinefunction
 from django.http import HttpRequest, HttpResponse
+from limits.aio.storage import Storage as AsyncStorage
+from limits.aio.strategies import RateLimiter as AsyncRateLimiter
+from limits import RateLimitItem
 from limits.storage import Storage
-from limits import parse
-from django_ratelimiter.types import ViewFunc, P
-from django_ratelimiter.utils import build_identifiers, get_rate_limiter
+from limits.strategies import RateLimiter
+from django_ratelimiter.deferred import (
+    AsyncDeferredHits,
+    DeferredHits,
+    get_async_deferred_hits,
+    get_deferred_hits,
+)
+from django_ratelimiter.costs import tracked
+from django_ratelimiter.exemptions import get_exemptions, is_exempt
+from django_ratelimiter.signals import aobserve, is_observed, observe
+from django_ratelimiter.types import AnyViewFunc, Cost, P, Rate, ResponseCost
+from django_ratelimiter.utils import (
+    RateLimitResult,
+    acan_hit_all,
+    ahit_all,
+    ahit_all_or_wait,
+    ahit_all_with_stats,
+    can_hit_all,
+    compile_identifiers,
+    get_rate_limiter,
+    get_async_rate_limiter,
+    hit_all,
+    hit_all_or_wait,
+    hit_all_with_stats,
+    parse_rates,
+    set_ratelimit_headers,
+)
 
 
 def ratelimit(
-    rate: Union[str, Callable[[HttpRequest], str]],
+    rate: Union[Rate, Callable[[HttpRequest], Rate]],
     key: Union[str, Callable[[HttpRequest], str], None] = None,
     methods: Union[str, Sequence[str], None] = None,
     strategy: Literal[
         "fixed-window",
         "fixed-window-elastic-expiry",
         "moving-window",
+        "sliding-window-counter",
+        "gcra",
     ] = "fixed-window",
     response: Optional[HttpResponse] = None,
-    storage: Optional[Storage] = None,
+    storage: Union[Storage, AsyncStorage, None] = None,
     cache: Optional[str] = None,
-) -> Callable[[ViewFunc], ViewFunc]:
+    headers: bool = False,
+    lease: bool = False,
+    stripes: int = 1,
+    mode: Literal["hit", "deferred"] = "hit",
+    count_if: Optional[Callable[[HttpRequest, HttpResponse], bool]] = None,
+    on_limit: Literal["reject", "wait"] = "reject",
+    max_wait: float = 5.0,
+    cost: Cost = 1,
+    response_cost: Optional[ResponseCost] = None,
+) -> Callable[[AnyViewFunc], AnyViewFunc]:
     """Rate limiting decorator for wrapping views.
 
+    Coroutine views are rate limited with `limits.aio` strategies,
+    using `storage` (which must be an async storage) or the default async storage.
+
     Arguments:
-        rate: rate string (i.e. `5/second`) or a callable that takes a request and returns a rate
+        rate: rate string (i.e. `5/second`), multiple rates (i.e. `10/second;500/hour` or a list)
+            or a callable that takes a request and returns a rate
         key: request attribute or callable that returns a string to be used as identifier
         methods: only rate limit specified method(s)
         strategy: a name of rate limiting strategy
         response: custom rate limit response instance
         storage: override default rate limit storage
         cache: override default cache name if using django cache storage backend
+        headers: set `X-RateLimit-Limit/Remaining/Reset` headers on responses
+            and `Retry-After` when rate limit is exceeded
+        lease: spend fixed window hits reserved by the process in blocks,
+            reduces storage round trips for hot keys at the cost of accuracy
+        stripes: split `fixed-window` counters into multiple keys,
+            spreads increments of hot keys between cache servers
+        mode: `hit` consumes rate limits before the view, `deferred` only checks them
+            before the view and consumes them in background after the response
+        count_if: with `deferred` mode, a callable that takes a request and a response
+            and returns whether the request should be counted
+        on_limit: `reject` responds immediately when rate limit is exceeded,
+            `wait` delays the request until the limit is reset
+        max_wait: with `wait`, maximum delay in seconds, the request is rejected
+            if the limit is not reset in time
+        cost: number of hits consumed by a request,
+            or a callable that takes a request and returns it
+        response_cost: a callable that takes a request and a response and returns
+            the number of hits consumed in background after the response
+            (i.e. `ResponseSize()`, `QueryCount()` from `django_ratelimiter.costs`)
     """
     if storage and cache:
         raise ValueError("Can't use both cache and storage")
-    rate_limiter = get_rate_limiter(strategy, storage)
+    if count_if and mode != "deferred":
+        raise ValueError("count_if can only be used with deferred mode")
+    deferred = mode == "deferred"
+    wait = on_limit == "wait"
+    if deferred and wait:
+        raise ValueError("Can't wait for rate limits in deferred mode")
+    # everything static is compiled once, when decorator is applied
+    static_rates = None if callable(rate) else parse_rates(rate)
+
+    def decorator(func: AnyViewFunc) -> AnyViewFunc:
+        get_exemptions()  # compiled once, on startup
+        identifiers_for = compile_identifiers(func, key, methods)
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        def rates_for(request: HttpRequest) -> tuple[RateLimitItem, ...]:
+            return static_rates or parse_rates(rate(request))  # type: ignore[operator]
+
+        def cost_for(request: HttpRequest) -> int:
+            return cost(request) if callable(cost) else cost
+
+        def ratelimit_response(result: Optional[RateLimitResult]) -> HttpResponse:
+            return set_ratelimit_headers(
+                response or HttpResponse("Too Many Requests", status=429),
+                result,
+                copy_response=response is not None,
+            )
+
+        def defer(
+            request: HttpRequest,
+            view_response: HttpResponse,
+            deferred_hits: Union[DeferredHits, AsyncDeferredHits],
+            rate_limiter: Union[RateLimiter, AsyncRateLimiter],
+        ) -> None:
+            identifiers = identifiers_for(request)
+            if identifiers is None:
+                return
+            amount = 0
+            if deferred:
+                if count_if and not count_if(request, view_response):
+                    return
+                amount = cost_for(request)
+            if response_cost:
+                amount += response_cost(request, view_response)
+            if amount > 0:
+                deferred_hits.add(rate_limiter, rates_for(request), identifiers, amount)  # type: ignore[arg-type]
+
+        if iscoroutinefunction(func):
+            async_rate_limiter = get_async_rate_limiter(strategy, storage, stripes)  # type: ignore[arg-type]
+
+            async def adecide(
+                request: HttpRequest, identifiers: tuple[str, ...]
+            ) -> tuple[bool, Optional[RateLimitResult]]:
+                items = rates_for(request)
+                amount = cost_for(request)
+                if deferred:
+                    return (
+                        await acan_hit_all(
+                            async_rate_limiter, items, *identifiers, cost=amount
+                        ),
+                        None,
+                    )
+                if wait:
+                    result = await ahit_all_or_wait(
+                        async_rate_limiter,
+                        items,
+                        *identifiers,
+                        cost=amount,
+                        lease=lease,
+                        max_wait=max_wait,
+                    )
+                    return result.allowed, result if headers else None
+                if headers:
+                    result = await ahit_all_with_stats(
+                        async_rate_limiter,
+                        items,
+                        *identifiers,
+                        cost=amount,
+                        lease=lease,
+                    )
+                    return result.allowed, result
+                return (
+                    await ahit_all(
+                        async_rate_limiter,
+                        items,
+                        *identifiers,
+                        cost=amount,
+                        lease=lease,
+                    ),
+                    None,
+                )
+
+            async def acheck(
+                request: HttpRequest,
+            ) -> tuple[bool, Optional[RateLimitResult]]:
+                identifiers = identifiers_for(request)
+                if identifiers is None:
+                    return True, None
+                if is_observed():
+                    return await aobserve(
+                        func,
+                        lambda: adecide(request, identifiers),
+                        request,
+                        name,
+                        strategy,
+                        identifiers,
+                    )
+                return await adecide(request, identifiers)
+
+            @wraps(func)
+            async def async_wrapper(
+                request: HttpRequest, *args: P.args, **kwargs: P.kwargs
+            ) -> HttpResponse:
+                if is_exempt(request):
+                    return await func(request, *args, **kwargs)  # type: ignore[misc]
+                allowed, result = await acheck(request)
+                if not allowed:
+                    return ratelimit_response(result)
+                view_response = await func(request, *args, **kwargs)  # type: ignore[misc]
+                if deferred or response_cost:
+                    defer(
+                        request,
+                        view_response,
+                        get_async_deferred_hits(),
+                        async_rate_limiter,
+                    )
+                return set_ratelimit_headers(view_response, result)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        rate_limiter = get_rate_limiter(strategy, storage, stripes)  # type: ignore[arg-type]
+
+        def decide(
+            request: HttpRequest, identifiers: tuple[str, ...]
+        ) -> tuple[bool, Optional[RateLimitResult]]:
+            items = rates_for(request)
+            amount = cost_for(request)
+            if deferred:
+                return (
+                    can_hit_all(rate_limiter, items, *identifiers, cost=amount),
+                    None,
+                )
+            if wait:
+                result = hit_all_or_wait(
+                    rate_limiter,
+                    items,
+                    *identifiers,
+                    cost=amount,
+                    lease=lease,
+                    max_wait=max_wait,
+                )
+                return result.allowed, result if headers else None
+            if headers:
+                result = hit_all_with_stats(
+                    rate_limiter, items, *identifiers, cost=amount, lease=lease
+                )
+                return result.allowed, result
+            return (
+                hit_all(rate_limiter, items, *identifiers, cost=amount, lease=lease),
+                None,
+            )
+
+        def check(request: HttpRequest) -> tuple[bool, Optional[RateLimitResult]]:
+            identifiers = identifiers_for(request)
+            if identifiers is None:
+                return True, None
+            if is_observed():
+                return observe(
+                    func,
+                    lambda: decide(request, identifiers),
+                    request,
+                    name,
+                    strategy,
+                    identifiers,
+                )
+            return decide(request, identifiers)
 
-    def decorator(func: ViewFunc) -> ViewFunc:
         @wraps(func)
         def wrapper(
             request: HttpRequest, *args: P.args, **kwargs: P.kwargs
         ) -> HttpResponse:
-            rate_str = rate(request) if callable(rate) else rate
-            parsed_rate = parse(rate_str)
-            if not methods or request.method in methods:
-                identifiers = build_identifiers(func, methods)
-                if key:
-                    value = key(request) if callable(key) else getattr(request, key)
-                    value = str(value.pk if isinstance(value, models.Model) else value)
-                    identifiers.append(value)
-
-                if not rate_limiter.hit(parsed_rate, *identifiers):
-                    return response or HttpResponse(
-                        "Too Many Requests",
-                        status=429,
-                    )
-            return func(request, *args, **kwargs)
+            if is_exempt(request):
+                return func(request, *args, **kwargs)  # type: ignore[return-value]
+            allowed, result = check(request)
+            if not allowed:
+                return ratelimit_response(result)
+            with tracked(response_cost, request):
+                view_response = func(request, *args, **kwargs)
+            if deferred or response_cost:
+                defer(request, view_response, get_deferred_hits(), rate_limiter)  # type: ignore[arg-type]
+            return set_ratelimit_headers(view_response, result)  # type: ignore[arg-type]
 
-        return wrapper
+        return wrapper  # type: ignore[return-value]
 
     return decorator
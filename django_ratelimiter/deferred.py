@@ -0,0 +1,194 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from django.conf import settings
+from limits import RateLimitItem
+from limits.aio.strategies import (
+    FixedWindowRateLimiter as AsyncFixedWindowRateLimiter,
+    RateLimiter as AsyncRateLimiter,
+)
+from limits.strategies import FixedWindowRateLimiter, RateLimiter
+
+from django_ratelimiter.strategies import (
+    AsyncStripedFixedWindowRateLimiter,
+    StripedFixedWindowRateLimiter,
+)
+
+logger = logging.getLogger(__name__)
+
+# fixed window counters are incremented even if the hit exceeds the limit
+FIXED_WINDOW = (
+    FixedWindowRateLimiter,
+    StripedFixedWindowRateLimiter,
+    AsyncFixedWindowRateLimiter,
+    AsyncStripedFixedWindowRateLimiter,
+)
+# attempts to consume the hits which fit in the limit, if concurrent hits are consumed
+MAX_ATTEMPTS = 3
+
+
+def consume(
+    rate_limiter: RateLimiter,
+    item: RateLimitItem,
+    identifiers: tuple[str, ...],
+    cost: int,
+) -> None:
+    """Consumes coalesced hits.
+
+    Strategies other than fixed window reject a hit which doesn't fit in the limit
+    without recording it, so the hits which still fit are consumed instead
+    and the limit is exceeded.
+    """
+    if rate_limiter.hit(item, *identifiers, cost=cost):
+        return
+    if isinstance(rate_limiter, FIXED_WINDOW):
+        return
+    for _ in range(MAX_ATTEMPTS):
+        remaining = rate_limiter.get_window_stats(item, *identifiers).remaining
+        if remaining <= 0 or rate_limiter.hit(
+            item, *identifiers, cost=min(cost, remaining)
+        ):
+            return
+
+
+async def aconsume(
+    rate_limiter: AsyncRateLimiter,
+    item: RateLimitItem,
+    identifiers: tuple[str, ...],
+    cost: int,
+) -> None:
+    """Async version of `consume`."""
+    if await rate_limiter.hit(item, *identifiers, cost=cost):
+        return
+    if isinstance(rate_limiter, FIXED_WINDOW):
+        return
+    for _ in range(MAX_ATTEMPTS):
+        remaining = (await rate_limiter.get_window_stats(item, *identifiers)).remaining
+        if remaining <= 0 or await rate_limiter.hit(
+            item, *identifiers, cost=min(cost, remaining)
+        ):
+            return
+
+
+class DeferredHits:
+    """Queue of rate limit hits consumed by a background thread every `interval` seconds.
+
+    Hits of the same limit and identifiers are coalesced into a single `hit(cost=n)`,
+    which is a single `incr(amount=n)` with fixed window strategy. With other strategies
+    the hits which fit in the limit are consumed if the whole batch doesn't fit, see `consume`.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.pending: dict[tuple[RateLimiter, RateLimitItem, tuple[str, ...]], int] = {}
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def add(
+        self,
+        rate_limiter: RateLimiter,
+        items: Sequence[RateLimitItem],
+        identifiers: tuple[str, ...],
+        cost: int = 1,
+    ) -> None:
+        with self.lock:
+            for item in items:
+                key = (rate_limiter, item, identifiers)
+                self.pending[key] = self.pending.get(key, 0) + cost
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="django-ratelimiter-deferred", daemon=True
+                )
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for (rate_limiter, item, identifiers), cost in pending.items():
+            try:
+                consume(rate_limiter, item, identifiers, cost)
+            except Exception:
+                logger.exception("Failed to consume deferred rate limit hits")
+
+
+class AsyncDeferredHits:
+    """Async version of `DeferredHits`, hits are consumed by a task of the running event loop.
+
+    Pending hits are consumed when the task is cancelled, i.e. when the loop is closed by
+    `asyncio.run`. Async views run by `async_to_sync` under WSGI have a loop per request,
+    so their hits are consumed before the response is returned. Hits are lost if the loop
+    is closed without cancelling its tasks.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.pending: dict[
+            tuple[AsyncRateLimiter, RateLimitItem, tuple[str, ...]], int
+        ] = {}
+        self.lock = threading.Lock()
+        self.task: Optional[asyncio.Task[None]] = None
+
+    def add(
+        self,
+        rate_limiter: AsyncRateLimiter,
+        items: Sequence[RateLimitItem],
+        identifiers: tuple[str, ...],
+        cost: int = 1,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            for item in items:
+                key = (rate_limiter, item, identifiers)
+                self.pending[key] = self.pending.get(key, 0) + cost
+            if (
+                self.task is None
+                or self.task.done()
+                or self.task.get_loop() is not loop
+            ):
+                self.task = loop.create_task(self.run())
+
+    async def run(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await self.flush()
+        finally:
+            # the loop is closed, hits are consumed before the loop is gone
+            await self.flush()
+
+    async def flush(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for (rate_limiter, item, identifiers), cost in pending.items():
+            try:
+                await aconsume(rate_limiter, item, identifiers, cost)
+            except Exception:
+                logger.exception("Failed to consume deferred rate limit hits")
+
+
+def get_deferred_interval() -> float:
+    return getattr(settings, "DJANGO_RATELIMITER_DEFERRED_INTERVAL", 0.1)
+
+
+@lru_cache(maxsize=None)
+def get_deferred_hits() -> DeferredHits:
+    """Returns the process queue of deferred hits, consumed every
+    `DJANGO_RATELIMITER_DEFERRED_INTERVAL` seconds (defaults to 0.1)."""
+    return DeferredHits(get_deferred_interval())
+
+
+@lru_cache(maxsize=None)
+def get_async_deferred_hits() -> AsyncDeferredHits:
+    """Async version of `get_deferred_hits`."""
+    return AsyncDeferredHits(get_deferred_interval())
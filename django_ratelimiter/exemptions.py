@@ -0,0 +1,89 @@
+import ipaddress
+from functools import lru_cache
+from typing import Any, Iterable, Mapping, Optional
+
+from django.conf import settings
+from django.http import HttpRequest
+
+
+class PrefixIndex:
+    """Index of IP networks, compiled into a hash set of network prefixes per prefix length.
+
+    A lookup takes one set lookup per distinct prefix length (at most 33 for IPv4
+    and 129 for IPv6), regardless of the number of networks.
+    """
+
+    def __init__(self, networks: Iterable[str]) -> None:
+        # ip version -> (address bits, prefix length -> network prefixes)
+        self.prefixes: dict[int, tuple[int, dict[int, set[int]]]] = {}
+        for network in map(ipaddress.ip_network, networks):
+            bits, by_length = self.prefixes.setdefault(
+                network.version, (network.max_prefixlen, {})
+            )
+            by_length.setdefault(network.prefixlen, set()).add(
+                int(network.network_address) >> (bits - network.prefixlen)
+            )
+
+    def __contains__(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if ip.version not in self.prefixes:
+            return False
+        bits, by_length = self.prefixes[ip.version]
+        value = int(ip)
+        return any(
+            value >> (bits - length) in prefixes
+            for length, prefixes in by_length.items()
+        )
+
+
+class Exemptions:
+    """Requests which are not rate-limited.
+
+    Arguments:
+        ips: IP addresses or networks (i.e. `10.0.0.0/8`) of `REMOTE_ADDR`
+        users: primary keys of authenticated users
+        headers: header names mapped to accepted tokens
+    """
+
+    def __init__(
+        self,
+        ips: Iterable[str] = (),
+        users: Iterable[Any] = (),
+        headers: Optional[Mapping[str, Iterable[str]]] = None,
+    ) -> None:
+        self.ips = PrefixIndex(ips)
+        self.users = frozenset(map(str, users))
+        self.headers = [
+            (name, frozenset(tokens)) for name, tokens in (headers or {}).items()
+        ]
+
+    def __call__(self, request: HttpRequest) -> bool:
+        """Whether the request is exempt, user is checked last as it may be loaded lazily."""
+        for name, tokens in self.headers:
+            if request.headers.get(name) in tokens:
+                return True
+        if self.ips.prefixes and request.META.get("REMOTE_ADDR", "") in self.ips:
+            return True
+        if self.users and (user := getattr(request, "user", None)) is not None:
+            return user.is_authenticated and str(user.pk) in self.users
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_exemptions() -> Optional[Exemptions]:
+    """Returns exemptions compiled from `DJANGO_RATELIMITER_EXEMPT` options, if defined."""
+    options: Optional[Mapping[str, Any]] = getattr(
+        settings, "DJANGO_RATELIMITER_EXEMPT", None
+    )
+    return Exemptions(**options) if options else None
+
+
+def is_exempt(request: HttpRequest) -> bool:
+    """Whether rate limits are skipped for the request."""
+    exemptions = get_exemptions()
+    return exemptions is not None and exemptions(request)
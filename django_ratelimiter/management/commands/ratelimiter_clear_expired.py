@@ -0,0 +1,19 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DEFAULT_DB_ALIAS
+
+from django_ratelimiter.storage import DatabaseStorage
+
+
+class Command(BaseCommand):
+    help = "Deletes expired counters of DatabaseStorage."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        storage = DatabaseStorage(options["database"])
+        deleted = storage.clear_expired(options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} expired counters")
@@ -0,0 +1,30 @@
+from typing import Any
+
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandParser
+from django.urls import get_resolver
+
+from django_ratelimiter.utils import KEY_NAMES, readable_key
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints readable names of compact identifiers "
+        "(DJANGO_RATELIMITER_COMPACT_KEYS) of views and middleware."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "keys", nargs="*", help="storage keys to print with readable names"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # views are decorated and middleware is created when loaded
+        get_resolver().url_patterns
+        BaseHandler().load_middleware()
+        if options["keys"]:
+            for key in options["keys"]:
+                self.stdout.write(readable_key(key))
+            return
+        for identifier, name in sorted(KEY_NAMES.items(), key=lambda item: item[1]):
+            self.stdout.write(f"{identifier} {name}")
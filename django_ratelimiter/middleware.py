@@ -1,59 +1,413 @@
 import abc
-from typing import Callable, Optional
+from functools import lru_cache
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Literal,
+    NamedTuple,
+    Optional,
+    Union,
+)
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import HttpRequest, HttpResponse
-from limits import parse
+from django.urls import Resolver404, resolve
+from limits import RateLimitItem
+from limits.aio.storage import Storage as AsyncStorage
+from limits.aio.strategies import RateLimiter as AsyncRateLimiter
 from limits.storage import Storage
+from limits.strategies import RateLimiter
 
-from django_ratelimiter.utils import get_storage, get_rate_limiter
+from django_ratelimiter.concurrency import (
+    get_async_semaphore_storage,
+    get_semaphore_storage,
+    semaphore_key,
+)
+from django_ratelimiter.costs import tracked
+from django_ratelimiter.deferred import get_async_deferred_hits, get_deferred_hits
+from django_ratelimiter.exemptions import get_exemptions, is_exempt
+from django_ratelimiter.signals import aobserve, is_observed, observe
+from django_ratelimiter.types import Rate, ResponseCost
+from django_ratelimiter.utils import (
+    RateLimitResult,
+    acan_hit_all,
+    ahit_all,
+    ahit_all_or_wait,
+    ahit_all_with_stats,
+    can_hit_all,
+    compact_identifier,
+    compile_key,
+    get_storage,
+    get_async_storage,
+    get_rate_limiter,
+    get_async_rate_limiter,
+    hit_all,
+    hit_all_or_wait,
+    hit_all_with_stats,
+    parse_rates,
+    set_ratelimit_headers,
+    use_compact_keys,
+)
+
+
+class Rule(NamedTuple):
+    """Rate limiting rule for `AbstractRateLimiterMiddleware.RULES`.
+
+    Attributes:
+        rate: rate string (i.e. `5/second`), multiple rates (i.e. `10/second;500/hour` or a list)
+        strategy: a name of rate limiting strategy, middleware strategy is used if not set
+        key: request attribute or callable that returns a string to be used as identifier
+    """
+
+    rate: Rate
+    strategy: Optional[str] = None
+    key: Union[str, Callable[[HttpRequest], Any], None] = None
+
+
+class CompiledRule(NamedTuple):
+    name: str
+    items: tuple[RateLimitItem, ...]
+    strategy: Optional[str]
+    key_func: Optional[Callable[[HttpRequest], str]]
+    identifier: str
 
 
 class AbstractRateLimiterMiddleware(abc.ABC):
     """Abstract base class for rate limiting middleware.
 
+    Middleware supports both sync and async request handling,
+    async requests are rate limited with `limits.aio` strategies and storage.
+
     Attributes:
         STRATEGY: default rate limiter strategy. Defaults to `fixed-window`.
+        RULES: rate limiting rules, mapping of a path prefix (starting with `/`)
+            or a URL name to a rate string or a `Rule`. Rules are compiled once
+            when middleware is created and take precedence over `rate_for`,
+            the longest matching path prefix wins. A prefix without a trailing slash
+            (i.e. `/api`) matches the path itself and paths below it (`/api/users/`).
+        HEADERS: set `X-RateLimit-Limit/Remaining/Reset` headers on responses
+            and `Retry-After` when rate limit is exceeded. Defaults to `False`.
+        LEASE: spend fixed window hits reserved by the process in blocks,
+            reduces storage round trips for hot keys at the cost of accuracy.
+            Defaults to `False`.
+        STRIPES: split counters of `fixed-window` limits into multiple keys,
+            spreads increments of hot keys between cache servers. Defaults to `1`.
+        MODE: `hit` consumes rate limits before the response, `deferred` only checks them
+            and consumes them in background after the response if `count_if` returns `True`.
+            Defaults to `hit`.
+        CONCURRENCY_LIMIT: maximum number of concurrent requests per `keys_for`,
+            see `concurrency_limit_for`. Defaults to `None` (not limited).
+        CONCURRENCY_TIMEOUT: concurrency slot lease time in seconds. Defaults to `60`.
+        ON_LIMIT: `reject` responds immediately when rate limit is exceeded,
+            `wait` delays the request until the limit is reset. Defaults to `reject`.
+        MAX_WAIT: with `wait`, maximum delay in seconds. Defaults to `5`.
+        COST: number of hits consumed by a request, see `cost_for`. Defaults to `1`.
+        RESPONSE_COST: callable object that takes a request and a response and returns
+            the number of hits consumed in background after the response
+            (i.e. `ResponseSize()`, `QueryCount()` from `django_ratelimiter.costs`),
+            see `response_cost_for`. Defaults to `None`.
     """
 
+    sync_capable = True
+    async_capable = True
+
     STRATEGY: str = "fixed-window"
+    RULES: ClassVar[dict[str, Union[str, Rule]]] = {}
+    HEADERS: bool = False
+    LEASE: bool = False
+    STRIPES: int = 1
+    MODE: Literal["hit", "deferred"] = "hit"
+    CONCURRENCY_LIMIT: Optional[int] = None
+    CONCURRENCY_TIMEOUT: int = 60
+    ON_LIMIT: Literal["reject", "wait"] = "reject"
+    MAX_WAIT: float = 5.0
+    COST: int = 1
+    RESPONSE_COST: Optional[ResponseCost] = None
 
-    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+    def __init__(
+        self,
+        get_response: Callable[
+            [HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]
+        ],
+    ) -> None:
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.name = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        # identifiers are replaced with compact digests once, if enabled
+        compact = use_compact_keys()
+        self.identifier = compact_identifier([self.name]) if compact else self.name
+        get_exemptions()  # compiled once, on startup
+        self.path_rules: dict[str, CompiledRule] = {}
+        self.name_rules: dict[str, CompiledRule] = {}
+        for name, rule in self.RULES.items():
+            rule = Rule(rule) if isinstance(rule, str) else rule
+            compiled = CompiledRule(
+                name,
+                parse_rates(rule.rate),
+                rule.strategy,
+                compile_key(rule.key),
+                compact_identifier([name]) if compact else name,
+            )
+            if name.startswith("/"):
+                self.path_rules[name] = compiled
+            else:
+                self.name_rules[name] = compiled
+        for name, compiled in list(self.path_rules.items()):
+            # a prefix without a trailing slash also matches paths below it
+            if not name.endswith("/"):
+                self.path_rules.setdefault(f"{name}/", compiled)
+        self.view_name_for = lru_cache(maxsize=1024)(self._view_name_for)
 
     def storage_for(self, request: HttpRequest) -> Storage:
         """Override to set non-default storage."""
         return get_storage()
 
+    def async_storage_for(self, request: HttpRequest) -> AsyncStorage:
+        """Override to set non-default async storage."""
+        return get_async_storage()
+
     def strategy_for(self, request: HttpRequest) -> str:
         """Override to customize strategy (i.e., based on a request path, method)"""
         return self.STRATEGY
 
+    def stripes_for(self, strategy: str) -> int:
+        """Counter stripes are only used with `fixed-window` strategy."""
+        return self.STRIPES if strategy == "fixed-window" else 1
+
     def keys_for(self, request: HttpRequest) -> list[str]:
         """By default, this will use middleware name for all requests,
         effectively this means global rate limiting for all requests.
 
         Override this method to rate-limit based on a request attribute like a path, user, etc.
         """
-        return [f"{self.__class__.__module__}.{self.__class__.__qualname__}"]
+        return [self.identifier]
 
     def ratelimit_response(self, request: HttpRequest) -> HttpResponse:
         """Override to return a custom response when rate limit is exceeded."""
         return HttpResponse("Too Many Requests", status=429)
 
-    @abc.abstractmethod
-    def rate_for(self, request: HttpRequest) -> Optional[str]:
-        """Returns a rate for given request.
+    def rate_for(self, request: HttpRequest) -> Optional[Rate]:
+        """Returns a rate for given request, used when none of `RULES` match.
+        Multiple rates can be returned (i.e. `10/second;500/hour` or a list).
 
         If `None` is returned, request is not rate-limited.
         """
+        return None
+
+    def rule_for(self, request: HttpRequest) -> Optional[CompiledRule]:
+        """Returns a matching rule from `RULES` for given request."""
+        path = request.path_info
+        if self.path_rules:
+            if rule := self.path_rules.get(path):
+                return rule
+            end = len(path)
+            while (end := path.rfind("/", 0, end)) >= 0:
+                if rule := self.path_rules.get(path[: end + 1]):
+                    return rule
+        if self.name_rules:
+            if view_name := self.view_name_for(path, getattr(request, "urlconf", None)):
+                return self.name_rules.get(view_name)
+        return None
 
-    def __call__(self, request: HttpRequest) -> HttpResponse:
+    def _view_name_for(self, path: str, urlconf: Optional[str]) -> Optional[str]:
+        try:
+            return resolve(path, urlconf).view_name
+        except Resolver404:
+            return None
+
+    def limit_for(
+        self, request: HttpRequest
+    ) -> Optional[tuple[tuple[RateLimitItem, ...], str, list[str]]]:
+        """Returns rate limit items, strategy and keys for given request,
+        or `None` if request is not rate-limited."""
+        if rule := self.rule_for(request):
+            keys = [*self.keys_for(request), rule.identifier]
+            if rule.key_func:
+                keys.append(rule.key_func(request))
+            return rule.items, rule.strategy or self.strategy_for(request), keys
         if rate := self.rate_for(request):
-            parsed_rate = parse(rate)
-            keys = self.keys_for(request)
-            strategy = self.strategy_for(request)
-            storage = self.storage_for(request)
-            rate_limiter = get_rate_limiter(strategy, storage)
-            if not rate_limiter.hit(parsed_rate, *keys):
-                return self.ratelimit_response(request)
-        return self.get_response(request)
+            return parse_rates(rate), self.strategy_for(request), self.keys_for(request)
+        return None
+
+    def concurrency_limit_for(self, request: HttpRequest) -> Optional[int]:
+        """Override to limit concurrent requests (i.e. based on a request path)."""
+        return self.CONCURRENCY_LIMIT
+
+    def get_limited_response(self, request: HttpRequest) -> HttpResponse:
+        """Returns a response of the view, if concurrency limit is not reached."""
+        limit = self.concurrency_limit_for(request)
+        if limit is None:
+            return self.get_response(request)  # type: ignore[return-value]
+        storage = get_semaphore_storage()
+        lease = storage.acquire_semaphore(
+            semaphore_key(self.keys_for(request)), limit, self.CONCURRENCY_TIMEOUT
+        )
+        if lease is None:
+            return self.ratelimit_response(request)
+        try:
+            return self.get_response(request)  # type: ignore[return-value]
+        finally:
+            storage.release_semaphore(*lease)
+
+    async def aget_limited_response(self, request: HttpRequest) -> HttpResponse:
+        """Async version of `get_limited_response`."""
+        limit = self.concurrency_limit_for(request)
+        if limit is None:
+            return await self.get_response(request)  # type: ignore[misc]
+        storage = get_async_semaphore_storage()
+        lease = await storage.acquire_semaphore(
+            semaphore_key(self.keys_for(request)), limit, self.CONCURRENCY_TIMEOUT
+        )
+        if lease is None:
+            return self.ratelimit_response(request)
+        try:
+            return await self.get_response(request)  # type: ignore[misc]
+        finally:
+            await storage.release_semaphore(*lease)
+
+    def count_if(self, request: HttpRequest, response: HttpResponse) -> bool:
+        """Override to count only some of the requests in `deferred` mode
+        (i.e. responses with 4xx status)."""
+        return True
+
+    def cost_for(self, request: HttpRequest) -> int:
+        """Override to charge requests differently (i.e. bulk endpoints)."""
+        return self.COST
+
+    def response_cost_for(self, request: HttpRequest, response: HttpResponse) -> int:
+        """Override to charge requests based on the response, hits are consumed
+        in background after the response."""
+        if self.RESPONSE_COST is None:
+            return 0
+        return self.RESPONSE_COST(request, response)
+
+    def name_for(self, request: HttpRequest) -> str:
+        """Name of the limit sent with `ratelimit_checked` signal,
+        a rule name or the middleware name."""
+        if rule := self.rule_for(request):
+            return rule.name
+        return self.name
+
+    def check(
+        self,
+        rate_limiter: RateLimiter,
+        items: tuple[RateLimitItem, ...],
+        keys: list[str],
+        cost: int,
+    ) -> tuple[bool, Optional[RateLimitResult]]:
+        if self.MODE == "deferred":
+            return can_hit_all(rate_limiter, items, *keys, cost=cost), None
+        if self.ON_LIMIT == "wait":
+            result = hit_all_or_wait(
+                rate_limiter,
+                items,
+                *keys,
+                cost=cost,
+                lease=self.LEASE,
+                max_wait=self.MAX_WAIT,
+            )
+            return result.allowed, result if self.HEADERS else None
+        if self.HEADERS:
+            result = hit_all_with_stats(
+                rate_limiter, items, *keys, cost=cost, lease=self.LEASE
+            )
+            return result.allowed, result
+        return hit_all(rate_limiter, items, *keys, cost=cost, lease=self.LEASE), None
+
+    async def acheck(
+        self,
+        rate_limiter: AsyncRateLimiter,
+        items: tuple[RateLimitItem, ...],
+        keys: list[str],
+        cost: int,
+    ) -> tuple[bool, Optional[RateLimitResult]]:
+        if self.MODE == "deferred":
+            return await acan_hit_all(rate_limiter, items, *keys, cost=cost), None
+        if self.ON_LIMIT == "wait":
+            result = await ahit_all_or_wait(
+                rate_limiter,
+                items,
+                *keys,
+                cost=cost,
+                lease=self.LEASE,
+                max_wait=self.MAX_WAIT,
+            )
+            return result.allowed, result if self.HEADERS else None
+        if self.HEADERS:
+            result = await ahit_all_with_stats(
+                rate_limiter, items, *keys, cost=cost, lease=self.LEASE
+            )
+            return result.allowed, result
+        return (
+            await ahit_all(rate_limiter, items, *keys, cost=cost, lease=self.LEASE),
+            None,
+        )
+
+    def __call__(
+        self, request: HttpRequest
+    ) -> Union[HttpResponse, Awaitable[HttpResponse]]:
+        if self.async_mode:
+            return self.__acall__(request)
+        if is_exempt(request) or not (limit := self.limit_for(request)):
+            return self.get_limited_response(request)
+        items, strategy, keys = limit
+        rate_limiter = get_rate_limiter(
+            strategy, self.storage_for(request), self.stripes_for(strategy)
+        )
+        cost = self.cost_for(request)
+        if is_observed():
+            allowed, result = observe(
+                self.__class__,
+                lambda: self.check(rate_limiter, items, keys, cost),
+                request,
+                self.name_for(request),
+                strategy,
+                tuple(keys),
+            )
+        else:
+            allowed, result = self.check(rate_limiter, items, keys, cost)
+        if not allowed:
+            return set_ratelimit_headers(self.ratelimit_response(request), result)
+        with tracked(self.RESPONSE_COST, request):
+            response = self.get_limited_response(request)
+        if self.MODE != "deferred":
+            cost = 0
+        elif not self.count_if(request, response):
+            return response
+        if (cost := cost + self.response_cost_for(request, response)) > 0:
+            get_deferred_hits().add(rate_limiter, items, tuple(keys), cost)
+        return set_ratelimit_headers(response, result)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if is_exempt(request) or not (limit := self.limit_for(request)):
+            return await self.aget_limited_response(request)
+        items, strategy, keys = limit
+        rate_limiter = get_async_rate_limiter(
+            strategy, self.async_storage_for(request), self.stripes_for(strategy)
+        )
+        cost = self.cost_for(request)
+        if is_observed():
+            allowed, result = await aobserve(
+                self.__class__,
+                lambda: self.acheck(rate_limiter, items, keys, cost),
+                request,
+                self.name_for(request),
+                strategy,
+                tuple(keys),
+            )
+        else:
+            allowed, result = await self.acheck(rate_limiter, items, keys, cost)
+        if not allowed:
+            return set_ratelimit_headers(self.ratelimit_response(request), result)
+        response = await self.aget_limited_response(request)
+        if self.MODE != "deferred":
+            cost = 0
+        elif not self.count_if(request, response):
+            return response
+        if (cost := cost + self.response_cost_for(request, response)) > 0:
+            get_async_deferred_hits().add(rate_limiter, items, tuple(keys), cost)
+        return set_ratelimit_headers(response, result)
@@ -0,0 +1,11 @@
+from django.db import models
+
+
+class RateLimitCounter(models.Model):
+    """Fixed window counter of `DatabaseStorage`."""
+
+    key: "models.CharField[str, str]" = models.CharField(
+        max_length=255, primary_key=True
+    )
+    count: "models.BigIntegerField[int, int]" = models.BigIntegerField()
+    expires: "models.FloatField[float, float]" = models.FloatField(db_index=True)
@@ -0,0 +1,67 @@
+"""Prometheus metrics of rate limit checks, requires `prometheus-client` package.
+
+Metrics are collected once `connect()` is called (i.e. in `AppConfig.ready`)
+and exposed by `prometheus_client` in the process, i.e. with `start_http_server`.
+"""
+
+from typing import Any, Optional
+
+from django.http import HttpRequest
+from prometheus_client import Counter, Histogram
+
+from django_ratelimiter.signals import ratelimit_checked, ratelimit_error
+from django_ratelimiter.utils import RateLimitResult
+
+CHECKS = Counter(
+    "django_ratelimiter_checks",
+    "Rate limit checks by limit name, strategy and outcome",
+    ["name", "strategy", "outcome"],
+)
+DURATION = Histogram(
+    "django_ratelimiter_check_duration_seconds",
+    "Duration of rate limit checks, including storage calls",
+    ["strategy"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1),
+)
+USAGE = Histogram(
+    "django_ratelimiter_usage_ratio",
+    "Fraction of the limit used by the key, only observed with results (i.e. headers)",
+    ["name"],
+    buckets=(0.25, 0.5, 0.75, 0.9, 1),
+)
+ERRORS = Counter(
+    "django_ratelimiter_errors",
+    "Rate limit checks failed with an exception",
+    ["name", "strategy"],
+)
+
+
+def on_checked(
+    sender: Any,
+    request: HttpRequest,
+    name: str,
+    strategy: str,
+    allowed: bool,
+    result: Optional[RateLimitResult],
+    duration: float,
+    **kwargs: Any,
+) -> None:
+    CHECKS.labels(name, strategy, "allowed" if allowed else "limited").inc()
+    DURATION.labels(strategy).observe(duration)
+    if result is not None:
+        USAGE.labels(name).observe(1 - result.remaining / result.item.amount)
+
+
+def on_error(sender: Any, name: str, strategy: str, **kwargs: Any) -> None:
+    ERRORS.labels(name, strategy).inc()
+
+
+def connect() -> None:
+    """Starts collecting metrics of rate limit checks."""
+    ratelimit_checked.connect(on_checked, dispatch_uid="django_ratelimiter.prometheus")
+    ratelimit_error.connect(on_error, dispatch_uid="django_ratelimiter.prometheus")
+
+
+def disconnect() -> None:
+    ratelimit_checked.disconnect(dispatch_uid="django_ratelimiter.prometheus")
+    ratelimit_error.disconnect(dispatch_uid="django_ratelimiter.prometheus")
@@ -0,0 +1,311 @@
+import asyncio
+import bisect
+import hashlib
+from typing import Optional, Sequence, TypeVar, Union
+
+from limits.aio.storage import Storage as AsyncStorage
+from limits.storage import Storage
+
+from django_ratelimiter.storage import AsyncCacheStorage, CacheStorage
+
+T = TypeVar("T")
+
+
+def ring_hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class HashRing:
+    """Consistent hash ring of nodes, each node is placed on the ring `replicas` times.
+
+    A key belongs to the first node point following the key hash, so adding
+    or removing one of N nodes only moves about 1/N of the keys.
+    """
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 128) -> None:
+        if not nodes:
+            raise ValueError("Hash ring requires at least one node")
+        points = sorted(
+            (ring_hash(f"{node}#{replica}"), index)
+            for index, node in enumerate(nodes)
+            for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in points]
+        self.nodes = [index for _, index in points]
+
+    def node_for(self, key: str) -> int:
+        """Returns the index of the node owning the key."""
+        position = bisect.bisect(self.hashes, ring_hash(key))
+        return self.nodes[position % len(self.nodes)]
+
+    def group(self, keys: Sequence[str]) -> dict[int, list[int]]:
+        """Groups positions of the keys by index of the node owning them."""
+        groups: dict[int, list[int]] = {}
+        for position, key in enumerate(keys):
+            groups.setdefault(self.node_for(key), []).append(position)
+        return groups
+
+
+def scatter(groups: dict[int, list[int]], results: Sequence[list[T]]) -> list[T]:
+    """Puts results of grouped calls back in the order of the keys."""
+    ordered: list[Optional[T]] = [None] * sum(map(len, groups.values()))
+    for positions, values in zip(groups.values(), results):
+        for position, value in zip(positions, values):
+            ordered[position] = value
+    return ordered  # type: ignore[return-value]
+
+
+def semaphore_key(slot: str) -> str:
+    # slots of a semaphore are stored next to each other, with the semaphore key
+    return slot.rsplit("/", 1)[0]
+
+
+class ShardedCacheStorage(Storage):
+    """Rate limiting storage spread across multiple django caches.
+
+    Each key is stored by a `CacheStorage` of the cache chosen by consistent hashing,
+    so hits for a key always go to the same cache and adding a cache
+    moves only a fraction of the keys. Batched calls (i.e. `incr_many`)
+    take one call per cache owning the keys. Sliding windows, GCRA and
+    semaphore slots of a key are stored together.
+    """
+
+    def __init__(
+        self,
+        caches: Sequence[str],
+        wrap_exceptions: bool = False,
+        generation_ttl: float = 1.0,
+        **options: Union[float, str, bool],
+    ) -> None:
+        self.shards = [
+            CacheStorage(cache, generation_ttl=generation_ttl) for cache in caches
+        ]
+        self.ring = HashRing(caches)
+        super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return Exception
+
+    def shard_for(self, key: str) -> CacheStorage:
+        return self.shards[self.ring.node_for(key)]
+
+    def get(self, key: str) -> int:
+        return self.shard_for(key).get(key)
+
+    def get_many(self, keys: Sequence[str]) -> list[int]:
+        groups = self.ring.group(keys)
+        return scatter(
+            groups,
+            [
+                self.shards[shard].get_many([keys[position] for position in positions])
+                for shard, positions in groups.items()
+            ],
+        )
+
+    def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        return self.shard_for(key).incr(key, expiry, elastic_expiry, amount)
+
+    def incr_many(
+        self, entries: Sequence[tuple[str, int]], amount: int = 1
+    ) -> list[tuple[int, int]]:
+        groups = self.ring.group([key for key, _ in entries])
+        return scatter(
+            groups,
+            [
+                self.shards[shard].incr_many(
+                    [entries[position] for position in positions], amount
+                )
+                for shard, positions in groups.items()
+            ],
+        )
+
+    def decr_many(self, keys: Sequence[str], amount: int = 1) -> None:
+        for shard, positions in self.ring.group(keys).items():
+            self.shards[shard].decr_many(
+                [keys[position] for position in positions], amount
+            )
+
+    def get_expiry(self, key: str) -> float:
+        return self.shard_for(key).get_expiry(key)
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> tuple[int, float, int, float]:
+        return self.shard_for(key).get_sliding_window(key, expiry)
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        return self.shard_for(key).acquire_sliding_window_entry(
+            key, limit, expiry, amount
+        )
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.shard_for(key).clear_sliding_window(key, expiry)
+
+    def acquire_gcra_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        return self.shard_for(key).acquire_gcra_entry(key, limit, expiry, amount)
+
+    def get_gcra(self, key: str) -> float:
+        return self.shard_for(key).get_gcra(key)
+
+    def acquire_semaphore(
+        self, key: str, limit: int, timeout: int
+    ) -> Optional[tuple[str, str]]:
+        return self.shard_for(key).acquire_semaphore(key, limit, timeout)
+
+    def release_semaphore(self, slot: str, token: str) -> None:
+        self.shard_for(semaphore_key(slot)).release_semaphore(slot, token)
+
+    def check(self) -> bool:
+        return all(shard.check() for shard in self.shards)
+
+    def reset(self) -> Optional[int]:
+        for shard in self.shards:
+            shard.reset()
+        return None
+
+    def clear(self, key: str) -> None:
+        self.shard_for(key).clear(key)
+
+
+class AsyncShardedCacheStorage(AsyncStorage):
+    """Async version of `ShardedCacheStorage`, calls to different caches
+    of a batch are made concurrently."""
+
+    def __init__(
+        self,
+        caches: Sequence[str],
+        wrap_exceptions: bool = False,
+        generation_ttl: float = 1.0,
+        **options: Union[float, str, bool],
+    ) -> None:
+        self.shards = [
+            AsyncCacheStorage(cache, generation_ttl=generation_ttl) for cache in caches
+        ]
+        self.ring = HashRing(caches)
+        super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return Exception
+
+    def shard_for(self, key: str) -> AsyncCacheStorage:
+        return self.shards[self.ring.node_for(key)]
+
+    async def get(self, key: str) -> int:
+        return await self.shard_for(key).get(key)
+
+    async def get_many(self, keys: Sequence[str]) -> list[int]:
+        groups = self.ring.group(keys)
+        return scatter(
+            groups,
+            await asyncio.gather(
+                *(
+                    self.shards[shard].get_many(
+                        [keys[position] for position in positions]
+                    )
+                    for shard, positions in groups.items()
+                )
+            ),
+        )
+
+    async def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        return await self.shard_for(key).incr(key, expiry, elastic_expiry, amount)
+
+    async def incr_many(
+        self, entries: Sequence[tuple[str, int]], amount: int = 1
+    ) -> list[tuple[int, int]]:
+        groups = self.ring.group([key for key, _ in entries])
+        return scatter(
+            groups,
+            await asyncio.gather(
+                *(
+                    self.shards[shard].incr_many(
+                        [entries[position] for position in positions], amount
+                    )
+                    for shard, positions in groups.items()
+                )
+            ),
+        )
+
+    async def decr_many(self, keys: Sequence[str], amount: int = 1) -> None:
+        await asyncio.gather(
+            *(
+                self.shards[shard].decr_many(
+                    [keys[position] for position in positions], amount
+                )
+                for shard, positions in self.ring.group(keys).items()
+            )
+        )
+
+    async def get_expiry(self, key: str) -> float:
+        return await self.shard_for(key).get_expiry(key)
+
+    async def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> tuple[int, float, int, float]:
+        return await self.shard_for(key).get_sliding_window(key, expiry)
+
+    async def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        return await self.shard_for(key).acquire_sliding_window_entry(
+            key, limit, expiry, amount
+        )
+
+    async def clear_sliding_window(self, key: str, expiry: int) -> None:
+        await self.shard_for(key).clear_sliding_window(key, expiry)
+
+    async def acquire_gcra_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        return await self.shard_for(key).acquire_gcra_entry(key, limit, expiry, amount)
+
+    async def get_gcra(self, key: str) -> float:
+        return await self.shard_for(key).get_gcra(key)
+
+    async def acquire_semaphore(
+        self, key: str, limit: int, timeout: int
+    ) -> Optional[tuple[str, str]]:
+        return await self.shard_for(key).acquire_semaphore(key, limit, timeout)
+
+    async def release_semaphore(self, slot: str, token: str) -> None:
+        await self.shard_for(semaphore_key(slot)).release_semaphore(slot, token)
+
+    async def check(self) -> bool:
+        return all(await asyncio.gather(*(shard.check() for shard in self.shards)))
+
+    async def reset(self) -> Optional[int]:
+        await asyncio.gather(*(shard.reset() for shard in self.shards))
+        return None
+
+    async def clear(self, key: str) -> None:
+        await self.shard_for(key).clear(key)
+
+
+def cache_storage(
+    cache: Union[str, Sequence[str]]
+) -> Union[CacheStorage, ShardedCacheStorage]:
+    """Returns a storage of a cache name, or a sharded storage of a list of cache names."""
+    if isinstance(cache, str):
+        return CacheStorage(cache)
+    return ShardedCacheStorage(cache)
+
+
+def async_cache_storage(
+    cache: Union[str, Sequence[str]],
+) -> Union[AsyncCacheStorage, AsyncShardedCacheStorage]:
+    """Async version of `cache_storage`."""
+    if isinstance(cache, str):
+        return AsyncCacheStorage(cache)
+    return AsyncShardedCacheStorage(cache)
@@ -0,0 +1,246 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+from limits.aio.storage import Storage as AsyncStorage
+from limits.storage import Storage
+
+MAGIC = b"DJRLSHM1"
+# magic, number of buckets, slots per bucket
+HEADER = struct.Struct("<8sII")
+# key digest, counter, expiry timestamp
+SLOT = struct.Struct("<16sqd")
+EMPTY_SLOT = bytes(SLOT.size)
+
+
+class SharedFile:
+    """Descriptor and thread locks of a storage file, shared by storages
+    of the process using the file.
+
+    `fcntl` locks are owned by the process, so storages of the same file
+    must also share thread locks, otherwise unlocking a stripe by one storage
+    releases the lock still held by another one.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.thread_locks: list[threading.Lock] = []
+
+    def add_locks(self, stripes: int) -> None:
+        """Adds thread locks, so there is one for each of `stripes` stripes."""
+        with shared_files_lock:
+            while len(self.thread_locks) < stripes:
+                self.thread_locks.append(threading.Lock())
+
+
+# real path -> file shared by storages of the process
+shared_files: dict[str, SharedFile] = {}
+shared_files_lock = threading.Lock()
+
+
+def shared_file(path: str) -> SharedFile:
+    real_path = os.path.realpath(path)
+    with shared_files_lock:
+        if real_path not in shared_files:
+            shared_files[real_path] = SharedFile(path)
+        return shared_files[real_path]
+
+
+def reset_thread_locks() -> None:
+    # locks held by other threads while forking are never released in the child
+    global shared_files_lock
+    shared_files_lock = threading.Lock()
+    for file in shared_files.values():
+        for index in range(len(file.thread_locks)):
+            file.thread_locks[index] = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_thread_locks)
+
+
+class SharedMemoryStorage(Storage):
+    """Rate limiting storage in a memory mapped file, shared by worker processes of a host.
+
+    Counters are kept in a fixed size hash table of `capacity` slots grouped in
+    buckets of `ways` slots, a key is stored in one of the slots of its bucket.
+    Expired slots are reused and when all slots of a bucket are taken,
+    the slot which expires first is evicted.
+
+    Buckets are guarded by `stripes` locks, each is a `fcntl` lock of a byte range
+    of the file (between processes) and a thread lock (between threads of a process).
+    Storages of the same file in a process share the file descriptor and thread locks.
+    The file is created by the first process and must use the same `capacity` and `ways`
+    in all processes, a path in `/dev/shm` keeps it in memory.
+    """
+
+    def __init__(
+        self,
+        path: str = "/dev/shm/django-ratelimiter",
+        capacity: int = 65536,
+        ways: int = 8,
+        stripes: int = 64,
+        wrap_exceptions: bool = False,
+        **options: Union[float, str, bool],
+    ) -> None:
+        self.path = path
+        self.ways = ways
+        self.buckets = math.ceil(capacity / ways)
+        self.stripes = stripes
+        self.size = HEADER.size + self.buckets * ways * SLOT.size
+        self.file = shared_file(path)
+        self.file.add_locks(stripes)
+        self.fd = self.file.fd
+        self._init_file()
+        self.mmap = mmap.mmap(self.fd, self.size)
+        super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
+
+    def _init_file(self) -> None:
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, HEADER.size, 0)
+        try:
+            header = os.pread(self.fd, HEADER.size, 0)
+            if len(header) < HEADER.size:
+                os.ftruncate(self.fd, self.size)
+                os.pwrite(self.fd, HEADER.pack(MAGIC, self.buckets, self.ways), 0)
+            elif HEADER.unpack(header) != (MAGIC, self.buckets, self.ways):
+                raise ValueError(
+                    f"{self.path} is not a shared memory storage "
+                    f"with {self.buckets * self.ways} slots"
+                )
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, HEADER.size, 0)
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return OSError
+
+    @contextmanager
+    def _locked(self, stripe: int, count: int = 1) -> Iterator[None]:
+        # stripe locks are placed after the end of the file, locks don't affect mapped memory
+        locks = self.file.thread_locks[stripe : stripe + count]
+        for lock in locks:
+            lock.acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, count, self.size + stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, count, self.size + stripe)
+        finally:
+            for lock in locks:
+                lock.release()
+
+    def _bucket(self, key: str) -> tuple[bytes, int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        return digest, int.from_bytes(digest[:8], "little") % self.buckets
+
+    def _slots(self, bucket: int) -> range:
+        start = HEADER.size + bucket * self.ways * SLOT.size
+        return range(start, start + self.ways * SLOT.size, SLOT.size)
+
+    def _find(
+        self, digest: bytes, bucket: int, now: float
+    ) -> tuple[int, int, float, bool]:
+        """Returns `(offset, counter, expires, found)` of the key slot,
+        or a free (or evicted) slot if the key is not found."""
+        victim, victim_expires = 0, math.inf
+        for offset in self._slots(bucket):
+            slot_digest, count, expires = SLOT.unpack_from(self.mmap, offset)
+            if slot_digest == digest:
+                if expires > now:
+                    return offset, count, expires, True
+                return offset, 0, 0.0, False
+            if expires < victim_expires:
+                victim, victim_expires = offset, expires
+        return victim, 0, 0.0, False
+
+    def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        digest, bucket = self._bucket(key)
+        with self._locked(bucket % self.stripes):
+            now = time.time()
+            offset, count, expires, found = self._find(digest, bucket, now)
+            if not found or elastic_expiry:
+                expires = now + expiry
+            SLOT.pack_into(self.mmap, offset, digest, count + amount, expires)
+        return count + amount
+
+    def get(self, key: str) -> int:
+        digest, bucket = self._bucket(key)
+        with self._locked(bucket % self.stripes):
+            return self._find(digest, bucket, time.time())[1]
+
+    def get_expiry(self, key: str) -> float:
+        digest, bucket = self._bucket(key)
+        now = time.time()
+        with self._locked(bucket % self.stripes):
+            _, _, expires, found = self._find(digest, bucket, now)
+        return expires if found else now
+
+    def check(self) -> bool:
+        return not self.mmap.closed
+
+    def reset(self) -> Optional[int]:
+        with self._locked(0, self.stripes):
+            now = time.time()
+            cleared = 0
+            for offset in range(HEADER.size, self.size, SLOT.size):
+                if SLOT.unpack_from(self.mmap, offset)[2] > now:
+                    cleared += 1
+            self.mmap[HEADER.size : self.size] = bytes(self.size - HEADER.size)
+        return cleared
+
+    def clear(self, key: str) -> None:
+        digest, bucket = self._bucket(key)
+        with self._locked(bucket % self.stripes):
+            offset, _, _, found = self._find(digest, bucket, time.time())
+            if found:
+                self.mmap[offset : offset + SLOT.size] = EMPTY_SLOT
+
+
+class AsyncSharedMemoryStorage(AsyncStorage):
+    """Async version of `SharedMemoryStorage`, storage calls don't do any I/O
+    and are executed in the event loop."""
+
+    def __init__(
+        self,
+        path: str = "/dev/shm/django-ratelimiter",
+        capacity: int = 65536,
+        ways: int = 8,
+        stripes: int = 64,
+        wrap_exceptions: bool = False,
+        **options: Union[float, str, bool],
+    ) -> None:
+        self.storage = SharedMemoryStorage(path, capacity, ways, stripes)
+        super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return OSError
+
+    async def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        return self.storage.incr(key, expiry, elastic_expiry, amount)
+
+    async def get(self, key: str) -> int:
+        return self.storage.get(key)
+
+    async def get_expiry(self, key: str) -> float:
+        return self.storage.get_expiry(key)
+
+    async def check(self) -> bool:
+        return self.storage.check()
+
+    async def reset(self) -> Optional[int]:
+        return self.storage.reset()
+
+    async def clear(self, key: str) -> None:
+        self.storage.clear(key)
@@ -0,0 +1,83 @@
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from django.dispatch import Signal
+from django.http import HttpRequest
+
+from django_ratelimiter.utils import RateLimitResult
+
+Decision = tuple[bool, Optional[RateLimitResult]]
+
+# Sent after a rate limit check with `request`, `name` (view or rule name),
+# `strategy`, `identifiers`, `allowed`, `result` (if computed, i.e. with headers)
+# and `duration` of the check in seconds.
+ratelimit_checked = Signal()
+
+# Sent when a rate limit check raised an exception, with `request`, `name`,
+# `strategy` and `exception`. The exception is raised after the signal.
+ratelimit_error = Signal()
+
+
+def is_observed() -> bool:
+    """Checks are only timed if there are receivers."""
+    return bool(ratelimit_checked.receivers or ratelimit_error.receivers)
+
+
+def observe(
+    sender: Any,
+    check: Callable[[], Decision],
+    request: HttpRequest,
+    name: str,
+    strategy: str,
+    identifiers: tuple[str, ...],
+) -> Decision:
+    """Runs a rate limit check and sends signals with its outcome."""
+    started = time.perf_counter()
+    try:
+        allowed, result = check()
+    except Exception as exc:
+        ratelimit_error.send(
+            sender, request=request, name=name, strategy=strategy, exception=exc
+        )
+        raise
+    ratelimit_checked.send(
+        sender,
+        request=request,
+        name=name,
+        strategy=strategy,
+        identifiers=identifiers,
+        allowed=allowed,
+        result=result,
+        duration=time.perf_counter() - started,
+    )
+    return allowed, result
+
+
+async def aobserve(
+    sender: Any,
+    check: Callable[[], Awaitable[Decision]],
+    request: HttpRequest,
+    name: str,
+    strategy: str,
+    identifiers: tuple[str, ...],
+) -> Decision:
+    """Async version of `observe`."""
+    started = time.perf_counter()
+    try:
+        allowed, result = await check()
+    except Exception as exc:
+        ratelimit_error.send(
+            sender, request=request, name=name, strategy=strategy, exception=exc
+        )
+        raise
+    ratelimit_checked.send(
+        sender,
+        request=request,
+        name=name,
+        strategy=strategy,
+        identifiers=identifiers,
+        allowed=allowed,
+        result=result,
+        duration=time.perf_counter() - started,
+    )
+    return allowed, result
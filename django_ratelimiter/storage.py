@@ -1,46 +1,468 @@
+import asyncio
+import copy
+import hashlib
+import math
+import random
 import time
-from typing import Union, Optional
+import uuid
+import weakref
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Optional, Sequence, Union
 
+from asgiref.sync import sync_to_async
+from django.apps import apps
 from django.core.cache import caches, BaseCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    IntegrityError,
+    connections,
+    transaction,
+)
 
+from limits.aio.storage import Storage as AsyncStorage
 from limits.storage import Storage
 
+from django_ratelimiter.strategies import sliding_window_keys, weighted_count
+
+if TYPE_CHECKING:
+    from django_ratelimiter.models import RateLimitCounter
+
+GENERATION_KEY = "django-ratelimiter-generation"
+
+COUNT_BITS = 31
+COUNT_MASK = (1 << COUNT_BITS) - 1
+
+
+def pack(count: int, expires: float) -> int:
+    """Pack a counter and window expiry timestamp into a single integer.
+
+    Counter takes the low `COUNT_BITS` bits, so cache `incr` updates the counter
+    and returns the window expiry in the same round trip.
+    """
+    return (math.ceil(expires) << COUNT_BITS) | count
+
+
+def unpack(value: int) -> tuple[int, int]:
+    """Unpack a value created by `pack` into a counter and window expiry timestamp."""
+    return value & COUNT_MASK, value >> COUNT_BITS
+
+
+def redis_incr(
+    cache: RedisCache,
+    entries: Sequence[tuple[str, int]],
+    amount: int,
+    elastic_expiry: bool = False,
+) -> list[int]:
+    """Increment packed counters for `(key, expiry)` entries using the client of django redis cache.
+
+    Creates the windows and increments the counters in a single MULTI/EXEC round trip,
+    with elastic expiry the TTL of the keys is moved in the same round trip.
+    Lua scripts are not used since packed values don't fit into Lua numbers.
+    """
+    keys = [cache.make_and_validate_key(key) for key, _ in entries]
+    client = cache._cache.get_client(keys[0], write=True)
+    with client.pipeline() as pipe:
+        results = queue_redis_incr(pipe, keys, entries, amount, elastic_expiry)
+        return pipe.execute()[results]
+
+
+def queue_redis_incr(
+    pipe: Any,
+    keys: Sequence[str],
+    entries: Sequence[tuple[str, int]],
+    amount: int,
+    elastic_expiry: bool,
+) -> slice:
+    """Queues commands of `redis_incr` into a sync or async pipeline,
+    returns the slice of pipeline results with the counters."""
+    now = time.time()
+    for cache_key, (_, expiry) in zip(keys, entries):
+        pipe.set(cache_key, pack(0, now + expiry), ex=expiry, nx=True)
+        pipe.incrby(cache_key, amount)
+        if elastic_expiry:
+            pipe.expire(cache_key, expiry)
+    return slice(1, None, 3 if elastic_expiry else 2)
+
+
+def redis_expiry(cache: RedisCache, key: str) -> float:
+    """Returns window expiry timestamp of a packed counter and the TTL of the key
+    read in a single round trip, see `window_expiry`."""
+    cache_key = cache.make_and_validate_key(key)
+    client = cache._cache.get_client(cache_key)
+    with client.pipeline() as pipe:
+        pipe.get(cache_key)
+        pipe.pttl(cache_key)
+        value, ttl = pipe.execute()
+    return window_expiry(value, ttl)
+
+
+def window_expiry(value: Optional[bytes], ttl: int) -> float:
+    """Returns window expiry timestamp of a packed counter stored in redis.
+
+    Packed expiry is not moved by elastic expiry in `redis_incr`,
+    so the expiry of the key is used when it's later.
+    """
+    now = time.time()
+    if value is None:
+        return now
+    return max(unpack(int(value))[1], now + max(ttl, 0) / 1000)
+
+
+REDIS_DECR_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('DECRBY', key, ARGV[1])
+    end
+end
+"""
+
+
+def redis_decr(cache: RedisCache, keys: Sequence[str], amount: int) -> None:
+    """Decrement existing packed counters in a single round trip,
+    expired counters are not re-created."""
+    cache_keys = [cache.make_and_validate_key(key) for key in keys]
+    client = cache._cache.get_client(cache_keys[0], write=True)
+    client.eval(REDIS_DECR_SCRIPT, len(cache_keys), *cache_keys, amount)
+
+
+REDIS_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local increment = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+tat = tat + increment
+if tat - period > now then
+    return 0
+end
+local ttl = math.ceil((tat - now) / 1000)
+redis.call('SET', KEYS[1], string.format('%d', tat), 'PX', string.format('%d', ttl))
+return 1
+"""
+
+
+def redis_gcra(
+    cache: RedisCache, key: str, now: int, increment: int, period: int
+) -> bool:
+    """Updates theoretical arrival time of GCRA in a single round trip."""
+    cache_key = cache.make_and_validate_key(key)
+    client = cache._cache.get_client(cache_key, write=True)
+    return bool(client.eval(REDIS_GCRA_SCRIPT, 1, cache_key, now, increment, period))
+
+
+REDIS_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+
+def redis_release(cache: RedisCache, slot: str, token: str) -> None:
+    """Deletes a semaphore slot if it's still leased with the token, in a single script."""
+    cache_key = cache.make_and_validate_key(slot)
+    client = cache._cache.get_client(cache_key, write=True)
+    # tokens are stored by django cache serializer
+    token_value = cache._cache._serializer.dumps(token)  # type: ignore[attr-defined]
+    client.eval(REDIS_RELEASE_SCRIPT, 1, cache_key, token_value)
+
+
+def async_redis_client(cache: RedisCache) -> Any:
+    """Returns a `redis.asyncio` client of the server django redis cache writes to,
+    with the same connection options."""
+    from redis import asyncio as aioredis
+
+    options = {
+        name: value
+        for name, value in cache._options.items()  # type: ignore[attr-defined]
+        if name not in ("pool_class", "parser_class", "serializer")
+    }
+    pool = aioredis.ConnectionPool.from_url(cache._servers[0], **options)  # type: ignore[attr-defined]
+    return aioredis.Redis(connection_pool=pool)
+
+
+async def async_redis_incr(
+    client: Any,
+    cache: RedisCache,
+    entries: Sequence[tuple[str, int]],
+    amount: int,
+    elastic_expiry: bool = False,
+) -> list[int]:
+    """Async version of `redis_incr` using a `redis.asyncio` client."""
+    keys = [cache.make_and_validate_key(key) for key, _ in entries]
+    async with client.pipeline() as pipe:
+        results = queue_redis_incr(pipe, keys, entries, amount, elastic_expiry)
+        return (await pipe.execute())[results]
+
+
+async def async_redis_expiry(client: Any, cache: RedisCache, key: str) -> float:
+    """Async version of `redis_expiry` using a `redis.asyncio` client."""
+    cache_key = cache.make_and_validate_key(key)
+    async with client.pipeline() as pipe:
+        pipe.get(cache_key)
+        pipe.pttl(cache_key)
+        value, ttl = await pipe.execute()
+    return window_expiry(value, ttl)
+
+
+async def async_redis_decr(
+    client: Any, cache: RedisCache, keys: Sequence[str], amount: int
+) -> None:
+    """Async version of `redis_decr` using a `redis.asyncio` client."""
+    cache_keys = [cache.make_and_validate_key(key) for key in keys]
+    await client.eval(REDIS_DECR_SCRIPT, len(cache_keys), *cache_keys, amount)
+
+
+async def async_redis_release(
+    client: Any, cache: RedisCache, slot: str, token: str
+) -> None:
+    """Async version of `redis_release` using a `redis.asyncio` client."""
+    cache_key = cache.make_and_validate_key(slot)
+    token_value = cache._cache._serializer.dumps(token)  # type: ignore[attr-defined]
+    await client.eval(REDIS_RELEASE_SCRIPT, 1, cache_key, token_value)
+
+
+async def async_redis_gcra(
+    client: Any, cache: RedisCache, key: str, now: int, increment: int, period: int
+) -> bool:
+    """Async version of `redis_gcra` using a `redis.asyncio` client."""
+    cache_key = cache.make_and_validate_key(key)
+    return bool(
+        await client.eval(REDIS_GCRA_SCRIPT, 1, cache_key, now, increment, period)
+    )
+
+
+def gcra_params(limit: int, expiry: int, amount: int) -> tuple[int, int, int]:
+    """Returns current time, arrival time increment of `amount` hits and the period
+    in microseconds, timestamps are stored as integers so they can be incremented."""
+    period = expiry * 1_000_000
+    return int(time.time() * 1_000_000), amount * period // limit, period
+
+
+def semaphore_slots(key: str, limit: int) -> list[str]:
+    """Returns keys of semaphore slots in random order, to spread concurrent acquires."""
+    slots = [f"{key}/{slot}" for slot in range(limit)]
+    random.shuffle(slots)
+    return slots
+
 
 class CacheStorage(Storage):
-    """Rate limiting storage with django cache backend."""
+    """Rate limiting storage with django cache backend.
+
+    Counter and window expiry are stored in a single cache key,
+    hits take one cache round trip and two when a new window starts.
+    With `RedisCache` hits always take a single round trip.
+
+    Keys are versioned by a generation stored in the cache and cached by the process
+    for `generation_ttl` seconds, `reset()` starts a new generation of keys.
+    """
 
     def __init__(
         self,
         cache: str,
         wrap_exceptions: bool = False,
+        generation_ttl: float = 1.0,
         **options: Union[float, str, bool],
     ) -> None:
-        self.cache: BaseCache = caches[cache]
+        # a copy, so versions of the keys don't affect other users of the cache
+        self.versioned_cache: BaseCache = copy.copy(caches[cache])
+        self.base_version = self.versioned_cache.version
+        self.is_redis = isinstance(self.versioned_cache, RedisCache)
+        self.generation_ttl = generation_ttl
+        self.generation_expires = 0.0
+        try:
+            self.refresh_generation(time.monotonic())
+        except Exception:
+            pass  # retried on the first call
         super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
 
+    @property
+    def cache(self) -> BaseCache:
+        """Cache with keys versioned by the current generation."""
+        if (now := time.monotonic()) >= self.generation_expires:
+            self.refresh_generation(now)
+        return self.versioned_cache
+
+    @cache.setter
+    def cache(self, cache: BaseCache) -> None:
+        self.versioned_cache = cache
+
+    def refresh_generation(self, now: float) -> None:
+        self.set_generation(
+            self.versioned_cache.get(GENERATION_KEY, 0, version=self.base_version),
+            now,
+        )
+
+    def set_generation(self, generation: int, now: float) -> None:
+        self.versioned_cache.version = self.base_version + generation
+        self.generation_expires = now + self.generation_ttl
+
     @property
     def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
         return Exception
 
     def get(self, key: str) -> int:
-        return self.cache.get(key, 0)
+        return unpack(self.cache.get(key, 0))[0]
+
+    def get_many(self, keys: Sequence[str]) -> list[int]:
+        """Returns counters of multiple keys in a single round trip."""
+        values = self.cache.get_many(keys)
+        return [unpack(values.get(key, 0))[0] for key in keys]
 
     def incr(
         self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
     ) -> int:
-        self.cache.get_or_set(key, 0, expiry)
-        self.cache.get_or_set(f"{key}/expires", time.time() + expiry, expiry)
+        if self.is_redis and expiry > 0:
+            value = redis_incr(self.cache, [(key, expiry)], amount, elastic_expiry)  # type: ignore[arg-type]
+            return unpack(value[0])[0]
+        count, expires = self._incr(key, expiry, amount)
+        if elastic_expiry and (delta := math.ceil(time.time() + expiry) - expires):
+            # django cache has no atomic incr with timeout, the expiry is moved by
+            # two more calls unless this hit created the window or it was moved
+            # in the same second
+            self.cache.incr(key, delta << COUNT_BITS)
+            self.cache.touch(key, expiry)
+        return count
+
+    def incr_many(
+        self, entries: Sequence[tuple[str, int]], amount: int = 1
+    ) -> list[tuple[int, int]]:
+        """Increment counters for `(key, expiry)` entries.
+
+        Returns counters with window expiry timestamps,
+        with `RedisCache` all counters are incremented in a single round trip.
+        """
+        if self.is_redis and all(expiry > 0 for _, expiry in entries):
+            values = redis_incr(self.cache, entries, amount)  # type: ignore[arg-type]
+            return [unpack(value) for value in values]
+        return [self._incr(key, expiry, amount) for key, expiry in entries]
+
+    def _incr(self, key: str, expiry: int, amount: int) -> tuple[int, int]:
         try:
-            value = self.cache.incr(key, amount) or amount
+            count, expires = unpack(self.cache.incr(key, amount))
         except ValueError:
-            value = amount
-        if elastic_expiry:
-            self.cache.touch(key, expiry)
-            self.cache.set(f"{key}/expires", time.time() + expiry, expiry)
-        return value
+            value = pack(amount, time.time() + expiry)
+            if self.cache.add(key, value, expiry):
+                return unpack(value)
+            count, expires = unpack(self.cache.incr(key, amount))
+        if expires and expires < time.time():
+            # backends without atomic incr (db, filebased) reset the timeout on incr
+            value = pack(amount, time.time() + expiry)
+            self.cache.set(key, value, expiry)
+            return unpack(value)
+        return count, expires
+
+    def decr_many(self, keys: Sequence[str], amount: int = 1) -> None:
+        """Decrement existing counters, used to roll back increments."""
+        if self.is_redis:
+            redis_decr(self.cache, keys, amount)  # type: ignore[arg-type]
+            return
+        for key in keys:
+            try:
+                self.cache.decr(key, amount)
+            except ValueError:
+                pass
+
+    def get_expiry(self, key: str) -> float:
+        if self.is_redis:
+            return redis_expiry(self.cache, key)  # type: ignore[arg-type]
+        return unpack(self.cache.get(key, 0))[1] or int(time.time())
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> tuple[int, float, int, float]:
+        now = time.time()
+        previous_key, current_key = sliding_window_keys(key, expiry, now)
+        values = self.cache.get_many([previous_key, current_key])
+        previous_expires_in = expiry - now % expiry
+        return (
+            unpack(values.get(previous_key, 0))[0],
+            previous_expires_in,
+            unpack(values.get(current_key, 0))[0],
+            previous_expires_in + expiry,
+        )
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        previous_count, previous_expires_in, current_count, _ = self.get_sliding_window(
+            key, expiry
+        )
+        previous_weight = weighted_count(previous_count, previous_expires_in, 0, expiry)
+        if math.floor(previous_weight + current_count) + amount > limit:
+            return False
+        _, current_key = sliding_window_keys(key, expiry, time.time())
+        # current window key is kept for one more window to be used as previous
+        current_count = self.incr(current_key, 2 * expiry, amount=amount)
+        if math.floor(previous_weight + current_count) > limit:
+            # concurrent hits were acquired since the window was read
+            self.decr_many([current_key], amount)
+            return False
+        return True
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.cache.delete_many(sliding_window_keys(key, expiry, time.time()))
+
+    def acquire_gcra_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        now, increment, period = gcra_params(limit, expiry, amount)
+        if self.is_redis:
+            return redis_gcra(self.cache, key, now, increment, period)  # type: ignore[arg-type]
+        try:
+            tat = self.cache.incr(key, increment)
+        except ValueError:
+            if self.cache.add(key, now + increment, expiry):
+                return True
+            tat = self.cache.incr(key, increment)
+        if tat - increment < now:
+            # bucket was full, arrival time is moved to the current time
+            self.cache.incr(key, now + increment - tat)
+        elif tat - period > now:
+            self.decr_many([key], increment)
+            return False
+        self.cache.touch(key, expiry)
+        return True
 
-    def get_expiry(self, key: str) -> int:
-        return int(float(self.cache.get(key + "/expires") or time.time()))
+    def get_gcra(self, key: str) -> float:
+        """Returns theoretical arrival time of GCRA."""
+        return self.cache.get(key, 0) / 1_000_000
+
+    def acquire_semaphore(
+        self, key: str, limit: int, timeout: int
+    ) -> Optional[tuple[str, str]]:
+        """Acquires one of `limit` semaphore slots for `timeout` seconds.
+
+        Returns the slot key and the lease token, or `None` if all slots are taken.
+        Slots expire separately, so slots leaked by crashed processes are recovered.
+        """
+        slots = semaphore_slots(key, limit)
+        taken = self.cache.get_many(slots)
+        token = uuid.uuid4().hex
+        for slot in slots:
+            if slot not in taken and self.cache.add(slot, token, timeout):
+                return slot, token
+        return None
+
+    def release_semaphore(self, slot: str, token: str) -> None:
+        """Releases a semaphore slot if it's still leased with the token.
+
+        With `RedisCache` the token is compared and the slot deleted atomically.
+        Other backends have no compare-and-delete, if the lease expires and the slot
+        is acquired by another request between the get and the delete,
+        the new lease is released too.
+        """
+        if self.is_redis:
+            redis_release(self.cache, slot, token)  # type: ignore[arg-type]
+        elif self.cache.get(slot) == token:
+            self.cache.delete(slot)
 
     def check(self) -> bool:
         try:
@@ -50,7 +472,497 @@ class CacheStorage(Storage):
             return False
 
     def reset(self) -> Optional[int]:
-        raise NotImplementedError
+        """Resets all limits by starting a new generation of keys,
+        keys of previous generations expire on their own.
+
+        Other processes use the new generation within `generation_ttl` seconds.
+        """
+        cache = self.versioned_cache
+        try:
+            generation = cache.incr(GENERATION_KEY, version=self.base_version)
+        except ValueError:
+            if cache.add(GENERATION_KEY, 1, None, version=self.base_version):
+                generation = 1
+            else:
+                generation = cache.incr(GENERATION_KEY, version=self.base_version)
+        self.set_generation(generation, time.monotonic())
+        return None
 
     def clear(self, key: str) -> None:
         self.cache.delete(key)
+
+
+def database_key(key: str) -> str:
+    """Keys longer than the key column are hashed."""
+    if len(key) <= 255:
+        return key
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def upsert_sql(
+    vendor: str, quote_name: Callable[[str], str], elastic_expiry: bool
+) -> str:
+    """Returns the statement incrementing a counter of `DatabaseStorage`, with parameters
+    `(key, amount, expires, now, now)`, or an empty string if upsert is not supported.
+    """
+    if vendor not in ("postgresql", "sqlite"):
+        return ""
+    from django_ratelimiter.models import RateLimitCounter
+
+    table = quote_name(RateLimitCounter._meta.db_table)
+    key, count, expires = (quote_name(name) for name in ("key", "count", "expires"))
+    new_expires = (
+        f"excluded.{expires}"
+        if elastic_expiry
+        else f"CASE WHEN {table}.{expires} > %s THEN {table}.{expires} ELSE excluded.{expires} END"
+    )
+    return (
+        f"INSERT INTO {table} ({key}, {count}, {expires}) VALUES (%s, %s, %s) "
+        f"ON CONFLICT ({key}) DO UPDATE SET "
+        f"{count} = CASE WHEN {table}.{expires} > %s "
+        f"THEN {table}.{count} + excluded.{count} ELSE excluded.{count} END, "
+        f"{expires} = {new_expires} "
+        f"RETURNING {count}"
+    )
+
+
+class DatabaseStorage(Storage):
+    """Rate limiting storage with django database backend.
+
+    Counters are stored in `RateLimitCounter` model (requires `django_ratelimiter`
+    in `INSTALLED_APPS`), hits take a single `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`
+    statement with PostgreSQL and SQLite. Other databases lock an existing row in a transaction,
+    a new row is inserted in a savepoint and when the key was inserted concurrently,
+    the row inserted by the other request is locked and updated instead.
+    Expired rows are not deleted on hits, use `clear_expired()`
+    or `ratelimiter_clear_expired` management command periodically.
+
+    Counters are updated on the `using` connection. Within a transaction of that connection
+    (i.e. with `ATOMIC_REQUESTS`) the row stays locked until the transaction ends, so requests
+    hitting the same key are serialized and hits of rolled back requests are undone.
+    Use a separate database alias of the same database with autocommit to avoid it.
+    """
+
+    def __init__(
+        self,
+        using: str = DEFAULT_DB_ALIAS,
+        wrap_exceptions: bool = False,
+        **options: Union[float, str, bool],
+    ) -> None:
+        self.using = using
+        self.statements: dict[bool, str] = {}
+        super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
+
+    @cached_property
+    def model(self) -> type["RateLimitCounter"]:
+        # resolved on first use, so storage can be created in settings
+        return apps.get_model("django_ratelimiter", "RateLimitCounter")
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return DatabaseError
+
+    def _upsert_sql(self, elastic_expiry: bool) -> str:
+        if elastic_expiry not in self.statements:
+            connection = connections[self.using]
+            self.statements[elastic_expiry] = upsert_sql(
+                connection.vendor, connection.ops.quote_name, elastic_expiry
+            )
+        return self.statements[elastic_expiry]
+
+    def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        key = database_key(key)
+        now = time.time()
+        if sql := self._upsert_sql(elastic_expiry):
+            params: list[Union[str, float]] = [key, amount, now + expiry, now]
+            if not elastic_expiry:
+                params.append(now)
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchone()[0]
+        counters = self.model.objects.using(self.using)
+        with transaction.atomic(using=self.using):
+            counter = counters.select_for_update().filter(key=key).first()
+            if counter is None:
+                # a missing row is not locked, concurrent hits may insert it too
+                try:
+                    with transaction.atomic(using=self.using):
+                        counters.create(key=key, count=amount, expires=now + expiry)
+                    return amount
+                except IntegrityError:
+                    counter = counters.select_for_update().get(key=key)
+            if counter.expires <= now:
+                counter.count = 0
+                counter.expires = now + expiry
+            elif elastic_expiry:
+                counter.expires = now + expiry
+            counter.count += amount
+            counter.save(using=self.using)
+            return counter.count
+
+    def get(self, key: str) -> int:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: Sequence[str]) -> list[int]:
+        """Returns counters of multiple keys in a single query."""
+        keys = [database_key(key) for key in keys]
+        counts = dict(
+            self.model.objects.using(self.using)
+            .filter(key__in=keys, expires__gt=time.time())
+            .values_list("key", "count")
+        )
+        return [counts.get(key, 0) for key in keys]
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        expires = (
+            self.model.objects.using(self.using)
+            .filter(key=database_key(key), expires__gt=now)
+            .values_list("expires", flat=True)
+            .first()
+        )
+        return expires or now
+
+    def clear_expired(self, batch_size: int = 1000) -> int:
+        """Deletes expired counters in batches of `batch_size` rows,
+        returns the number of deleted counters."""
+        counters = self.model.objects.using(self.using)
+        deleted = 0
+        while True:
+            keys = list(
+                counters.filter(expires__lte=time.time()).values_list("key", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not keys:
+                return deleted
+            deleted += counters.filter(key__in=keys).delete()[0]
+
+    def check(self) -> bool:
+        try:
+            with connections[self.using].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except:  # noqa: E722
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self.model.objects.using(self.using).all().delete()[0]
+
+    def clear(self, key: str) -> None:
+        self.model.objects.using(self.using).filter(key=database_key(key)).delete()
+
+
+class AsyncCacheStorage(AsyncStorage):
+    """Asynchronous rate limiting storage with django cache backend.
+
+    Uses the async cache API (`aget`, `aincr`, ...), so it can be used with
+    `limits.aio` strategies from async views and middleware.
+    With `RedisCache`, batched increments, GCRA and window expiry use
+    a `redis.asyncio` client, other calls go through the async cache API
+    which django runs in a thread.
+    Keys are compatible with `CacheStorage`, both storages share counters.
+    The generation of keys is read before the first call to the cache,
+    then it is refreshed in a background task.
+    """
+
+    def __init__(
+        self,
+        cache: str,
+        wrap_exceptions: bool = False,
+        generation_ttl: float = 1.0,
+        **options: Union[float, str, bool],
+    ) -> None:
+        self.versioned_cache: BaseCache = copy.copy(caches[cache])
+        self.base_version = self.versioned_cache.version
+        self.is_redis = isinstance(self.versioned_cache, RedisCache)
+        self.generation_ttl = generation_ttl
+        self.generation_expires = 0.0
+        self.generation: Optional[int] = None
+        self.generation_task: Optional[asyncio.Task[None]] = None
+        # event loop -> redis.asyncio client, connections are bound to the loop
+        self.redis_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, Any
+        ] = weakref.WeakKeyDictionary()
+        super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def cache(self) -> BaseCache:
+        """Cache with keys versioned by the current generation."""
+        if time.monotonic() >= self.generation_expires:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return self.versioned_cache
+            # the current generation is used until the task is done
+            self.generation_expires = time.monotonic() + self.generation_ttl
+            self.generation_task = loop.create_task(self.refresh_generation())
+        return self.versioned_cache
+
+    @cache.setter
+    def cache(self, cache: BaseCache) -> None:
+        self.versioned_cache = cache
+
+    def redis_client(self) -> Any:
+        """Returns a `redis.asyncio` client of the cache for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in self.redis_clients:
+            self.redis_clients[loop] = async_redis_client(self.versioned_cache)  # type: ignore[arg-type]
+        return self.redis_clients[loop]
+
+    async def current_cache(self) -> BaseCache:
+        """Same as `cache`, but the generation is awaited until it is read once,
+        so that the first calls don't use keys of the base version."""
+        if self.generation is None:
+            await self.refresh_generation()
+            return self.versioned_cache
+        return self.cache
+
+    async def refresh_generation(self) -> None:
+        try:
+            self.set_generation(
+                await self.versioned_cache.aget(
+                    GENERATION_KEY, 0, version=self.base_version
+                )
+            )
+        except Exception:
+            self.generation_expires = 0.0
+
+    def set_generation(self, generation: int) -> None:
+        self.generation = generation
+        self.versioned_cache.version = self.base_version + generation
+        self.generation_expires = time.monotonic() + self.generation_ttl
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return Exception
+
+    async def get(self, key: str) -> int:
+        cache = await self.current_cache()
+        return unpack(await cache.aget(key, 0))[0]
+
+    async def get_many(self, keys: Sequence[str]) -> list[int]:
+        """Returns counters of multiple keys in a single round trip."""
+        cache = await self.current_cache()
+        values = await cache.aget_many(keys)
+        return [unpack(values.get(key, 0))[0] for key in keys]
+
+    async def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        cache = await self.current_cache()
+        if self.is_redis and expiry > 0:
+            value = await async_redis_incr(self.redis_client(), cache, [(key, expiry)], amount, elastic_expiry)  # type: ignore[arg-type]
+            return unpack(value[0])[0]
+        count, expires = await self._incr(key, expiry, amount)
+        if elastic_expiry and (delta := math.ceil(time.time() + expiry) - expires):
+            # see CacheStorage.incr
+            await cache.aincr(key, delta << COUNT_BITS)
+            await cache.atouch(key, expiry)
+        return count
+
+    async def incr_many(
+        self, entries: Sequence[tuple[str, int]], amount: int = 1
+    ) -> list[tuple[int, int]]:
+        """Increment counters for `(key, expiry)` entries.
+
+        Returns counters with window expiry timestamps,
+        with `RedisCache` all counters are incremented in a single round trip.
+        """
+        cache = await self.current_cache()
+        if self.is_redis and all(expiry > 0 for _, expiry in entries):
+            values = await async_redis_incr(self.redis_client(), cache, entries, amount)  # type: ignore[arg-type]
+            return [unpack(value) for value in values]
+        return [await self._incr(key, expiry, amount) for key, expiry in entries]
+
+    async def _incr(self, key: str, expiry: int, amount: int) -> tuple[int, int]:
+        cache = await self.current_cache()
+        try:
+            count, expires = unpack(await cache.aincr(key, amount))
+        except ValueError:
+            value = pack(amount, time.time() + expiry)
+            if await cache.aadd(key, value, expiry):
+                return unpack(value)
+            count, expires = unpack(await cache.aincr(key, amount))
+        if expires and expires < time.time():
+            value = pack(amount, time.time() + expiry)
+            await cache.aset(key, value, expiry)
+            return unpack(value)
+        return count, expires
+
+    async def decr_many(self, keys: Sequence[str], amount: int = 1) -> None:
+        """Decrement existing counters, used to roll back increments."""
+        cache = await self.current_cache()
+        if self.is_redis:
+            await async_redis_decr(self.redis_client(), cache, keys, amount)  # type: ignore[arg-type]
+            return
+        for key in keys:
+            try:
+                await cache.adecr(key, amount)
+            except ValueError:
+                pass
+
+    async def get_expiry(self, key: str) -> float:
+        cache = await self.current_cache()
+        if self.is_redis:
+            return await async_redis_expiry(self.redis_client(), cache, key)  # type: ignore[arg-type]
+        return unpack(await cache.aget(key, 0))[1] or int(time.time())
+
+    async def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> tuple[int, float, int, float]:
+        cache = await self.current_cache()
+        now = time.time()
+        previous_key, current_key = sliding_window_keys(key, expiry, now)
+        values = await cache.aget_many([previous_key, current_key])
+        previous_expires_in = expiry - now % expiry
+        return (
+            unpack(values.get(previous_key, 0))[0],
+            previous_expires_in,
+            unpack(values.get(current_key, 0))[0],
+            previous_expires_in + expiry,
+        )
+
+    async def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        previous_count, previous_expires_in, current_count, _ = (
+            await self.get_sliding_window(key, expiry)
+        )
+        previous_weight = weighted_count(previous_count, previous_expires_in, 0, expiry)
+        if math.floor(previous_weight + current_count) + amount > limit:
+            return False
+        _, current_key = sliding_window_keys(key, expiry, time.time())
+        # current window key is kept for one more window to be used as previous
+        current_count = await self.incr(current_key, 2 * expiry, amount=amount)
+        if math.floor(previous_weight + current_count) > limit:
+            # concurrent hits were acquired since the window was read
+            await self.decr_many([current_key], amount)
+            return False
+        return True
+
+    async def clear_sliding_window(self, key: str, expiry: int) -> None:
+        cache = await self.current_cache()
+        await cache.adelete_many(sliding_window_keys(key, expiry, time.time()))
+
+    async def acquire_gcra_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        cache = await self.current_cache()
+        now, increment, period = gcra_params(limit, expiry, amount)
+        if self.is_redis:
+            return await async_redis_gcra(self.redis_client(), cache, key, now, increment, period)  # type: ignore[arg-type]
+        try:
+            tat = await cache.aincr(key, increment)
+        except ValueError:
+            if await cache.aadd(key, now + increment, expiry):
+                return True
+            tat = await cache.aincr(key, increment)
+        if tat - increment < now:
+            # bucket was full, arrival time is moved to the current time
+            await cache.aincr(key, now + increment - tat)
+        elif tat - period > now:
+            await self.decr_many([key], increment)
+            return False
+        await cache.atouch(key, expiry)
+        return True
+
+    async def get_gcra(self, key: str) -> float:
+        """Returns theoretical arrival time of GCRA."""
+        cache = await self.current_cache()
+        return await cache.aget(key, 0) / 1_000_000
+
+    async def acquire_semaphore(
+        self, key: str, limit: int, timeout: int
+    ) -> Optional[tuple[str, str]]:
+        cache = await self.current_cache()
+        slots = semaphore_slots(key, limit)
+        taken = await cache.aget_many(slots)
+        token = uuid.uuid4().hex
+        for slot in slots:
+            if slot not in taken and await cache.aadd(slot, token, timeout):
+                return slot, token
+        return None
+
+    async def release_semaphore(self, slot: str, token: str) -> None:
+        """Releases a semaphore slot, see `CacheStorage.release_semaphore`."""
+        cache = await self.current_cache()
+        if self.is_redis:
+            await async_redis_release(self.redis_client(), cache, slot, token)  # type: ignore[arg-type]
+        elif await cache.aget(slot) == token:
+            await cache.adelete(slot)
+
+    async def check(self) -> bool:
+        try:
+            await self.cache.aget("django-ratelimiter-check")
+            return True
+        except:  # noqa: E722
+            return False
+
+    async def reset(self) -> Optional[int]:
+        """Resets all limits by starting a new generation of keys,
+        see `CacheStorage.reset`."""
+        cache = self.versioned_cache
+        try:
+            generation = await cache.aincr(GENERATION_KEY, version=self.base_version)
+        except ValueError:
+            if await cache.aadd(GENERATION_KEY, 1, None, version=self.base_version):
+                generation = 1
+            else:
+                generation = await cache.aincr(
+                    GENERATION_KEY, version=self.base_version
+                )
+        self.set_generation(generation)
+        return None
+
+    async def clear(self, key: str) -> None:
+        cache = await self.current_cache()
+        await cache.adelete(key)
+
+
+class AsyncDatabaseStorage(AsyncStorage):
+    """Asynchronous version of `DatabaseStorage`, queries are executed in a thread."""
+
+    def __init__(
+        self,
+        using: str = DEFAULT_DB_ALIAS,
+        wrap_exceptions: bool = False,
+        **options: Union[float, str, bool],
+    ) -> None:
+        self.storage = DatabaseStorage(using)
+        super().__init__(uri=None, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> Union[type[Exception], tuple[type[Exception], ...]]:
+        return DatabaseError
+
+    async def incr(
+        self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1
+    ) -> int:
+        return await sync_to_async(self.storage.incr)(
+            key, expiry, elastic_expiry, amount
+        )
+
+    async def get(self, key: str) -> int:
+        return await sync_to_async(self.storage.get)(key)
+
+    async def get_many(self, keys: Sequence[str]) -> list[int]:
+        return await sync_to_async(self.storage.get_many)(keys)
+
+    async def get_expiry(self, key: str) -> float:
+        return await sync_to_async(self.storage.get_expiry)(key)
+
+    async def check(self) -> bool:
+        return await sync_to_async(self.storage.check)()
+
+    async def reset(self) -> Optional[int]:
+        return await sync_to_async(self.storage.reset)()
+
+    async def clear(self, key: str) -> None:
+        await sync_to_async(self.storage.clear)(key)
@@ -0,0 +1,363 @@
+import random
+import time
+from math import floor, inf
+from typing import Any, Protocol, Sequence, cast
+
+from limits import RateLimitItem
+from limits.aio.strategies import (
+    STRATEGIES as LIMITS_ASYNC_STRATEGIES,
+    RateLimiter as AsyncRateLimiter,
+)
+from limits.storage import StorageTypes
+from limits.strategies import STRATEGIES as LIMITS_STRATEGIES, RateLimiter
+from limits.util import WindowStats
+
+
+class SlidingWindowCounterSupport(Protocol):
+    """Storage methods required by the sliding window counter strategy."""
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool: ...
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> tuple[int, float, int, float]: ...
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None: ...
+
+
+def sliding_window_keys(key: str, expiry: int, at: float) -> tuple[str, str]:
+    """Returns keys of the previous and the current fixed windows at given time."""
+    window = int(at // expiry)
+    return f"{key}/{window - 1}", f"{key}/{window}"
+
+
+def weighted_count(
+    previous_count: int, previous_expires_in: float, current_count: int, expiry: int
+) -> float:
+    """Approximates the moving window count by weighting the previous window count
+    with its share left in the sliding window and adding the current window count."""
+    return previous_count * previous_expires_in / expiry + current_count
+
+
+def sliding_window_stats(
+    item: RateLimitItem,
+    previous_count: int,
+    previous_expires_in: float,
+    current_count: int,
+    current_expires_in: float,
+) -> WindowStats:
+    expiry = item.get_expiry()
+    remaining = max(
+        0,
+        item.amount
+        - floor(
+            weighted_count(previous_count, previous_expires_in, current_count, expiry)
+        ),
+    )
+    now = time.time()
+    if not (previous_count or current_count):
+        return WindowStats(now, remaining)
+    previous_reset_in, current_reset_in = inf, inf
+    if previous_count:
+        previous_reset_in = previous_expires_in % (expiry / previous_count)
+    if current_count:
+        current_reset_in = current_expires_in % expiry
+    return WindowStats(now + min(previous_reset_in, current_reset_in), remaining)
+
+
+def check_sliding_window_support(storage: Any) -> None:
+    if not hasattr(storage, "get_sliding_window") or not hasattr(
+        storage, "acquire_sliding_window_entry"
+    ):
+        raise NotImplementedError(
+            "SlidingWindowCounterRateLimiter is not implemented for storage "
+            f"of type {storage.__class__}"
+        )
+
+
+class SlidingWindowCounterRateLimiter(RateLimiter):
+    """Sliding window counter strategy.
+
+    Approximates the moving window with two fixed window counters per key,
+    so memory usage doesn't depend on the limit.
+    Works with `CacheStorage` and `limits` storages implementing sliding window counter support.
+    """
+
+    def __init__(self, storage: StorageTypes) -> None:
+        check_sliding_window_support(storage)
+        super().__init__(storage)
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return cast(
+            SlidingWindowCounterSupport, self.storage
+        ).acquire_sliding_window_entry(
+            item.key_for(*identifiers), item.amount, item.get_expiry(), cost
+        )
+
+    def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        previous_count, previous_expires_in, current_count, _ = cast(
+            SlidingWindowCounterSupport, self.storage
+        ).get_sliding_window(item.key_for(*identifiers), item.get_expiry())
+        count = weighted_count(
+            previous_count, previous_expires_in, current_count, item.get_expiry()
+        )
+        return count < item.amount - cost + 1
+
+    def get_window_stats(self, item: RateLimitItem, *identifiers: str) -> WindowStats:
+        return sliding_window_stats(
+            item,
+            *cast(SlidingWindowCounterSupport, self.storage).get_sliding_window(
+                item.key_for(*identifiers), item.get_expiry()
+            ),
+        )
+
+    def clear(self, item: RateLimitItem, *identifiers: str) -> None:
+        cast(SlidingWindowCounterSupport, self.storage).clear_sliding_window(
+            item.key_for(*identifiers), item.get_expiry()
+        )
+
+
+class AsyncSlidingWindowCounterRateLimiter(AsyncRateLimiter):
+    """Async version of `SlidingWindowCounterRateLimiter`."""
+
+    def __init__(self, storage: StorageTypes) -> None:
+        check_sliding_window_support(storage)
+        super().__init__(storage)
+
+    async def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return await cast(Any, self.storage).acquire_sliding_window_entry(
+            item.key_for(*identifiers), item.amount, item.get_expiry(), cost
+        )
+
+    async def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        previous_count, previous_expires_in, current_count, _ = await cast(
+            Any, self.storage
+        ).get_sliding_window(item.key_for(*identifiers), item.get_expiry())
+        count = weighted_count(
+            previous_count, previous_expires_in, current_count, item.get_expiry()
+        )
+        return count < item.amount - cost + 1
+
+    async def get_window_stats(
+        self, item: RateLimitItem, *identifiers: str
+    ) -> WindowStats:
+        return sliding_window_stats(
+            item,
+            *await cast(Any, self.storage).get_sliding_window(
+                item.key_for(*identifiers), item.get_expiry()
+            ),
+        )
+
+    async def clear(self, item: RateLimitItem, *identifiers: str) -> None:
+        await cast(Any, self.storage).clear_sliding_window(
+            item.key_for(*identifiers), item.get_expiry()
+        )
+
+
+class GCRASupport(Protocol):
+    """Storage methods required by the GCRA strategy."""
+
+    def acquire_gcra_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool: ...
+
+    def get_gcra(self, key: str) -> float: ...
+
+
+def gcra_stats(item: RateLimitItem, tat: float) -> WindowStats:
+    """Returns window stats of GCRA for theoretical arrival time `tat`.
+
+    Reset time is the time of the next allowed hit if the limit is exhausted,
+    and the time when all hits are available again otherwise.
+    """
+    now = time.time()
+    tat = max(tat, now)
+    expiry = item.get_expiry()
+    interval = expiry / item.amount
+    remaining = min(item.amount, floor((expiry - (tat - now)) / interval + 1e-9))
+    if remaining <= 0:
+        return WindowStats(tat - expiry + interval, 0)
+    return WindowStats(tat, remaining)
+
+
+def check_gcra_support(storage: Any) -> None:
+    if not hasattr(storage, "acquire_gcra_entry") or not hasattr(storage, "get_gcra"):
+        raise NotImplementedError(
+            f"GCRARateLimiter is not implemented for storage of type {storage.__class__}"
+        )
+
+
+class GCRARateLimiter(RateLimiter):
+    """Generic cell rate algorithm strategy.
+
+    Hits are spread evenly over the period with bursts up to the limit,
+    a single timestamp is stored per key. Works with `CacheStorage`.
+    """
+
+    def __init__(self, storage: StorageTypes) -> None:
+        check_gcra_support(storage)
+        super().__init__(storage)
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return cast(GCRASupport, self.storage).acquire_gcra_entry(
+            item.key_for(*identifiers), item.amount, item.get_expiry(), cost
+        )
+
+    def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return self.get_window_stats(item, *identifiers).remaining >= cost
+
+    def get_window_stats(self, item: RateLimitItem, *identifiers: str) -> WindowStats:
+        return gcra_stats(
+            item,
+            cast(GCRASupport, self.storage).get_gcra(item.key_for(*identifiers)),
+        )
+
+
+class AsyncGCRARateLimiter(AsyncRateLimiter):
+    """Async version of `GCRARateLimiter`."""
+
+    def __init__(self, storage: StorageTypes) -> None:
+        check_gcra_support(storage)
+        super().__init__(storage)
+
+    async def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return await cast(Any, self.storage).acquire_gcra_entry(
+            item.key_for(*identifiers), item.amount, item.get_expiry(), cost
+        )
+
+    async def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return (await self.get_window_stats(item, *identifiers)).remaining >= cost
+
+    async def get_window_stats(
+        self, item: RateLimitItem, *identifiers: str
+    ) -> WindowStats:
+        return gcra_stats(
+            item, await cast(Any, self.storage).get_gcra(item.key_for(*identifiers))
+        )
+
+
+def striped_keys(key: str, expiry: int, stripes: int, at: float) -> list[str]:
+    """Returns keys of counter stripes of the fixed window at given time."""
+    window = int(at // expiry)
+    return [f"{key}/{window}/{stripe}" for stripe in range(stripes)]
+
+
+def striped_window_reset(expiry: int, at: float) -> float:
+    return (at // expiry + 1) * expiry
+
+
+def check_stripes_support(strategy: str) -> None:
+    if strategy != "fixed-window":
+        raise ValueError(f"Counter stripes are not supported by {strategy} strategy")
+
+
+class StripedFixedWindowRateLimiter(RateLimiter):
+    """Fixed window strategy with the counter split into `stripes` keys.
+
+    Each hit increments one of the stripes and the limit is checked with the sum of them,
+    so increments of a hot key are spread between cache servers.
+    Windows are aligned to the clock, `CacheStorage` reads stripes with a single `get_many`.
+    """
+
+    def __init__(self, storage: StorageTypes, stripes: int) -> None:
+        super().__init__(storage)
+        self.stripes = stripes
+
+    def get_counts(self, keys: Sequence[str]) -> list[int]:
+        if hasattr(self.storage, "get_many"):
+            return self.storage.get_many(keys)
+        return [self.storage.get(key) for key in keys]
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        expiry = item.get_expiry()
+        keys = striped_keys(
+            item.key_for(*identifiers), expiry, self.stripes, time.time()
+        )
+        stripe = random.randrange(self.stripes)
+        count = self.storage.incr(keys[stripe], expiry, amount=cost)
+        others = self.get_counts(keys[:stripe] + keys[stripe + 1 :])
+        return count + sum(others) <= item.amount
+
+    def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        expiry = item.get_expiry()
+        keys = striped_keys(
+            item.key_for(*identifiers), expiry, self.stripes, time.time()
+        )
+        return sum(self.get_counts(keys)) < item.amount - cost + 1
+
+    def get_window_stats(self, item: RateLimitItem, *identifiers: str) -> WindowStats:
+        expiry, now = item.get_expiry(), time.time()
+        keys = striped_keys(item.key_for(*identifiers), expiry, self.stripes, now)
+        return WindowStats(
+            striped_window_reset(expiry, now),
+            max(0, item.amount - sum(self.get_counts(keys))),
+        )
+
+    def clear(self, item: RateLimitItem, *identifiers: str) -> None:
+        keys = striped_keys(
+            item.key_for(*identifiers), item.get_expiry(), self.stripes, time.time()
+        )
+        for key in keys:
+            self.storage.clear(key)
+
+
+class AsyncStripedFixedWindowRateLimiter(AsyncRateLimiter):
+    """Async version of `StripedFixedWindowRateLimiter`."""
+
+    def __init__(self, storage: StorageTypes, stripes: int) -> None:
+        super().__init__(storage)
+        self.stripes = stripes
+
+    async def get_counts(self, keys: Sequence[str]) -> list[int]:
+        if hasattr(self.storage, "get_many"):
+            return await self.storage.get_many(keys)
+        return [await self.storage.get(key) for key in keys]
+
+    async def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        expiry = item.get_expiry()
+        keys = striped_keys(
+            item.key_for(*identifiers), expiry, self.stripes, time.time()
+        )
+        stripe = random.randrange(self.stripes)
+        count = await self.storage.incr(keys[stripe], expiry, amount=cost)
+        others = await self.get_counts(keys[:stripe] + keys[stripe + 1 :])
+        return count + sum(others) <= item.amount
+
+    async def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        expiry = item.get_expiry()
+        keys = striped_keys(
+            item.key_for(*identifiers), expiry, self.stripes, time.time()
+        )
+        return sum(await self.get_counts(keys)) < item.amount - cost + 1
+
+    async def get_window_stats(
+        self, item: RateLimitItem, *identifiers: str
+    ) -> WindowStats:
+        expiry, now = item.get_expiry(), time.time()
+        keys = striped_keys(item.key_for(*identifiers), expiry, self.stripes, now)
+        return WindowStats(
+            striped_window_reset(expiry, now),
+            max(0, item.amount - sum(await self.get_counts(keys))),
+        )
+
+    async def clear(self, item: RateLimitItem, *identifiers: str) -> None:
+        keys = striped_keys(
+            item.key_for(*identifiers), item.get_expiry(), self.stripes, time.time()
+        )
+        for key in keys:
+            await self.storage.clear(key)
+
+
+STRATEGIES: dict[str, type[RateLimiter]] = {
+    **LIMITS_STRATEGIES,
+    "sliding-window-counter": SlidingWindowCounterRateLimiter,
+    "gcra": GCRARateLimiter,
+}
+
+ASYNC_STRATEGIES: dict[str, type[AsyncRateLimiter]] = {
+    **LIMITS_ASYNC_STRATEGIES,
+    "sliding-window-counter": AsyncSlidingWindowCounterRateLimiter,
+    "gcra": AsyncGCRARateLimiter,
+}
@@ -5,9 +5,19 @@ if sys.version_info < (3, 10):
 else:
     from typing import ParamSpec, Concatenate
 
-from typing import Callable
+from typing import Awaitable, Callable, Sequence, TypeVar, Union
 from django.http import HttpRequest, HttpResponse
 
 P = ParamSpec("P")
 
+Rate = Union[str, Sequence[str]]
+
 ViewFunc = Callable[Concatenate[HttpRequest, P], HttpResponse]
+
+AsyncViewFunc = Callable[Concatenate[HttpRequest, P], Awaitable[HttpResponse]]
+
+AnyViewFunc = TypeVar("AnyViewFunc", bound=Union[ViewFunc, AsyncViewFunc])
+
+Cost = Union[int, Callable[[HttpRequest], int]]
+
+ResponseCost = Callable[[HttpRequest, HttpResponse], int]
@@ -1,16 +1,76 @@
+import asyncio
+import base64
+import copy
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
 from functools import partial, lru_cache
-from typing import Union, Sequence, Optional
+from operator import attrgetter
+from typing import Any, Callable, NamedTuple, Union, Sequence, Optional, cast
 
 from django.conf import settings
+from django.db import models
+from django.http import HttpRequest, HttpResponse
+from django.http.response import ResponseHeaders
+from limits import RateLimitItem, parse_many
+from limits.aio.storage import Storage as AsyncStorage
+from limits.aio.strategies import (
+    FixedWindowRateLimiter as AsyncFixedWindowRateLimiter,
+    RateLimiter as AsyncRateLimiter,
+)
 from limits.storage import Storage
-from limits.strategies import STRATEGIES, RateLimiter
+from limits.strategies import FixedWindowRateLimiter, RateLimiter
 
-from django_ratelimiter.storage import CacheStorage
-from django_ratelimiter.types import ViewFunc
+from django_ratelimiter.circuit_breaker import (
+    AsyncCircuitBreakerStorage,
+    CircuitBreakerStorage,
+)
+from django_ratelimiter.sharding import (
+    AsyncShardedCacheStorage,
+    ShardedCacheStorage,
+    async_cache_storage,
+    cache_storage,
+)
+from django_ratelimiter.storage import CacheStorage, AsyncCacheStorage
+from django_ratelimiter.strategies import (
+    ASYNC_STRATEGIES,
+    STRATEGIES,
+    AsyncStripedFixedWindowRateLimiter,
+    StripedFixedWindowRateLimiter,
+    check_stripes_support,
+)
+from django_ratelimiter.types import Rate, ViewFunc, AsyncViewFunc
+
+# minimal wait between hits while waiting for the limit reset
+MIN_WAIT = 0.01
+
+# readable names of compact identifiers created by the process
+KEY_NAMES: dict[str, str] = {}
+
+
+def use_compact_keys() -> bool:
+    return getattr(settings, "DJANGO_RATELIMITER_COMPACT_KEYS", False)
+
+
+def compact_identifier(identifiers: Sequence[str]) -> str:
+    """Returns a short stable digest of identifiers, its readable name is kept in `KEY_NAMES`."""
+    name = "/".join(identifiers)
+    digest = hashlib.blake2b(name.encode(), digest_size=6).digest()
+    identifier = base64.urlsafe_b64encode(digest).decode()
+    KEY_NAMES[identifier] = name
+    return identifier
+
+
+def readable_key(key: str) -> str:
+    """Replaces compact identifiers in a storage key with readable names."""
+    return "/".join(KEY_NAMES.get(part, part) for part in key.split("/"))
 
 
 def build_identifiers(
-    func: ViewFunc, methods: Union[str, Sequence[str], None] = None
+    func: Union[ViewFunc, AsyncViewFunc],
+    methods: Union[str, Sequence[str], None] = None,
 ) -> list[str]:
     """Build view identifiers for storage cache key using function signature and list of methods."""
     if isinstance(func, partial):
@@ -27,24 +87,735 @@ def build_identifiers(
     return identifiers
 
 
+def compile_key(
+    key: Union[str, Callable[[HttpRequest], Any], None],
+) -> Optional[Callable[[HttpRequest], str]]:
+    """Compile a request attribute name or a callable into a function that returns
+    identifier string for a request. Model instances are identified by primary key."""
+    if key is None:
+        return None
+    getter = attrgetter(key) if isinstance(key, str) else key
+
+    def key_func(request: HttpRequest) -> str:
+        value = getter(request)
+        return str(value.pk if isinstance(value, models.Model) else value)
+
+    return key_func
+
+
+def compile_identifiers(
+    func: Union[ViewFunc, AsyncViewFunc],
+    key: Union[str, Callable[[HttpRequest], Any], None] = None,
+    methods: Union[str, Sequence[str], None] = None,
+) -> Callable[[HttpRequest], Optional[tuple[str, ...]]]:
+    """Compile a function that returns storage key identifiers for a request,
+    or `None` if request method is not limited.
+
+    View identifiers are replaced with a compact digest if `DJANGO_RATELIMITER_COMPACT_KEYS` is set.
+    """
+    prefix = tuple(build_identifiers(func, methods))
+    if use_compact_keys():
+        prefix = (compact_identifier(prefix),)
+    methods_set = (
+        frozenset((methods,) if isinstance(methods, str) else methods)
+        if methods
+        else None
+    )
+    key_func = compile_key(key)
+
+    def identifiers_for(request: HttpRequest) -> Optional[tuple[str, ...]]:
+        if methods_set is not None and request.method not in methods_set:
+            return None
+        if key_func is None:
+            return prefix
+        return (*prefix, key_func(request))
+
+    return identifiers_for
+
+
+@lru_cache(maxsize=1024)
+def parse_rate(rate: str) -> tuple[RateLimitItem, ...]:
+    """Parse a rate string (i.e. `5/second` or `10/second;500/hour`), parsed rates are memoized."""
+    return tuple(parse_many(rate))
+
+
+def parse_rates(rate: Rate) -> tuple[RateLimitItem, ...]:
+    """Parse a rate string or a sequence of rate strings."""
+    if isinstance(rate, str):
+        return parse_rate(rate)
+    return tuple(item for rate_ in rate for item in parse_rate(rate_))
+
+
 @lru_cache(maxsize=None)
 def get_storage() -> Storage:
     """Returns a default storage backend instance, defined by either `DJANGO_RATELIMITER_CACHE`
-    or `DJANGO_RATELIMITER_STORAGE`."""
-    cache_name: Optional[str] = getattr(settings, "DJANGO_RATELIMITER_CACHE", None)
+    or `DJANGO_RATELIMITER_STORAGE`.
+
+    Keys are sharded by consistent hashing if `DJANGO_RATELIMITER_CACHE` is a list of caches.
+    Storage is wrapped with `CircuitBreakerStorage` if `DJANGO_RATELIMITER_CIRCUIT_BREAKER`
+    options are defined."""
+    cache_name: Union[str, Sequence[str], None] = getattr(
+        settings, "DJANGO_RATELIMITER_CACHE", None
+    )
     storage: Optional[Storage] = getattr(settings, "DJANGO_RATELIMITER_STORAGE", None)
     if cache_name and storage:
         raise ValueError(
             "DJANGO_RATELIMITER_CACHE and DJANGO_RATELIMITER_STORAGE can't be used together"
         )
-    return storage or CacheStorage(cache_name or "default")
+    storage = storage or cache_storage(cache_name or "default")
+    if options := getattr(settings, "DJANGO_RATELIMITER_CIRCUIT_BREAKER", None):
+        return CircuitBreakerStorage(storage, **options)
+    return storage
+
+
+@lru_cache(maxsize=None)
+def get_async_storage() -> AsyncStorage:
+    """Returns a default async storage backend instance, defined by either `DJANGO_RATELIMITER_CACHE`
+    or `DJANGO_RATELIMITER_ASYNC_STORAGE`."""
+    cache_name: Union[str, Sequence[str], None] = getattr(
+        settings, "DJANGO_RATELIMITER_CACHE", None
+    )
+    storage: Optional[AsyncStorage] = getattr(
+        settings, "DJANGO_RATELIMITER_ASYNC_STORAGE", None
+    )
+    if cache_name and storage:
+        raise ValueError(
+            "DJANGO_RATELIMITER_CACHE and DJANGO_RATELIMITER_ASYNC_STORAGE can't be used together"
+        )
+    if not storage and getattr(settings, "DJANGO_RATELIMITER_STORAGE", None):
+        raise ValueError(
+            "DJANGO_RATELIMITER_ASYNC_STORAGE must be defined to use async views "
+            "with DJANGO_RATELIMITER_STORAGE"
+        )
+    storage = storage or async_cache_storage(cache_name or "default")
+    if options := getattr(settings, "DJANGO_RATELIMITER_CIRCUIT_BREAKER", None):
+        return AsyncCircuitBreakerStorage(storage, **options)
+    return storage
+
 
+@lru_cache(maxsize=128)
+def get_rate_limiter(
+    strategy: str, storage: Optional[Storage] = None, stripes: int = 1
+) -> RateLimiter:
+    """Return a ratelimiter instance for given strategy.
 
-def get_rate_limiter(strategy: str, storage: Optional[Storage] = None) -> RateLimiter:
-    """Return a ratelimiter instance for given strategy."""
+    Fixed window counters are split into `stripes` keys if it's greater than 1.
+    Instances are memoized per strategy, storage and stripes.
+    """
     if strategy not in STRATEGIES:
         raise ValueError(
             f"Unknown strategy {strategy}, must be one of {STRATEGIES.keys()}"
         )
     storage = storage or get_storage()
+    if stripes > 1:
+        check_stripes_support(strategy)
+        return StripedFixedWindowRateLimiter(storage, stripes)
     return STRATEGIES[strategy](storage)
+
+
+@lru_cache(maxsize=128)
+def get_async_rate_limiter(
+    strategy: str, storage: Optional[AsyncStorage] = None, stripes: int = 1
+) -> AsyncRateLimiter:
+    """Return an async ratelimiter instance for given strategy.
+
+    Fixed window counters are split into `stripes` keys if it's greater than 1.
+    Instances are memoized per strategy, storage and stripes.
+    """
+    if strategy not in ASYNC_STRATEGIES:
+        raise ValueError(
+            f"Unknown strategy {strategy}, must be one of {ASYNC_STRATEGIES.keys()}"
+        )
+    storage = storage or get_async_storage()
+    if not isinstance(storage, AsyncStorage):
+        raise ValueError(
+            f"Async views require a limits.aio storage, got {storage.__class__}"
+        )
+    if stripes > 1:
+        check_stripes_support(strategy)
+        return AsyncStripedFixedWindowRateLimiter(storage, stripes)
+    return ASYNC_STRATEGIES[strategy](storage)
+
+
+class RateLimitResult(NamedTuple):
+    """Result of consuming rate limits.
+
+    Attributes:
+        allowed: whether all of the limits were consumed
+        item: the exceeded limit, or the limit with the least remaining hits
+        remaining: remaining hits of the limit
+        reset_time: time when the limit is reset, as a unix timestamp
+    """
+
+    allowed: bool
+    item: RateLimitItem
+    remaining: int
+    reset_time: float
+
+
+def fixed_window_result(
+    items: Sequence[RateLimitItem],
+    counters: Sequence[tuple[int, int]],
+    cost: int,
+) -> RateLimitResult:
+    """Builds a result from fixed window counters returned by `CacheStorage.incr_many`.
+
+    Multiple limits and hits costing more than one are rolled back when rejected,
+    so hits of the request are not counted.
+    """
+    allowed = all(count <= item.amount for (count, _), item in zip(counters, items))
+    rolled_back = cost if not allowed and (len(items) > 1 or cost > 1) else 0
+    return min(
+        (
+            RateLimitResult(
+                count <= item.amount,
+                item,
+                max(0, item.amount - count + rolled_back),
+                expires,
+            )
+            for (count, expires), item in zip(counters, items)
+        ),
+        # exceeded limit first, then the least remaining
+        key=lambda result: (result.allowed, result.remaining, -result.reset_time),
+    )._replace(allowed=allowed)
+
+
+class PenaltyBox:
+    """Per-process cache of exceeded rate limits.
+
+    Storage keys of exceeded limits are blocked until the limit is reset,
+    so following hits are rejected without storage round trips.
+    Expired keys are evicted on lookup, least recently used keys when `maxsize` is reached.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.blocked: OrderedDict[str, float] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(
+        self, items: Sequence[RateLimitItem], *identifiers: str
+    ) -> Optional[RateLimitResult]:
+        """Returns a rejected result if any of the limits is blocked."""
+        if not self.blocked:
+            return None
+        now = time.time()
+        for item in items:
+            key = item.key_for(*identifiers)
+            with self.lock:
+                reset_time = self.blocked.get(key)
+                if reset_time is None:
+                    continue
+                if reset_time <= now:
+                    del self.blocked[key]
+                    continue
+                self.blocked.move_to_end(key)
+            return RateLimitResult(False, item, 0, reset_time)
+        return None
+
+    def block(self, result: RateLimitResult, *identifiers: str) -> None:
+        """Blocks the limit of a rejected result until it's reset.
+
+        Limits which still have remaining hits (rejected due to cost) are not blocked.
+        """
+        if result.allowed or result.remaining or result.reset_time <= time.time():
+            return
+        key = result.item.key_for(*identifiers)
+        with self.lock:
+            self.blocked[key] = result.reset_time
+            self.blocked.move_to_end(key)
+            while len(self.blocked) > self.maxsize:
+                self.blocked.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.blocked.clear()
+
+
+@lru_cache(maxsize=None)
+def get_penalty_box() -> Optional[PenaltyBox]:
+    """Returns a penalty box if enabled with `DJANGO_RATELIMITER_PENALTY_BOX`
+    (maximum number of blocked keys per process)."""
+    maxsize: Optional[int] = getattr(settings, "DJANGO_RATELIMITER_PENALTY_BOX", None)
+    return PenaltyBox(maxsize) if maxsize else None
+
+
+class Lease(NamedTuple):
+    """Hits reserved by the process from a shared fixed window counter.
+
+    Attributes:
+        available: reserved hits which are not spent yet
+        counter: shared counter value after the last reservation
+        expires: window expiry timestamp
+    """
+
+    available: int
+    counter: int
+    expires: int
+
+
+class QuotaLeases:
+    """Per-process leases of fixed window hits.
+
+    A block of hits is reserved from the shared counter with a single increment
+    and spent from memory. Block size is limited to `tolerance` of the limit
+    and shrinks with remaining hits, divided between `workers` processes,
+    so at most `tolerance` of the limit is reserved but not spent.
+    """
+
+    def __init__(self, tolerance: float, workers: int, maxsize: int = 1024) -> None:
+        self.tolerance = tolerance
+        self.workers = workers
+        self.maxsize = maxsize
+        self.leases: OrderedDict[str, Lease] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _lease(self, key: str, now: float) -> Optional[Lease]:
+        lease = self.leases.get(key)
+        if lease is not None and lease.expires <= now:
+            del self.leases[key]
+            return None
+        return lease
+
+    def spend(
+        self, items: Sequence[RateLimitItem], keys: Sequence[str], cost: int
+    ) -> Optional[RateLimitResult]:
+        """Spends leased hits of all the limits.
+
+        Returns `None` if some of the leases have to be refilled.
+        """
+        now = time.time()
+        with self.lock:
+            results = []
+            for item, key in zip(items, keys):
+                lease = self._lease(key, now)
+                if lease is None:
+                    return None
+                remaining = lease.available + max(0, item.amount - lease.counter)
+                if lease.available < cost and remaining >= cost:
+                    return None
+                results.append(
+                    RateLimitResult(
+                        lease.available >= cost, item, remaining, lease.expires
+                    )
+                )
+            result = min(
+                results,
+                key=lambda result: (
+                    result.allowed,
+                    result.remaining,
+                    -result.reset_time,
+                ),
+            )
+            if result.allowed:
+                for key in keys:
+                    self.leases[key] = self.leases[key]._replace(
+                        available=self.leases[key].available - cost
+                    )
+                    self.leases.move_to_end(key)
+                result = result._replace(remaining=result.remaining - cost)
+            return result
+
+    def block_sizes(
+        self, items: Sequence[RateLimitItem], keys: Sequence[str], cost: int
+    ) -> list[tuple[int, int]]:
+        """Returns `(index, size)` of blocks to reserve for leases that can't cover the cost."""
+        now = time.time()
+        sizes = []
+        with self.lock:
+            for index, (item, key) in enumerate(zip(items, keys)):
+                lease = self._lease(key, now)
+                available, count = (0, 0) if lease is None else lease[:2]
+                if available >= cost or count >= item.amount:
+                    continue
+                size = min(
+                    item.amount * self.tolerance, (item.amount - count) / self.workers
+                )
+                sizes.append((index, max(cost - available, int(size), 1)))
+        return sizes
+
+    def add(
+        self, item: RateLimitItem, key: str, size: int, counter: tuple[int, int]
+    ) -> None:
+        """Adds reserved hits of a block, hits over the limit are not reserved."""
+        count, expires = counter
+        size = max(0, min(size, item.amount - count + size))
+        with self.lock:
+            lease = self._lease(key, time.time())
+            if lease is not None and lease.expires != expires:
+                lease = None
+            available = 0 if lease is None else lease.available
+            self.leases[key] = Lease(available + size, count, expires)
+            self.leases.move_to_end(key)
+            while len(self.leases) > self.maxsize:
+                self.leases.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def get_quota_leases() -> QuotaLeases:
+    """Returns per-process quota leases, configured with `DJANGO_RATELIMITER_LEASE_TOLERANCE`
+    (fraction of a limit, defaults to 0.01) and `DJANGO_RATELIMITER_WORKERS` (defaults to 1).
+    """
+    return QuotaLeases(
+        getattr(settings, "DJANGO_RATELIMITER_LEASE_TOLERANCE", 0.01),
+        getattr(settings, "DJANGO_RATELIMITER_WORKERS", 1),
+    )
+
+
+def wrapped_storage(storage: Any) -> Any:
+    """Returns the storage wrapped by circuit breakers."""
+    while isinstance(storage, (CircuitBreakerStorage, AsyncCircuitBreakerStorage)):
+        storage = storage.storage
+    return storage
+
+
+def is_fixed_window(rate_limiter: Union[RateLimiter, AsyncRateLimiter]) -> bool:
+    """Whether rate limiter is a fixed window with django cache storage
+    (possibly behind a circuit breaker), which supports batched increments."""
+    storage = wrapped_storage(rate_limiter.storage)
+    if type(rate_limiter) is FixedWindowRateLimiter:
+        return isinstance(storage, (CacheStorage, ShardedCacheStorage))
+    if type(rate_limiter) is AsyncFixedWindowRateLimiter:
+        return isinstance(storage, (AsyncCacheStorage, AsyncShardedCacheStorage))
+    return False
+
+
+def window_stats_result(
+    allowed: bool, stats: Sequence[tuple[RateLimitItem, tuple[float, int]]]
+) -> RateLimitResult:
+    """Builds a result from `(item, (reset_time, remaining))` window stats."""
+    return min(
+        (
+            RateLimitResult(allowed, item, remaining, reset_time)
+            for item, (reset_time, remaining) in stats
+        ),
+        key=lambda result: (result.remaining, -result.reset_time),
+    )
+
+
+def _fixed_window_hit(
+    rate_limiter: RateLimiter,
+    items: Sequence[RateLimitItem],
+    identifiers: Sequence[str],
+    cost: int,
+    lease: bool = False,
+) -> RateLimitResult:
+    storage = cast(CacheStorage, rate_limiter.storage)
+    keys = [item.key_for(*identifiers) for item in items]
+    if lease:
+        leases = get_quota_leases()
+        if result := leases.spend(items, keys, cost):
+            return result
+        for index, size in leases.block_sizes(items, keys, cost):
+            item, key = items[index], keys[index]
+            [counter] = storage.incr_many([(key, item.get_expiry())], size)
+            leases.add(item, key, size, counter)
+        if result := leases.spend(items, keys, cost):
+            return result
+    counters = storage.incr_many(
+        [(key, item.get_expiry()) for key, item in zip(keys, items)], cost
+    )
+    result = fixed_window_result(items, counters, cost)
+    if not result.allowed and (len(items) > 1 or cost > 1):
+        storage.decr_many(keys, cost)
+    return result
+
+
+def _hit(
+    rate_limiter: RateLimiter,
+    items: Sequence[RateLimitItem],
+    identifiers: Sequence[str],
+    cost: int,
+) -> bool:
+    if len(items) == 1:
+        return rate_limiter.hit(items[0], *identifiers, cost=cost)
+    if not all(rate_limiter.test(item, *identifiers, cost=cost) for item in items):
+        return False
+    return all([rate_limiter.hit(item, *identifiers, cost=cost) for item in items])
+
+
+def _window_stats(
+    rate_limiter: RateLimiter,
+    items: Sequence[RateLimitItem],
+    identifiers: Sequence[str],
+    allowed: bool,
+) -> RateLimitResult:
+    return window_stats_result(
+        allowed,
+        [(item, rate_limiter.get_window_stats(item, *identifiers)) for item in items],
+    )
+
+
+def can_hit_all(
+    rate_limiter: RateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+) -> bool:
+    """Check that all rate limits can be consumed, without consuming them.
+
+    Fixed window limits in `CacheStorage` are read with a single `get_many`.
+    """
+    penalty_box = get_penalty_box()
+    if penalty_box is not None and penalty_box.get(items, *identifiers):
+        return False
+    if is_fixed_window(rate_limiter):
+        counts = cast(CacheStorage, rate_limiter.storage).get_many(
+            [item.key_for(*identifiers) for item in items]
+        )
+        return all(count + cost <= item.amount for count, item in zip(counts, items))
+    return all(rate_limiter.test(item, *identifiers, cost=cost) for item in items)
+
+
+def hit_all(
+    rate_limiter: RateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+    lease: bool = False,
+) -> bool:
+    """Consume all rate limits, if any of them is exceeded none of them is consumed.
+
+    Fixed window limits in `CacheStorage` are incremented in one batch
+    (a single round trip with `RedisCache`) and rolled back when rejected,
+    other strategies and storages test all limits before consuming them.
+    With the penalty box enabled, exceeded limits are rejected without storage round trips.
+    With `lease`, fixed window hits in `CacheStorage` are spent from `QuotaLeases`.
+    """
+    penalty_box = get_penalty_box()
+    if penalty_box is not None and penalty_box.get(items, *identifiers):
+        return False
+    if is_fixed_window(rate_limiter):
+        result = _fixed_window_hit(rate_limiter, items, identifiers, cost, lease)
+    elif _hit(rate_limiter, items, identifiers, cost):
+        return True
+    elif penalty_box is None:
+        return False
+    else:
+        result = _window_stats(rate_limiter, items, identifiers, False)
+    if penalty_box is not None:
+        penalty_box.block(result, *identifiers)
+    return result.allowed
+
+
+def hit_all_with_stats(
+    rate_limiter: RateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+    lease: bool = False,
+) -> RateLimitResult:
+    """Same as `hit_all`, but also returns remaining hits and reset time.
+
+    Fixed window limits in `CacheStorage` get the stats from the same increment,
+    other strategies and storages query window stats after the hit.
+    """
+    penalty_box = get_penalty_box()
+    if penalty_box is not None and (result := penalty_box.get(items, *identifiers)):
+        return result
+    if is_fixed_window(rate_limiter):
+        result = _fixed_window_hit(rate_limiter, items, identifiers, cost, lease)
+    else:
+        allowed = _hit(rate_limiter, items, identifiers, cost)
+        result = _window_stats(rate_limiter, items, identifiers, allowed)
+    if penalty_box is not None:
+        penalty_box.block(result, *identifiers)
+    return result
+
+
+async def _afixed_window_hit(
+    rate_limiter: AsyncRateLimiter,
+    items: Sequence[RateLimitItem],
+    identifiers: Sequence[str],
+    cost: int,
+    lease: bool = False,
+) -> RateLimitResult:
+    storage = cast(AsyncCacheStorage, rate_limiter.storage)
+    keys = [item.key_for(*identifiers) for item in items]
+    if lease:
+        leases = get_quota_leases()
+        if result := leases.spend(items, keys, cost):
+            return result
+        for index, size in leases.block_sizes(items, keys, cost):
+            item, key = items[index], keys[index]
+            [counter] = await storage.incr_many([(key, item.get_expiry())], size)
+            leases.add(item, key, size, counter)
+        if result := leases.spend(items, keys, cost):
+            return result
+    counters = await storage.incr_many(
+        [(key, item.get_expiry()) for key, item in zip(keys, items)], cost
+    )
+    result = fixed_window_result(items, counters, cost)
+    if not result.allowed and (len(items) > 1 or cost > 1):
+        await storage.decr_many(keys, cost)
+    return result
+
+
+async def _ahit(
+    rate_limiter: AsyncRateLimiter,
+    items: Sequence[RateLimitItem],
+    identifiers: Sequence[str],
+    cost: int,
+) -> bool:
+    if len(items) == 1:
+        return await rate_limiter.hit(items[0], *identifiers, cost=cost)
+    for item in items:
+        if not await rate_limiter.test(item, *identifiers, cost=cost):
+            return False
+    return all(
+        [await rate_limiter.hit(item, *identifiers, cost=cost) for item in items]
+    )
+
+
+async def _awindow_stats(
+    rate_limiter: AsyncRateLimiter,
+    items: Sequence[RateLimitItem],
+    identifiers: Sequence[str],
+    allowed: bool,
+) -> RateLimitResult:
+    return window_stats_result(
+        allowed,
+        [
+            (item, await rate_limiter.get_window_stats(item, *identifiers))
+            for item in items
+        ],
+    )
+
+
+async def acan_hit_all(
+    rate_limiter: AsyncRateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+) -> bool:
+    """Async version of `can_hit_all`."""
+    penalty_box = get_penalty_box()
+    if penalty_box is not None and penalty_box.get(items, *identifiers):
+        return False
+    if is_fixed_window(rate_limiter):
+        counts = await cast(AsyncCacheStorage, rate_limiter.storage).get_many(
+            [item.key_for(*identifiers) for item in items]
+        )
+        return all(count + cost <= item.amount for count, item in zip(counts, items))
+    for item in items:
+        if not await rate_limiter.test(item, *identifiers, cost=cost):
+            return False
+    return True
+
+
+async def ahit_all(
+    rate_limiter: AsyncRateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+    lease: bool = False,
+) -> bool:
+    """Async version of `hit_all`."""
+    penalty_box = get_penalty_box()
+    if penalty_box is not None and penalty_box.get(items, *identifiers):
+        return False
+    if is_fixed_window(rate_limiter):
+        result = await _afixed_window_hit(rate_limiter, items, identifiers, cost, lease)
+    elif await _ahit(rate_limiter, items, identifiers, cost):
+        return True
+    elif penalty_box is None:
+        return False
+    else:
+        result = await _awindow_stats(rate_limiter, items, identifiers, False)
+    if penalty_box is not None:
+        penalty_box.block(result, *identifiers)
+    return result.allowed
+
+
+async def ahit_all_with_stats(
+    rate_limiter: AsyncRateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+    lease: bool = False,
+) -> RateLimitResult:
+    """Async version of `hit_all_with_stats`."""
+    penalty_box = get_penalty_box()
+    if penalty_box is not None and (result := penalty_box.get(items, *identifiers)):
+        return result
+    if is_fixed_window(rate_limiter):
+        result = await _afixed_window_hit(rate_limiter, items, identifiers, cost, lease)
+    else:
+        allowed = await _ahit(rate_limiter, items, identifiers, cost)
+        result = await _awindow_stats(rate_limiter, items, identifiers, allowed)
+    if penalty_box is not None:
+        penalty_box.block(result, *identifiers)
+    return result
+
+
+def hit_all_or_wait(
+    rate_limiter: RateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+    lease: bool = False,
+    max_wait: float,
+) -> RateLimitResult:
+    """Same as `hit_all_with_stats`, but waits for the limit reset and hits again
+    while the total wait time is less than `max_wait` seconds."""
+    deadline = time.monotonic() + max_wait
+    while True:
+        result = hit_all_with_stats(
+            rate_limiter, items, *identifiers, cost=cost, lease=lease
+        )
+        delay = max(result.reset_time - time.time(), MIN_WAIT)
+        if result.allowed or time.monotonic() + delay > deadline:
+            return result
+        time.sleep(delay)
+
+
+async def ahit_all_or_wait(
+    rate_limiter: AsyncRateLimiter,
+    items: Sequence[RateLimitItem],
+    *identifiers: str,
+    cost: int = 1,
+    lease: bool = False,
+    max_wait: float,
+) -> RateLimitResult:
+    """Async version of `hit_all_or_wait`, waits with `asyncio.sleep`."""
+    deadline = time.monotonic() + max_wait
+    while True:
+        result = await ahit_all_with_stats(
+            rate_limiter, items, *identifiers, cost=cost, lease=lease
+        )
+        delay = max(result.reset_time - time.time(), MIN_WAIT)
+        if result.allowed or time.monotonic() + delay > deadline:
+            return result
+        await asyncio.sleep(delay)
+
+
+def ratelimit_headers(result: RateLimitResult) -> dict[str, str]:
+    """Returns `X-RateLimit-*` headers for a result, and `Retry-After` if rate limit is exceeded."""
+    reset_time = math.ceil(result.reset_time)
+    headers = {
+        "X-RateLimit-Limit": str(result.item.amount),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(reset_time),
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(max(0, reset_time - int(time.time())))
+    return headers
+
+
+def set_ratelimit_headers(
+    response: HttpResponse,
+    result: Optional[RateLimitResult],
+    copy_response: bool = False,
+) -> HttpResponse:
+    """Sets rate limit headers of the result on the response.
+
+    Shared response instances (i.e. custom rate limit responses) should be copied.
+    """
+    if result is None:
+        return response
+    if copy_response:
+        response = copy.copy(response)
+        response.headers = ResponseHeaders(response.headers)
+    for header, value in ratelimit_headers(result).items():
+        response[header] = value
+    return response
@@ -1,23 +1,6 @@
-from typing import Optional
-
-from django.http import HttpRequest
-from django.urls import resolve, Resolver404
-
 from django_ratelimiter.middleware import AbstractRateLimiterMiddleware
 
 
 class RateLimiterMiddleware(AbstractRateLimiterMiddleware):
-    def rate_for(self, request: HttpRequest) -> Optional[str]:
-        match = None
-        try:
-            match = resolve(request.path_info)
-        except Resolver404:
-            pass
-        # only ratelimit /test-middleware/hit/ requests
-        if (
-            match
-            and match.url_name == "test_middleware"
-            and match.kwargs["kind"] == "hit"
-        ):
-            return "3/minute"
-        return None
+    # only ratelimit /test-middleware/hit/ requests
+    RULES = {"/test-middleware/hit/": "3/minute"}
@@ -35,11 +35,27 @@ urlpatterns = [
         views.fixed_window_elastic_expiry,
         name="fixed_window_elastic_expiry",
     ),
+    path(
+        "sliding-window-counter/",
+        views.sliding_window_counter,
+        name="sliding_window_counter",
+    ),
+    path("gcra/", views.gcra, name="gcra"),
+    path("multiple-rates/", views.multiple_rates, name="multiple_rates"),
+    path(
+        "multiple-rates/memory/",
+        views.multiple_rates_memory,
+        name="multiple_rates_memory",
+    ),
+    path("headers/", views.headers, name="headers"),
+    path("headers/memory/", views.headers_memory, name="headers_memory"),
     path("teapot/", views.teapot, name="teapot"),
     path("cbv/", views.TestView.as_view()),
     path("storage/redis/", views.redis, name="redis_storage"),
     path("storage/memory/", views.memory, name="memory_storage"),
     path("storage/memcached/", views.memcached, name="memcached_storage"),
+    path("async/defaults/", views.async_defaults, name="async_defaults"),
+    path("async/memory/", views.async_memory, name="async_memory"),
     path("drf/api-view/", views.drf_api_view, name="drf_api_view"),
     path("drf/view/", views.TestDRFView.as_view(), name="drf_view"),
     path("ninja/", views.api.urls),
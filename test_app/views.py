@@ -3,6 +3,7 @@ from django.http import HttpRequest, HttpResponse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.http import require_http_methods
+from limits.aio.storage import MemoryStorage as AsyncMemoryStorage
 from limits.storage import MemoryStorage, RedisStorage, MemcachedStorage
 from ninja import NinjaAPI
 from rest_framework import viewsets, serializers, views
@@ -13,6 +14,9 @@ from rest_framework.response import Response
 from django_ratelimiter import ratelimit
 
 
+memory_storage = MemoryStorage()
+
+
 @ratelimit("5/minute")
 def defaults(_: HttpRequest, count: int) -> HttpResponse:
     return HttpResponse(f"{count}")
@@ -39,6 +43,36 @@ def fixed_window_elastic_expiry(_: HttpRequest) -> HttpResponse:
     return HttpResponse("OK")
 
 
+@ratelimit("5/minute", strategy="sliding-window-counter")
+def sliding_window_counter(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+@ratelimit("5/minute", strategy="gcra")
+def gcra(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+@ratelimit("2/second;3/minute")
+def multiple_rates(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+@ratelimit(["2/second", "3/minute"], storage=memory_storage)
+def multiple_rates_memory(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+@ratelimit("2/minute;5/hour", headers=True)
+def headers(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+@ratelimit("2/minute", headers=True, storage=memory_storage)
+def headers_memory(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
 @ratelimit("1/minute", response=HttpResponse(status=418))
 def teapot(_: HttpRequest) -> HttpResponse:
     return HttpResponse("OK")
@@ -53,7 +87,6 @@ class TestView(View):
         return HttpResponse("OK")
 
 
-memory_storage = MemoryStorage()
 redis_storage = RedisStorage(uri="redis://localhost:6379/0")
 memcached_storage = MemcachedStorage(uri="memcached://localhost:11211")
 
@@ -73,6 +106,19 @@ def memcached(_: HttpRequest) -> HttpResponse:
     return HttpResponse("OK")
 
 
+@ratelimit("5/minute")
+async def async_defaults(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
+async_memory_storage = AsyncMemoryStorage()
+
+
+@ratelimit("5/minute", storage=async_memory_storage)
+async def async_memory(_: HttpRequest) -> HttpResponse:
+    return HttpResponse("OK")
+
+
 @api_view(["GET"])
 @ratelimit("5/minute")
 def drf_api_view(_: Request) -> Response:
@@ -0,0 +1,122 @@
+import asyncio
+import uuid
+
+import freezegun
+import pytest
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from django_ratelimiter.concurrency import concurrency_limit, get_semaphore_storage
+from django_ratelimiter.middleware import AbstractRateLimiterMiddleware
+from django_ratelimiter.storage import AsyncCacheStorage, CacheStorage
+from tests.utils import CallCounter
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def test_concurrency_limit():
+    responses = []
+
+    @concurrency_limit(1)
+    def view(request):
+        # nested request while the slot is taken
+        responses.append(view(request))
+        return HttpResponse("OK")
+
+    assert view(RequestFactory().get("/")).status_code == 200
+    assert responses[0].status_code == 429
+    # slot is released after the response
+    assert view(RequestFactory().get("/")).status_code == 200
+
+
+def test_concurrency_limit_exception():
+    @concurrency_limit(1, key=lambda request: request.GET["user"])
+    def view(request):
+        raise ValueError
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            view(RequestFactory().get("/", {"user": "a"}))
+
+
+def test_concurrency_limit_async():
+    @concurrency_limit(2)
+    async def view(request):
+        await asyncio.sleep(0.05)
+        return HttpResponse("OK")
+
+    async def run():
+        return await asyncio.gather(
+            *(view(RequestFactory().get("/")) for _ in range(3))
+        )
+
+    assert sorted(response.status_code for response in asyncio.run(run())) == [
+        200,
+        200,
+        429,
+    ]
+
+
+def test_semaphore_lease_expiry():
+    storage = get_semaphore_storage()
+    with freezegun.freeze_time("2024-01-01 00:00:00") as frozen:
+        lease = storage.acquire_semaphore("key", 2, 10)
+        assert storage.acquire_semaphore("key", 2, 10)
+        assert storage.acquire_semaphore("key", 2, 10) is None
+        # slots of crashed processes are recovered after the lease expires
+        frozen.tick(11)
+        assert storage.acquire_semaphore("key", 2, 10)
+        # expired lease doesn't release a slot acquired by another process
+        storage.release_semaphore(*lease)
+        assert storage.acquire_semaphore("key", 2, 10)
+        assert storage.acquire_semaphore("key", 2, 10) is None
+
+
+def test_redis_semaphore_release():
+    storage = CacheStorage("redis")
+    storage.cache = counter = CallCounter(storage.cache)
+    key = str(uuid.uuid4())
+    slot, token = storage.acquire_semaphore(key, 1, 10)
+    # slot of another lease is not released
+    storage.release_semaphore(slot, uuid.uuid4().hex)
+    assert storage.acquire_semaphore(key, 1, 10) is None
+    # token is compared and the slot deleted in a single script
+    storage.release_semaphore(slot, token)
+    assert "get" not in counter.calls
+    assert "delete" not in counter.calls
+    assert storage.acquire_semaphore(key, 1, 10) is not None
+
+
+def test_async_redis_semaphore_release():
+    async def run():
+        storage = AsyncCacheStorage("redis")
+        key = str(uuid.uuid4())
+        slot, token = await storage.acquire_semaphore(key, 1, 10)
+        await storage.release_semaphore(slot, uuid.uuid4().hex)
+        assert await storage.acquire_semaphore(key, 1, 10) is None
+        await storage.release_semaphore(slot, token)
+        assert await storage.acquire_semaphore(key, 1, 10) is not None
+
+    asyncio.run(run())
+
+
+class ConcurrencyMiddleware(AbstractRateLimiterMiddleware):
+    CONCURRENCY_LIMIT = 1
+
+
+def test_middleware_concurrency_limit(rf):
+    responses = []
+
+    def get_response(request):
+        if not responses:
+            responses.append(middleware(request))
+        return HttpResponse("OK")
+
+    middleware = ConcurrencyMiddleware(get_response)
+    assert middleware(rf.get("/")).status_code == 200
+    assert responses[0].status_code == 429
+    assert middleware(rf.get("/")).status_code == 200
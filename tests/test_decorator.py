@@ -1,13 +1,38 @@
-from datetime import datetime
+import asyncio
+import time
+from datetime import datetime, timedelta
 
 import freezegun
 import pytest
+from asgiref.sync import async_to_sync
 from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory
 from limits import parse
-
-from django_ratelimiter.decorator import get_rate_limiter
+from limits.aio.storage import MemoryStorage as AsyncMemoryStorage
+from limits.storage import MemoryStorage
+
+from django_ratelimiter.circuit_breaker import CircuitBreakerStorage
+from django_ratelimiter.costs import QueryCount, ResponseSize
+from django_ratelimiter.decorator import get_rate_limiter, ratelimit
+from django_ratelimiter.deferred import get_async_deferred_hits, get_deferred_hits
+from django_ratelimiter.storage import CacheStorage
+from django_ratelimiter.utils import (
+    KEY_NAMES,
+    PenaltyBox,
+    RateLimitResult,
+    compile_identifiers,
+    get_penalty_box,
+    get_quota_leases,
+    hit_all,
+    hit_all_with_stats,
+    parse_rate,
+    parse_rates,
+    readable_key,
+)
 from test_app import views
-from tests.utils import wait_for_rate_limit
+from tests.utils import CallCounter, wait_for_rate_limit, async_wait_for_rate_limit
 
 TEST_RATE = parse("5/minute")
 
@@ -139,6 +164,467 @@ def test_fixed_window_with_elastic_expiry(client):
     assert new_stats.reset_time > stats.reset_time
 
 
+def test_sliding_window_counter():
+    with freezegun.freeze_time("2024-01-01 00:00:30") as frozen:
+        assert wait_for_rate_limit("/sliding-window-counter/") == 5
+        # half of the previous window counter is still in the sliding window
+        frozen.tick(60)
+        assert wait_for_rate_limit("/sliding-window-counter/") == 3
+        # previous windows are fully out of the sliding window
+        frozen.tick(120)
+        assert wait_for_rate_limit("/sliding-window-counter/") == 5
+
+
+def test_gcra():
+    with freezegun.freeze_time("2024-01-01 00:00:00") as frozen:
+        assert wait_for_rate_limit("/gcra/") == 5
+        # one hit is available every 12 seconds
+        frozen.tick(12)
+        assert wait_for_rate_limit("/gcra/") == 1
+        frozen.tick(30)
+        assert wait_for_rate_limit("/gcra/") == 2
+
+
+@pytest.mark.parametrize(
+    "path, view",
+    (
+        ("multiple-rates", views.multiple_rates),
+        ("multiple-rates/memory", views.multiple_rates_memory),
+    ),
+)
+def test_multiple_rates(path, view):
+    views.memory_storage.reset()
+    rate_limiter = get_rate_limiter("fixed-window")
+    identifiers = view.__module__, view.__qualname__
+    with freezegun.freeze_time("2024-01-01 00:00:00.5") as frozen:
+        assert wait_for_rate_limit(f"/{path}/") == 2
+        frozen.tick(1)
+        # per-second limit is reset, per-minute limit allows one more hit
+        assert wait_for_rate_limit(f"/{path}/") == 1
+        if path == "multiple-rates":
+            # rejected hits don't consume any of the limits
+            stats = rate_limiter.get_window_stats(parse("2/second"), *identifiers)
+            assert stats.remaining == 1
+            stats = rate_limiter.get_window_stats(parse("3/minute"), *identifiers)
+            assert stats.remaining == 0
+
+
+@pytest.mark.parametrize("path", ("headers", "headers/memory"))
+def test_headers(client, path):
+    views.memory_storage.reset()
+    with freezegun.freeze_time("2024-01-01 00:00:30"):
+        reset = str(int(time.time()) + 60)
+        response = client.get(f"/{path}/")
+        assert response.status_code == 200
+        assert response["X-RateLimit-Limit"] == "2"
+        assert response["X-RateLimit-Remaining"] == "1"
+        assert response["X-RateLimit-Reset"] == reset
+        assert "Retry-After" not in response
+
+        assert client.get(f"/{path}/")["X-RateLimit-Remaining"] == "0"
+
+        response = client.get(f"/{path}/")
+        assert response.status_code == 429
+        assert response["X-RateLimit-Limit"] == "2"
+        assert response["X-RateLimit-Remaining"] == "0"
+        assert response["X-RateLimit-Reset"] == reset
+        assert response["Retry-After"] == "60"
+
+
+def test_headers_without_extra_round_trips():
+    storage = CacheStorage("default")
+    storage.cache = counter = CallCounter(storage.cache)
+    rate_limiter = get_rate_limiter("fixed-window", storage)
+    result = hit_all_with_stats(rate_limiter, parse_rates("5/minute;10/hour"), "key")
+    assert result.allowed
+    assert result.remaining == 4
+    assert counter.calls == ["incr", "add", "incr", "add"]
+
+
+@pytest.fixture
+def penalty_box(settings):
+    settings.DJANGO_RATELIMITER_PENALTY_BOX = 100
+    get_penalty_box.cache_clear()
+    yield get_penalty_box()
+    get_penalty_box.cache_clear()
+
+
+def counted_cache_storage():
+    storage = CacheStorage("default")
+    storage.cache = CallCounter(storage.cache)
+    return storage, storage.cache.calls
+
+
+def counted_memory_storage():
+    calls = []
+
+    class CountedMemoryStorage(MemoryStorage):
+        def acquire_entry(self, *args, **kwargs):
+            calls.append("acquire_entry")
+            return super().acquire_entry(*args, **kwargs)
+
+        def get_moving_window(self, *args, **kwargs):
+            calls.append("get_moving_window")
+            return super().get_moving_window(*args, **kwargs)
+
+    return CountedMemoryStorage(), calls
+
+
+@pytest.mark.parametrize(
+    "strategy,storage_factory",
+    [
+        ("fixed-window", counted_cache_storage),
+        ("moving-window", counted_memory_storage),
+    ],
+)
+def test_penalty_box(penalty_box, strategy, storage_factory):
+    storage, calls = storage_factory()
+    rate_limiter = get_rate_limiter(strategy, storage)
+    items = parse_rates("2/minute")
+    assert hit_all(rate_limiter, items, "key")
+    assert hit_all(rate_limiter, items, "key")
+    assert not hit_all(rate_limiter, items, "key")
+    storage_calls = len(calls)
+
+    result = hit_all_with_stats(rate_limiter, items, "key")
+    assert not hit_all(rate_limiter, items, "key")
+    assert not result.allowed
+    assert result.remaining == 0
+    assert result.reset_time > time.time()
+    assert len(calls) == storage_calls
+    # other identifiers are not blocked
+    assert hit_all(rate_limiter, items, "other")
+
+    with freezegun.freeze_time(datetime.now() + timedelta(minutes=1, seconds=1)):
+        assert penalty_box.get(items, "key") is None
+    assert not penalty_box.blocked.get(items[0].key_for("key"))
+
+
+def test_penalty_box_eviction():
+    box = PenaltyBox(maxsize=2)
+    items = parse_rates("1/minute")
+    for key in ("a", "b", "c"):
+        box.block(RateLimitResult(False, items[0], 0, time.time() + 60), key)
+    assert box.get(items, "a") is None
+    assert box.get(items, "b") is not None
+    assert box.get(items, "c") is not None
+    # rejected due to cost, the limit still has remaining hits
+    box.block(RateLimitResult(False, items[0], 1, time.time() + 60), "d")
+    assert box.get(items, "d") is None
+
+
+def test_circuit_breaker_batched_hits():
+    storage, calls = counted_cache_storage()
+    rate_limiter = get_rate_limiter("fixed-window", CircuitBreakerStorage(storage))
+    items = parse_rates(["2/minute", "5/hour"])
+    result = hit_all_with_stats(rate_limiter, items, "key")
+    # both limits are incremented in one batch, stats come from the increment
+    assert calls == ["incr", "add", "incr", "add"]
+    assert result.allowed
+    assert result.remaining == 1
+    assert hit_all(rate_limiter, items, "key")
+    assert not hit_all(rate_limiter, items, "key")
+    # rejected hits are rolled back
+    assert storage.get(items[1].key_for("key")) == 2
+
+
+def test_circuit_breaker_batched_hits_fallback():
+    class BrokenStorage(CacheStorage):
+        def incr_many(self, *args, **kwargs):
+            raise ConnectionError
+
+    storage = CircuitBreakerStorage(
+        BrokenStorage("default"), failures=1, probe_interval=60
+    )
+    rate_limiter = get_rate_limiter("fixed-window", storage)
+    items = parse_rates("2/minute")
+    # limits are applied per process by the memory fallback
+    for _ in range(2):
+        assert hit_all_with_stats(rate_limiter, items, "key").allowed
+    assert storage.circuit_breaker.is_open
+    result = hit_all_with_stats(rate_limiter, items, "key")
+    assert not result.allowed
+    assert result.reset_time > time.time()
+
+
+@pytest.fixture
+def quota_leases(settings):
+    settings.DJANGO_RATELIMITER_LEASE_TOLERANCE = 0.1
+    settings.DJANGO_RATELIMITER_WORKERS = 2
+    get_quota_leases.cache_clear()
+    yield get_quota_leases()
+    get_quota_leases.cache_clear()
+
+
+def test_quota_leases(quota_leases):
+    storage, calls = counted_cache_storage()
+    rate_limiter = get_rate_limiter("fixed-window", storage)
+    items = parse_rates("100/minute")
+
+    result = hit_all_with_stats(rate_limiter, items, "key", lease=True)
+    assert result.allowed
+    assert result.remaining == 99
+    # a block of 10 hits is reserved with a single increment
+    for _ in range(9):
+        assert hit_all(rate_limiter, items, "key", lease=True)
+    assert calls == ["incr", "add"]
+    assert storage.get(items[0].key_for("key")) == 10
+
+    allowed = 10
+    while hit_all(rate_limiter, items, "key", lease=True):
+        allowed += 1
+    assert allowed == 100
+    # blocks shrink with remaining hits
+    assert len(calls) < 30
+    assert storage.get(items[0].key_for("key")) == 100
+
+    # exhausted window is rejected without storage round trips
+    storage_calls = len(calls)
+    assert not hit_all(rate_limiter, items, "key", lease=True)
+    assert len(calls) == storage_calls
+
+
+def test_quota_leases_shared_counter(quota_leases):
+    rate_limiter = get_rate_limiter("fixed-window")
+    items = parse_rates("10/minute")
+    assert hit_all(rate_limiter, items, "key", lease=True)
+    # hits reserved by other processes are not available
+    rate_limiter.storage.incr(items[0].key_for("key"), 60, amount=9)
+    assert not hit_all(rate_limiter, items, "key", lease=True)
+
+
+@pytest.mark.parametrize(
+    "storage", [CacheStorage("default"), MemoryStorage()], ids=["cache", "memory"]
+)
+def test_striped_fixed_window(storage):
+    rate_limiter = get_rate_limiter("fixed-window", storage, stripes=4)
+    items = parse_rates("5/minute")
+    for _ in range(5):
+        assert hit_all(rate_limiter, items, "striped")
+    assert not hit_all(rate_limiter, items, "striped")
+    reset_time, remaining = rate_limiter.get_window_stats(items[0], "striped")
+    assert remaining == 0
+    assert reset_time == (time.time() // 60 + 1) * 60
+    rate_limiter.clear(items[0], "striped")
+    assert rate_limiter.test(items[0], "striped")
+
+    with pytest.raises(ValueError):
+        get_rate_limiter("moving-window", storage, stripes=4)
+
+
+def test_striped_fixed_window_round_trips():
+    storage, calls = counted_cache_storage()
+    rate_limiter = get_rate_limiter("fixed-window", storage, stripes=8)
+    items = parse_rates("5/minute")
+    assert hit_all(rate_limiter, items, "striped")
+    assert calls == ["incr", "add", "get_many"]
+
+
+def test_deferred_mode():
+    def login(request):
+        return HttpResponse(status=int(request.GET["status"]))
+
+    view = ratelimit(
+        "2/minute",
+        mode="deferred",
+        storage=MemoryStorage(),
+        count_if=lambda request, response: response.status_code >= 400,
+    )(login)
+    for _ in range(3):
+        assert view(RequestFactory().get("/", {"status": 200})).status_code == 200
+    get_deferred_hits().flush()
+    for _ in range(2):
+        assert view(RequestFactory().get("/", {"status": 401})).status_code == 401
+    get_deferred_hits().flush()
+    assert view(RequestFactory().get("/", {"status": 200})).status_code == 429
+
+    with pytest.raises(ValueError):
+        ratelimit("2/minute", count_if=lambda request, response: True)
+
+
+@pytest.mark.parametrize(
+    "strategy,storage",
+    [
+        ("fixed-window", MemoryStorage),
+        ("moving-window", MemoryStorage),
+        ("sliding-window-counter", lambda: CacheStorage("locmem")),
+        ("gcra", lambda: CacheStorage("locmem")),
+    ],
+)
+def test_deferred_mode_strategies(strategy, storage):
+    def login(request):
+        return HttpResponse(status=401)
+
+    view = ratelimit(
+        "5/minute",
+        mode="deferred",
+        strategy=strategy,
+        storage=storage(),
+        count_if=lambda request, response: response.status_code >= 400,
+    )(login)
+    for _ in range(2):
+        for _ in range(3):
+            assert view(RequestFactory().get("/")).status_code == 401
+        get_deferred_hits().flush()
+    # hits which fit in the limit are consumed, the limit is exceeded
+    assert view(RequestFactory().get("/")).status_code == 429
+
+
+def test_async_deferred_mode_strategies():
+    async def view(request):
+        return HttpResponse("OK")
+
+    view = ratelimit(
+        "5/minute",
+        mode="deferred",
+        strategy="moving-window",
+        storage=AsyncMemoryStorage(),
+    )(view)
+
+    async def run():
+        for _ in range(2):
+            for _ in range(3):
+                assert (await view(RequestFactory().get("/"))).status_code == 200
+            await get_async_deferred_hits().flush()
+        assert (await view(RequestFactory().get("/"))).status_code == 429
+
+    asyncio.run(run())
+
+
+def test_async_deferred_mode():
+    async def view(request):
+        return HttpResponse("OK")
+
+    view = ratelimit("2/minute", mode="deferred", storage=AsyncMemoryStorage())(view)
+
+    async def run():
+        for _ in range(2):
+            assert (await view(RequestFactory().get("/"))).status_code == 200
+        # hits are not consumed until the queue is flushed
+        assert (await view(RequestFactory().get("/"))).status_code == 200
+        await get_async_deferred_hits().flush()
+        assert (await view(RequestFactory().get("/"))).status_code == 429
+
+    asyncio.run(run())
+
+
+def test_async_deferred_mode_async_to_sync():
+    async def view(request):
+        return HttpResponse("OK")
+
+    # async views are run in a new event loop per request under WSGI
+    view = async_to_sync(
+        ratelimit("2/minute", mode="deferred", storage=AsyncMemoryStorage())(view)
+    )
+    for _ in range(2):
+        assert view(RequestFactory().get("/")).status_code == 200
+    assert view(RequestFactory().get("/")).status_code == 429
+
+
+def test_wait_on_limit():
+    def view(request):
+        return HttpResponse("OK")
+
+    waiting = ratelimit("4/second", strategy="gcra", on_limit="wait", max_wait=1)(view)
+    started = time.monotonic()
+    for _ in range(5):
+        assert waiting(RequestFactory().get("/")).status_code == 200
+    # the fifth request waits for the next slot
+    assert 0.2 <= time.monotonic() - started < 1
+
+    with pytest.raises(ValueError):
+        ratelimit("1/second", mode="deferred", on_limit="wait")
+
+
+def test_wait_on_limit_max_wait():
+    async def view(request):
+        return HttpResponse("OK")
+
+    view = ratelimit("1/minute", on_limit="wait", max_wait=0.1, headers=True)(view)
+
+    async def run():
+        assert (await view(RequestFactory().get("/"))).status_code == 200
+        started = time.monotonic()
+        response = await view(RequestFactory().get("/"))
+        assert response.status_code == 429
+        assert 59 <= int(response["Retry-After"]) <= 61
+        # the limit is not reset in time, request is rejected without waiting
+        assert time.monotonic() - started < 0.1
+
+    asyncio.run(run())
+
+
+def test_cost():
+    def view(request):
+        return HttpResponse("OK")
+
+    bulk = ratelimit(
+        "10/minute", cost=lambda request: len(request.GET.getlist("id")), headers=True
+    )(view)
+    response = bulk(RequestFactory().get("/", {"id": range(6)}))
+    assert response.status_code == 200
+    assert response["X-RateLimit-Remaining"] == "4"
+    # rejected requests don't consume the remaining hits
+    assert bulk(RequestFactory().get("/", {"id": range(5)})).status_code == 429
+    assert bulk(RequestFactory().get("/", {"id": range(4)})).status_code == 200
+
+
+def test_response_cost():
+    def view(request):
+        return HttpResponse(b"x" * 2500)
+
+    view = ratelimit("5/minute", response_cost=ResponseSize(unit=1000))(view)
+    assert view(RequestFactory().get("/")).status_code == 200
+    get_deferred_hits().flush()
+    assert view(RequestFactory().get("/")).status_code == 200
+    get_deferred_hits().flush()
+    # 2 requests + 3 hits for each response
+    assert view(RequestFactory().get("/")).status_code == 429
+
+
+@pytest.mark.django_db
+def test_response_cost_queries():
+    def view(request):
+        User.objects.count()
+        User.objects.exists()
+        return HttpResponse("OK")
+
+    view = ratelimit("5/minute", response_cost=QueryCount())(view)
+    for _ in range(2):
+        assert view(RequestFactory().get("/")).status_code == 200
+    get_deferred_hits().flush()
+    assert view(RequestFactory().get("/")).status_code == 429
+
+
+def test_compact_keys(settings, fixed_window):
+    settings.DJANGO_RATELIMITER_COMPACT_KEYS = True
+    identifiers = compile_identifiers(views.teapot, methods="GET")(
+        RequestFactory().get("/")
+    )
+    assert identifiers is not None and len(identifiers) == 1
+    assert len(identifiers[0]) == 8
+    assert KEY_NAMES[identifiers[0]] == "test_app.views/teapot/GET"
+
+    view = ratelimit("5/minute", methods="GET")(views.teapot)
+    for _ in range(2):
+        view(RequestFactory().get("/"))
+    stats = fixed_window.get_window_stats(TEST_RATE, *identifiers)
+    assert stats.remaining == 3
+    key = TEST_RATE.key_for(*identifiers)
+    assert readable_key(key) == key.replace(identifiers[0], "test_app.views/teapot/GET")
+
+
+def test_rate_compiled_on_decoration():
+    with pytest.raises(ValueError):
+        ratelimit("invalid")
+
+    parse_rate.cache_clear()
+    view = ratelimit(lambda _: "5/minute")(views.teapot)
+    for _ in range(3):
+        view(RequestFactory().get("/"))
+    assert parse_rate.cache_info().misses == 1
+
+
 def test_custom_response(client):
     response = client.get("/teapot/")
     assert response.status_code == 200
@@ -168,6 +654,11 @@ def test_limits_storage(path, storage, view):
     assert wait_for_rate_limit(f"/storage/{path}/") == 5
 
 
+@pytest.mark.parametrize("path", ("defaults", "memory"))
+def test_async_view(path):
+    assert asyncio.run(async_wait_for_rate_limit(f"/async/{path}/")) == 5
+
+
 @pytest.mark.parametrize(
     "url",
     [
@@ -0,0 +1,131 @@
+import asyncio
+import ipaddress
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory
+from limits.aio.storage import MemoryStorage as AsyncMemoryStorage
+from limits.storage import MemoryStorage, Storage
+
+from django_ratelimiter.decorator import ratelimit
+from django_ratelimiter.exemptions import PrefixIndex, get_exemptions
+from django_ratelimiter.middleware import AbstractRateLimiterMiddleware
+
+
+@pytest.fixture(autouse=True)
+def exempt(settings):
+    settings.DJANGO_RATELIMITER_EXEMPT = {
+        "ips": ["10.0.0.0/8", "192.168.1.1", "2001:db8::/32"],
+        "users": [1],
+        "headers": {"X-Internal-Token": ["secret"]},
+    }
+    get_exemptions.cache_clear()
+    yield
+    get_exemptions.cache_clear()
+
+
+def view(request):
+    return HttpResponse("OK")
+
+
+def test_prefix_index():
+    networks = [f"172.{i // 256}.{i % 256}.0/24" for i in range(4096)]
+    index = PrefixIndex([*networks, "10.0.0.0/8", "192.168.1.1", "2001:db8::/32"])
+    assert "172.15.255.1" in index
+    assert "172.16.0.1" not in index
+    assert "10.255.0.1" in index
+    assert "11.0.0.1" not in index
+    assert "192.168.1.1" in index
+    assert "192.168.1.2" not in index
+    assert "2001:db8::1" in index
+    assert "2001:db9::1" not in index
+    assert "::ffff:10.0.0.1" in index
+    assert "invalid" not in index
+    # one set per prefix length
+    by_length = index.prefixes[4][1]
+    assert {length: len(prefixes) for length, prefixes in by_length.items()} == {
+        24: 4096,
+        8: 1,
+        32: 1,
+    }
+    assert index.prefixes[6][1] == {32: {int(ipaddress.ip_address("2001:db8::")) >> 96}}
+
+
+@pytest.mark.parametrize(
+    "request_kwargs,user",
+    [
+        ({"REMOTE_ADDR": "10.1.2.3"}, None),
+        ({"HTTP_X_INTERNAL_TOKEN": "secret"}, None),
+        ({}, SimpleNamespace(is_authenticated=True, pk=1)),
+    ],
+)
+def test_exempt(request_kwargs, user):
+    storage = MemoryStorage()
+    limited = ratelimit("1/minute", storage=storage)(view)
+    for _ in range(3):
+        request = RequestFactory().get("/", **request_kwargs)
+        if user is not None:
+            request.user = user
+        assert limited(request).status_code == 200
+    # exempt requests are not counted
+    assert not storage.storage
+
+
+@pytest.mark.parametrize(
+    "request_kwargs,user",
+    [
+        ({"REMOTE_ADDR": "11.1.2.3"}, None),
+        ({"HTTP_X_INTERNAL_TOKEN": "invalid"}, None),
+        ({}, SimpleNamespace(is_authenticated=True, pk=2)),
+        ({}, AnonymousUser()),
+    ],
+)
+def test_not_exempt(request_kwargs, user):
+    limited = ratelimit("1/minute", storage=MemoryStorage())(view)
+    statuses = []
+    for _ in range(2):
+        request = RequestFactory().get("/", **request_kwargs)
+        if user is not None:
+            request.user = user
+        statuses.append(limited(request).status_code)
+    assert statuses == [200, 429]
+
+
+def test_async_exempt():
+    async def async_view(request):
+        return HttpResponse("OK")
+
+    storage = AsyncMemoryStorage()
+    limited = ratelimit("1/minute", storage=storage)(async_view)
+
+    async def run():
+        for _ in range(3):
+            request = RequestFactory().get("/", REMOTE_ADDR="192.168.1.1")
+            assert (await limited(request)).status_code == 200
+        assert (await limited(RequestFactory().get("/"))).status_code == 200
+        assert (await limited(RequestFactory().get("/"))).status_code == 429
+
+    asyncio.run(run())
+
+
+memory_storage = MemoryStorage()
+
+
+class ExemptMiddleware(AbstractRateLimiterMiddleware):
+    def storage_for(self, request: HttpRequest) -> Storage:
+        return memory_storage
+
+    def rate_for(self, request: HttpRequest) -> str:
+        return "1/minute"
+
+
+def test_middleware_exempt(rf):
+    memory_storage.reset()
+    middleware = ExemptMiddleware(view)
+    for _ in range(3):
+        assert middleware(rf.get("/", REMOTE_ADDR="10.0.0.1")).status_code == 200
+    assert not memory_storage.storage
+    assert middleware(rf.get("/")).status_code == 200
+    assert middleware(rf.get("/")).status_code == 429
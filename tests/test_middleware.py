@@ -1,8 +1,174 @@
-from tests.utils import wait_for_rate_limit
+import asyncio
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpRequest, HttpResponse
+from limits.storage import MemoryStorage, Storage
+
+from django_ratelimiter.costs import ResponseSize
+from django_ratelimiter.deferred import get_deferred_hits
+from django_ratelimiter.middleware import AbstractRateLimiterMiddleware, Rule
+from tests.utils import wait_for_rate_limit, async_wait_for_rate_limit
 
 
 def test_middleware(client):
+    cache.clear()
     assert wait_for_rate_limit("/test-middleware/hit/") == 3
     for _ in range(5):
         response = client.get("/test-middleware/miss/")
         assert response.status_code == 200
+
+
+def test_async_middleware(async_client):
+    cache.clear()
+    assert asyncio.run(async_wait_for_rate_limit("/test-middleware/hit/")) == 3
+    for _ in range(5):
+        response = asyncio.run(async_client.get("/test-middleware/miss/"))
+        assert response.status_code == 200
+
+
+memory_storage = MemoryStorage()
+
+
+class RulesMiddleware(AbstractRateLimiterMiddleware):
+    RULES = {
+        "/storage/": "1/minute",
+        "/storage/memory/": Rule("2/minute", strategy="moving-window"),
+        "teapot": Rule("3/minute", key="method"),
+    }
+
+    def storage_for(self, request: HttpRequest) -> Storage:
+        return memory_storage
+
+
+def test_middleware_rules(rf):
+    memory_storage.reset()
+    middleware = RulesMiddleware(lambda _: HttpResponse("OK"))
+
+    # path prefix
+    assert middleware(rf.get("/storage/redis/")).status_code == 200
+    assert middleware(rf.get("/storage/memcached/")).status_code == 429
+    # longest path prefix wins
+    for _ in range(2):
+        assert middleware(rf.get("/storage/memory/")).status_code == 200
+    assert middleware(rf.get("/storage/memory/")).status_code == 429
+    # url name with a rule key
+    for _ in range(3):
+        assert middleware(rf.get("/teapot/")).status_code == 200
+    assert middleware(rf.get("/teapot/")).status_code == 429
+    assert middleware(rf.post("/teapot/")).status_code == 200
+    # no matching rule
+    for _ in range(5):
+        assert middleware(rf.get("/cbv/")).status_code == 200
+
+
+class HeadersMiddleware(AbstractRateLimiterMiddleware):
+    RULES = {"/": "1/minute"}
+    HEADERS = True
+
+
+def test_middleware_headers(rf):
+    cache.clear()
+    middleware = HeadersMiddleware(lambda _: HttpResponse("OK"))
+
+    response = middleware(rf.get("/"))
+    assert response.status_code == 200
+    assert response["X-RateLimit-Limit"] == "1"
+    assert response["X-RateLimit-Remaining"] == "0"
+
+    response = middleware(rf.get("/"))
+    assert response.status_code == 429
+    assert response["X-RateLimit-Remaining"] == "0"
+    assert int(response["Retry-After"]) > 0
+
+
+class DeferredMiddleware(AbstractRateLimiterMiddleware):
+    RULES = {"/login/": "2/minute"}
+    MODE = "deferred"
+
+    def count_if(self, request: HttpRequest, response: HttpResponse) -> bool:
+        return response.status_code >= 400
+
+
+def test_middleware_deferred(rf):
+    cache.clear()
+    middleware = DeferredMiddleware(
+        lambda request: HttpResponse(status=int(request.GET["status"]))
+    )
+    for _ in range(3):
+        assert middleware(rf.get("/login/", {"status": 200})).status_code == 200
+    get_deferred_hits().flush()
+    for _ in range(2):
+        assert middleware(rf.get("/login/", {"status": 401})).status_code == 401
+    get_deferred_hits().flush()
+    assert middleware(rf.get("/login/", {"status": 200})).status_code == 429
+
+
+class WaitMiddleware(AbstractRateLimiterMiddleware):
+    RULES = {"/": Rule("4/second", strategy="gcra")}
+    ON_LIMIT = "wait"
+    MAX_WAIT = 1
+
+
+def test_middleware_wait(rf):
+    cache.clear()
+    middleware = WaitMiddleware(lambda _: HttpResponse("OK"))
+    started = time.monotonic()
+    for _ in range(5):
+        response = middleware(rf.get("/"))
+        assert response.status_code == 200
+        assert "X-RateLimit-Limit" not in response
+    assert 0.2 <= time.monotonic() - started < 1
+
+
+class CostMiddleware(AbstractRateLimiterMiddleware):
+    RULES = {"/bulk/": "10/minute"}
+    RESPONSE_COST = ResponseSize(unit=10)
+
+    def cost_for(self, request: HttpRequest) -> int:
+        return len(request.GET.getlist("id"))
+
+
+def test_middleware_cost(rf):
+    cache.clear()
+    middleware = CostMiddleware(lambda request: HttpResponse(request.GET["body"]))
+    assert middleware(rf.get("/bulk/", {"id": range(5), "body": ""})).status_code == 200
+    assert middleware(rf.get("/bulk/", {"id": range(6), "body": ""})).status_code == 429
+    response = middleware(rf.get("/bulk/", {"id": range(1), "body": "x" * 20}))
+    assert response.status_code == 200
+    get_deferred_hits().flush()
+    # 5 + 1 hits before the responses, 2 hits after
+    assert middleware(rf.get("/bulk/", {"id": range(3), "body": ""})).status_code == 429
+    assert middleware(rf.get("/bulk/", {"id": range(2), "body": ""})).status_code == 200
+
+
+def test_middleware_compact_keys(settings, rf):
+    settings.DJANGO_RATELIMITER_COMPACT_KEYS = True
+    middleware = RulesMiddleware(lambda request: HttpResponse())
+    _, _, keys = middleware.limit_for(rf.get("/storage/memory/"))
+    assert [len(key) for key in keys] == [8, 8]
+    out = StringIO()
+    call_command("ratelimiter_key_names", "/".join(keys), stdout=out)
+    assert out.getvalue() == f"{middleware.name}//storage/memory/\n"
+
+
+class NoSlashRulesMiddleware(AbstractRateLimiterMiddleware):
+    RULES = {"/api": "2/minute", "/api/public/": "5/minute"}
+
+    def storage_for(self, request: HttpRequest) -> Storage:
+        return memory_storage
+
+
+def test_middleware_rules_without_trailing_slash(rf):
+    memory_storage.reset()
+    middleware = NoSlashRulesMiddleware(lambda _: HttpResponse("OK"))
+    assert middleware(rf.get("/api")).status_code == 200
+    assert middleware(rf.get("/api/users/1")).status_code == 200
+    assert middleware(rf.get("/api/users/2/")).status_code == 429
+    # explicit rules of paths below the prefix are kept
+    assert middleware(rf.get("/api/public/")).status_code == 200
+    # other paths sharing the prefix are not matched
+    assert middleware(rf.get("/apiv2/")).status_code == 200
+    assert middleware(rf.get("/apiv2/")).status_code == 200
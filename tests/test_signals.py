@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from limits.aio.storage import MemoryStorage as AsyncMemoryStorage
+from limits.storage import MemoryStorage
+
+from django_ratelimiter.decorator import ratelimit
+from django_ratelimiter.middleware import AbstractRateLimiterMiddleware
+from django_ratelimiter.signals import ratelimit_checked, ratelimit_error
+
+
+@pytest.fixture
+def checks():
+    received = []
+
+    def receiver(sender, **kwargs):
+        received.append(kwargs)
+
+    ratelimit_checked.connect(receiver)
+    yield received
+    ratelimit_checked.disconnect(receiver)
+
+
+def view(request):
+    return HttpResponse("OK")
+
+
+def test_decorator_signals(checks):
+    limited = ratelimit("1/minute", methods="GET", headers=True)(view)
+    assert limited(RequestFactory().get("/")).status_code == 200
+    assert limited(RequestFactory().get("/")).status_code == 429
+    # requests which are not limited are not checked
+    assert limited(RequestFactory().post("/")).status_code == 200
+
+    assert [check["allowed"] for check in checks] == [True, False]
+    assert checks[0]["name"] == f"{__name__}.view"
+    assert checks[0]["strategy"] == "fixed-window"
+    assert checks[0]["identifiers"] == (__name__, "view", "GET")
+    assert checks[0]["result"].remaining == 0
+    assert checks[0]["duration"] > 0
+
+
+def test_async_decorator_signals(checks):
+    async def async_view(request):
+        return HttpResponse("OK")
+
+    limited = ratelimit("1/minute", storage=AsyncMemoryStorage())(async_view)
+
+    async def run():
+        assert (await limited(RequestFactory().get("/"))).status_code == 200
+        assert (await limited(RequestFactory().get("/"))).status_code == 429
+
+    asyncio.run(run())
+    assert [check["allowed"] for check in checks] == [True, False]
+    assert checks[0]["result"] is None
+
+
+def test_error_signal():
+    class BrokenStorage(MemoryStorage):
+        def incr(self, *args, **kwargs):
+            raise ConnectionError
+
+    errors = []
+
+    def receiver(sender, **kwargs):
+        errors.append(kwargs)
+
+    ratelimit_error.connect(receiver)
+    try:
+        limited = ratelimit("1/minute", storage=BrokenStorage())(view)
+        with pytest.raises(ConnectionError):
+            limited(RequestFactory().get("/"))
+    finally:
+        ratelimit_error.disconnect(receiver)
+    assert isinstance(errors[0]["exception"], ConnectionError)
+    assert errors[0]["name"] == f"{__name__}.view"
+
+
+class SignalsMiddleware(AbstractRateLimiterMiddleware):
+    RULES = {"/api/": "1/minute"}
+
+
+def test_middleware_signals(checks, rf):
+    cache.clear()
+    middleware = SignalsMiddleware(view)
+    assert middleware(rf.get("/api/")).status_code == 200
+    assert middleware(rf.get("/api/")).status_code == 429
+    assert middleware(rf.get("/other/")).status_code == 200
+    assert [(check["name"], check["allowed"]) for check in checks] == [
+        ("/api/", True),
+        ("/api/", False),
+    ]
+
+
+def test_prometheus(rf):
+    from django_ratelimiter import prometheus
+    from prometheus_client import REGISTRY
+
+    def sample(metric, **labels):
+        return REGISTRY.get_sample_value(metric, labels) or 0
+
+    labels = {"name": "/api/", "strategy": "fixed-window"}
+    limited = sample("django_ratelimiter_checks_total", **labels, outcome="limited")
+    cache.clear()
+    prometheus.connect()
+    try:
+        middleware = SignalsMiddleware(view)
+        for _ in range(3):
+            middleware(rf.get("/api/"))
+    finally:
+        prometheus.disconnect()
+    assert (
+        sample("django_ratelimiter_checks_total", **labels, outcome="limited")
+        == limited + 2
+    )
+    assert sample(
+        "django_ratelimiter_check_duration_seconds_count", strategy="fixed-window"
+    )
@@ -1,9 +1,49 @@
+import asyncio
+import fcntl
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
 import time
 
 import uuid
+import freezegun
 import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models.query import QuerySet
 
-from django_ratelimiter.storage import CacheStorage
+from limits import parse
+from limits.aio.storage import MemoryStorage as AsyncMemoryStorage
+from limits.storage import MemoryStorage
+
+from django_ratelimiter.circuit_breaker import (
+    AsyncCircuitBreakerStorage,
+    CircuitBreakerStorage,
+)
+from django_ratelimiter.shared_memory import (
+    AsyncSharedMemoryStorage,
+    SharedMemoryStorage,
+)
+from django_ratelimiter.sharding import (
+    AsyncShardedCacheStorage,
+    HashRing,
+    ShardedCacheStorage,
+)
+from django_ratelimiter.storage import (
+    AsyncCacheStorage,
+    AsyncDatabaseStorage,
+    CacheStorage,
+    DatabaseStorage,
+    database_key,
+)
+from django_ratelimiter.utils import (
+    get_async_rate_limiter,
+    get_rate_limiter,
+    get_storage,
+)
+from tests.utils import CallCounter
 
 
 @pytest.mark.django_db
@@ -49,3 +89,657 @@ def test_storage(cache):
     # negative expiry
     assert storage.incr("auto-remove", -1) == 1
     assert storage.get("auto-remove") == 0
+
+
+@pytest.mark.parametrize(
+    "cache",
+    [
+        "locmem",
+        "memcached",
+        "filebased",
+        "redis",
+    ],
+)
+def test_async_storage(cache):
+    async def run() -> None:
+        key = str(uuid.uuid4())
+        storage = AsyncCacheStorage(cache)
+        assert await storage.get(key) == 0
+        assert await storage.get_expiry(key) <= time.time()
+
+        assert await storage.incr(key, 3) == 1
+        initial_expiry = await storage.get_expiry(key)
+        assert await storage.incr(key, 5, amount=2) == 3
+        assert await storage.get_expiry(key) == initial_expiry
+
+        assert await storage.incr(key, 4, elastic_expiry=True) == 4
+        assert await storage.get_expiry(key) != initial_expiry
+        assert await storage.get(key) == 4
+
+        await storage.clear(key)
+        assert await storage.get(key) == 0
+
+        assert await storage.acquire_sliding_window_entry(key, 2, 60, amount=2)
+        assert not await storage.acquire_sliding_window_entry(key, 2, 60)
+        assert (await storage.get_sliding_window(key, 60))[2] == 2
+        await storage.clear_sliding_window(key, 60)
+        assert (await storage.get_sliding_window(key, 60))[2] == 0
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("cache", ["locmem", "memcached", "redis"])
+def test_storage_reset(cache):
+    storage = CacheStorage(cache)
+    other = CacheStorage(cache, generation_ttl=0)
+    key = str(uuid.uuid4())
+    caches[cache].set("unrelated", 1)
+    assert storage.incr(key, 60) == 1
+    assert other.get(key) == 1
+
+    storage.reset()
+    assert storage.get(key) == 0
+    # other processes use the new generation once their cached generation expires
+    assert other.get(key) == 0
+    assert other.incr(key, 60) == 1
+    assert storage.get(key) == 1
+    # keys outside of the storage are not affected
+    assert caches[cache].get("unrelated") == 1
+
+
+def test_async_storage_reset():
+    async def run():
+        storage = AsyncCacheStorage("locmem", generation_ttl=0)
+        key = str(uuid.uuid4())
+        assert await storage.incr(key, 60) == 1
+        await storage.reset()
+        assert await storage.get(key) == 0
+        # counters are shared with sync storage of the same generation
+        assert CacheStorage("locmem").get(key) == 0
+
+    asyncio.run(run())
+
+
+def test_async_storage_reads_generation_first():
+    async def run():
+        key = str(uuid.uuid4())
+        storage = AsyncCacheStorage("locmem")
+        assert await storage.incr(key, 60) == 1
+        await storage.reset()
+        # the generation is read before the first call of a new storage
+        other = AsyncCacheStorage("locmem")
+        assert await other.get(key) == 0
+        assert await other.incr(key, 60) == 1
+        assert await storage.get(key) == 1
+
+    asyncio.run(run())
+
+
+def test_storage_round_trips():
+    storage = CacheStorage("locmem")
+    storage.cache = counter = CallCounter(storage.cache)
+    key = str(uuid.uuid4())
+
+    # new window: incr miss + add
+    assert storage.incr(key, 60) == 1
+    assert counter.calls == ["incr", "add"]
+
+    # existing window: single incr
+    for i in range(2, 5):
+        counter.calls.clear()
+        assert storage.incr(key, 60) == i
+        assert counter.calls == ["incr"]
+
+    counter.calls.clear()
+    assert storage.get(key) == 4
+    assert storage.get_expiry(key) >= time.time()
+    assert counter.calls == ["get", "get"]
+
+
+def test_storage_elastic_expiry_round_trips():
+    key = str(uuid.uuid4())
+    with freezegun.freeze_time("2024-01-01 00:00:15") as frozen:
+        storage = CacheStorage("locmem", generation_ttl=3600)
+        storage.cache = counter = CallCounter(storage.cache)
+
+        # new window already has the elastic expiry
+        assert storage.incr(key, 60, elastic_expiry=True) == 1
+        assert counter.calls == ["incr", "add"]
+
+        # expiry was moved in the same second
+        counter.calls.clear()
+        assert storage.incr(key, 60, elastic_expiry=True) == 2
+        assert counter.calls == ["incr"]
+
+        frozen.tick(30)
+        counter.calls.clear()
+        assert storage.incr(key, 60, elastic_expiry=True) == 3
+        assert counter.calls == ["incr", "incr", "touch"]
+        assert storage.get_expiry(key) == time.time() + 60
+
+
+def test_redis_storage_elastic_expiry_round_trips():
+    storage = CacheStorage("redis")
+    storage.cache = counter = CallCounter(storage.cache)
+    key = str(uuid.uuid4())
+
+    # expiry is moved in the same round trip as the increment
+    assert storage.incr(key, 60, elastic_expiry=True) == 1
+    time.sleep(1)
+    assert storage.incr(key, 60, elastic_expiry=True) == 2
+    assert "incr" not in counter.calls
+    assert "touch" not in counter.calls
+    assert storage.get_expiry(key) >= time.time() + 59
+
+
+def test_redis_storage_round_trips():
+    storage = CacheStorage("redis")
+    storage.cache = counter = CallCounter(storage.cache)
+    key = str(uuid.uuid4())
+
+    # counter is created and incremented without cache incr/add round trips
+    for i in range(1, 4):
+        assert storage.incr(key, 60) == i
+    assert "incr" not in counter.calls
+    assert "add" not in counter.calls
+    assert storage.get(key) == 3
+    assert storage.get_expiry(key) >= time.time()
+
+
+def test_async_redis_storage_round_trips():
+    async def run():
+        storage = AsyncCacheStorage("redis")
+        await storage.current_cache()
+        storage.cache = counter = CallCounter(storage.cache)
+        key = str(uuid.uuid4())
+
+        # counters are incremented by the redis.asyncio client, not the cache API
+        for i in range(1, 4):
+            assert await storage.incr(key, 60, elastic_expiry=i > 1) == i
+        assert await storage.get_expiry(key) >= time.time() + 59
+        assert await storage.acquire_gcra_entry(f"{key}/gcra", 1, 60)
+        assert not await storage.acquire_gcra_entry(f"{key}/gcra", 1, 60)
+        assert not {"aincr", "aadd", "atouch"} & set(counter.calls)
+        assert await storage.get(key) == 3
+
+    asyncio.run(run())
+
+
+def test_async_redis_client():
+    storage = AsyncCacheStorage("redis")
+
+    async def client():
+        assert storage.redis_client() is storage.redis_client()
+        return storage.redis_client()
+
+    first = asyncio.run(client())
+    assert first.connection_pool.connection_kwargs["port"] == 6379
+    # connections of a client are bound to the event loop which created them
+    assert asyncio.run(client()) is not first
+
+
+@pytest.mark.parametrize("cache", ["locmem", "memcached", "redis"])
+def test_storage_sliding_window(cache):
+    key = str(uuid.uuid4())
+    storage = CacheStorage(cache)
+    with freezegun.freeze_time("2024-01-01 00:00:15") as frozen:
+        assert storage.get_sliding_window(key, 60) == (0, 45, 0, 105)
+        assert storage.acquire_sliding_window_entry(key, 4, 60, amount=3)
+        assert not storage.acquire_sliding_window_entry(key, 4, 60, amount=2)
+        assert storage.get_sliding_window(key, 60) == (0, 45, 3, 105)
+
+        frozen.tick(60)
+        # 3 * 45 / 60 + 0 = 2.25
+        assert storage.get_sliding_window(key, 60) == (3, 45, 0, 105)
+        assert storage.acquire_sliding_window_entry(key, 4, 60)
+        assert storage.acquire_sliding_window_entry(key, 4, 60)
+        assert not storage.acquire_sliding_window_entry(key, 4, 60)
+
+        storage.clear_sliding_window(key, 60)
+        assert storage.get_sliding_window(key, 60) == (0, 45, 0, 105)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("cache", ["locmem", "memcached", "redis", "filebased", "db"])
+def test_storage_gcra(cache):
+    key = str(uuid.uuid4())
+    storage = CacheStorage(cache)
+    with freezegun.freeze_time("2024-01-01 00:00:00") as frozen:
+        assert storage.get_gcra(key) == 0
+        # bursts up to the limit
+        for _ in range(4):
+            assert storage.acquire_gcra_entry(key, 4, 60)
+        assert not storage.acquire_gcra_entry(key, 4, 60)
+        assert storage.get_gcra(key) == time.time() + 60
+
+        # one hit every 15 seconds
+        frozen.tick(15)
+        assert storage.acquire_gcra_entry(key, 4, 60)
+        assert not storage.acquire_gcra_entry(key, 4, 60)
+
+        frozen.tick(120)
+        assert not storage.acquire_gcra_entry(key, 4, 60, amount=5)
+        assert storage.acquire_gcra_entry(key, 4, 60, amount=4)
+        assert storage.get_gcra(key) == time.time() + 60
+
+
+@pytest.mark.parametrize("cache", ["locmem", "memcached", "redis"])
+def test_storage_incr_many(cache):
+    keys = [str(uuid.uuid4()), str(uuid.uuid4())]
+    storage = CacheStorage(cache)
+    counters = storage.incr_many([(keys[0], 10), (keys[1], 60)], amount=2)
+    assert [count for count, _ in counters] == [2, 2]
+    assert [expires for _, expires in counters] == [
+        storage.get_expiry(keys[0]),
+        storage.get_expiry(keys[1]),
+    ]
+    assert [count for count, _ in storage.incr_many([(key, 60) for key in keys])] == [
+        3,
+        3,
+    ]
+
+    storage.decr_many([*keys, str(uuid.uuid4())])
+    assert [storage.get(key) for key in keys] == [2, 2]
+
+
+class FlakyStorage(MemoryStorage):
+    down = False
+
+    def incr(self, *args, **kwargs):
+        if self.down:
+            raise ConnectionError
+        return super().incr(*args, **kwargs)
+
+    def check(self):
+        return not self.down
+
+
+def test_circuit_breaker_storage():
+    primary = FlakyStorage()
+    storage = CircuitBreakerStorage(primary, failures=2, probe_interval=0.01)
+    rate_limiter = get_rate_limiter("fixed-window", storage)
+    item = parse("2/minute")
+    assert rate_limiter.hit(item, "key")
+
+    primary.down = True
+    # failed calls are handled by in-memory fallback
+    assert rate_limiter.hit(item, "key")
+    assert not storage.circuit_breaker.is_open
+    assert rate_limiter.hit(item, "key")
+    assert storage.circuit_breaker.is_open
+    assert not rate_limiter.hit(item, "key")
+    assert primary.get(item.key_for("key")) == 1
+
+    primary.down = False
+    for _ in range(100):
+        if not storage.circuit_breaker.is_open:
+            break
+        time.sleep(0.01)
+    assert not storage.circuit_breaker.is_open
+    assert rate_limiter.hit(item, "key")
+    assert primary.get(item.key_for("key")) == 2
+
+
+@pytest.mark.parametrize("fallback,allowed", [("allow", True), ("deny", False)])
+def test_circuit_breaker_storage_fallback(fallback, allowed):
+    primary = FlakyStorage()
+    primary.down = True
+    storage = CircuitBreakerStorage(primary, fallback=fallback, failures=1)
+    for strategy in ("fixed-window", "moving-window"):
+        rate_limiter = get_rate_limiter(strategy, storage)
+        assert rate_limiter.hit(parse("1/minute"), "key") is allowed
+    assert storage.circuit_breaker.is_open
+    assert not storage.check()
+    with pytest.raises(AttributeError):
+        storage.get_sliding_window
+
+
+class FlakyCacheStorage(CacheStorage):
+    def acquire_gcra_entry(self, *args, **kwargs):
+        raise ConnectionError
+
+    def get_gcra(self, *args, **kwargs):
+        raise ConnectionError
+
+    def check(self):
+        return False
+
+
+@pytest.mark.parametrize(
+    "fallback,allowed", [("memory", True), ("allow", True), ("deny", False)]
+)
+def test_circuit_breaker_storage_gcra(fallback, allowed):
+    storage = CircuitBreakerStorage(
+        FlakyCacheStorage("locmem"), fallback=fallback, failures=1, probe_interval=60
+    )
+    rate_limiter = get_rate_limiter("gcra", storage)
+    item = parse("1/minute")
+    assert rate_limiter.hit(item, "key") is allowed
+    assert storage.circuit_breaker.is_open
+    assert rate_limiter.hit(item, "key") is allowed
+    stats = rate_limiter.get_window_stats(item, "key")
+    assert stats.remaining == (1 if allowed else 0)
+    assert rate_limiter.test(item, "key") is allowed
+
+
+def test_circuit_breaker_storage_timeout():
+    primary = MemoryStorage()
+    storage = CircuitBreakerStorage(primary, fallback="deny", failures=1, timeout=0)
+    rate_limiter = get_rate_limiter("fixed-window", storage)
+    # slow call result is used, but it opens the circuit
+    assert rate_limiter.hit(parse("1/minute"), "key")
+    assert storage.circuit_breaker.is_open
+    assert not rate_limiter.hit(parse("1/minute"), "other")
+
+
+def test_async_circuit_breaker_storage():
+    class AsyncFlakyStorage(AsyncMemoryStorage):
+        async def incr(self, *args, **kwargs):
+            raise ConnectionError
+
+        async def check(self):
+            return False
+
+    async def run():
+        storage = AsyncCircuitBreakerStorage(
+            AsyncFlakyStorage(), failures=1, probe_interval=60
+        )
+        rate_limiter = get_async_rate_limiter("fixed-window", storage)
+        assert await rate_limiter.hit(parse("1/minute"), "key")
+        assert storage.circuit_breaker.is_open
+        assert not await rate_limiter.hit(parse("1/minute"), "key")
+        storage.probe_task.cancel()
+
+    asyncio.run(run())
+
+
+def test_async_circuit_breaker_storage_timeout():
+    class AsyncSlowStorage(AsyncMemoryStorage):
+        async def incr(self, *args, **kwargs):
+            await asyncio.sleep(1)
+            return await super().incr(*args, **kwargs)
+
+    async def run():
+        storage = AsyncCircuitBreakerStorage(
+            AsyncSlowStorage(), fallback="deny", failures=1, timeout=0.01
+        )
+        rate_limiter = get_async_rate_limiter("fixed-window", storage)
+        started = time.monotonic()
+        # slow call is cancelled and handled by the fallback
+        assert not await rate_limiter.hit(parse("1/minute"), "key")
+        assert time.monotonic() - started < 1
+        assert storage.circuit_breaker.is_open
+        storage.probe_task.cancel()
+
+    asyncio.run(run())
+
+
+def test_shared_memory_storage(tmp_path):
+    storage = SharedMemoryStorage(str(tmp_path / "ratelimiter"), capacity=16, ways=2)
+    assert storage.get("key") == 0
+    assert storage.get_expiry("key") <= time.time()
+
+    assert storage.incr("key", 3) == 1
+    initial_expiry = storage.get_expiry("key")
+    assert storage.incr("key", 5, amount=2) == 3
+    assert storage.get_expiry("key") == initial_expiry
+    assert storage.incr("key", 4, elastic_expiry=True) == 4
+    assert storage.get_expiry("key") != initial_expiry
+
+    # counters are shared with other instances of the file
+    other = SharedMemoryStorage(str(tmp_path / "ratelimiter"), capacity=16, ways=2)
+    assert other.get("key") == 4
+    storage.clear("key")
+    assert other.get("key") == 0
+
+    assert storage.incr("auto-remove", -1) == 1
+    assert storage.get("auto-remove") == 0
+
+    # the slot expiring first is evicted when the bucket is full
+    for key in range(32):
+        storage.incr(str(key), 60 + key)
+    stored = sum(storage.get(str(key)) for key in range(32))
+    assert stored <= 16
+    assert storage.get("31") == 1
+    assert storage.reset() == stored
+
+    with pytest.raises(ValueError):
+        SharedMemoryStorage(str(tmp_path / "ratelimiter"), capacity=32)
+
+
+def test_shared_memory_storage_processes(tmp_path):
+    storage = SharedMemoryStorage(str(tmp_path / "ratelimiter"))
+    rate_limiter = get_rate_limiter("fixed-window", storage)
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(
+            target=lambda: [
+                rate_limiter.hit(parse("1000/minute"), "key") for _ in range(200)
+            ]
+        )
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert rate_limiter.get_window_stats(parse("1000/minute"), "key").remaining == 200
+
+
+def try_lock_stripe(path, offset):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+    except OSError:
+        sys.exit(1)
+
+
+def test_shared_memory_storage_instances(tmp_path):
+    path = str(tmp_path / "ratelimiter")
+    storage = SharedMemoryStorage(path)
+    # async storage of the same file, as in the recommended settings
+    other = AsyncSharedMemoryStorage(path).storage
+    entered = threading.Event()
+
+    def enter():
+        with other._locked(0):
+            entered.set()
+
+    with storage._locked(0):
+        thread = threading.Thread(target=enter)
+        thread.start()
+        # the stripe is locked for other storages of the file in the process
+        assert not entered.wait(0.2)
+        # and for other processes
+        process = multiprocessing.get_context("fork").Process(
+            target=try_lock_stripe, args=(path, storage.size)
+        )
+        process.start()
+        process.join()
+        assert process.exitcode == 1
+    thread.join()
+    assert entered.is_set()
+    # lock of the other storage is released too
+    process = multiprocessing.get_context("fork").Process(
+        target=try_lock_stripe, args=(path, storage.size)
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+def test_async_shared_memory_storage(tmp_path):
+    async def run():
+        storage = AsyncSharedMemoryStorage(str(tmp_path / "ratelimiter"))
+        rate_limiter = get_async_rate_limiter("fixed-window", storage)
+        assert await rate_limiter.hit(parse("1/minute"), "key")
+        assert not await rate_limiter.hit(parse("1/minute"), "key")
+
+    asyncio.run(run())
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("upsert", [True, False])
+def test_database_storage(upsert):
+    storage = DatabaseStorage()
+    if not upsert:
+        # databases without INSERT ... ON CONFLICT lock the row
+        storage.statements = {False: "", True: ""}
+    with freezegun.freeze_time("2024-01-01 00:00:00") as frozen:
+        assert storage.get("key") == 0
+        assert storage.get_expiry("key") == time.time()
+
+        assert storage.incr("key", 3) == 1
+        assert storage.incr("key", 5, amount=2) == 3
+        assert storage.get_expiry("key") == time.time() + 3
+        frozen.tick(1)
+        assert storage.incr("key", 4, elastic_expiry=True) == 4
+        assert storage.get_expiry("key") == time.time() + 4
+        assert storage.get_many(["key", "other"]) == [4, 0]
+
+        long_key = "key" * 100
+        assert storage.incr(long_key, 1) == 1
+        assert storage.get(long_key) == 1
+
+        # expired counters are restarted
+        frozen.tick(5)
+        assert storage.get("key") == 0
+        assert storage.incr("key", 3) == 1
+
+        storage.clear("key")
+        assert storage.get("key") == 0
+        assert storage.clear_expired(batch_size=1) == 1
+
+    storage.incr("expired", -1)
+    call_command("ratelimiter_clear_expired")
+    assert storage.reset() == 0
+
+
+@pytest.mark.django_db
+def test_database_storage_concurrent_insert(monkeypatch):
+    storage = DatabaseStorage()
+    storage.statements = {False: "", True: ""}
+    first = QuerySet.first
+
+    def concurrent_first(queryset):
+        # another request inserts the counter after the row was looked up
+        monkeypatch.setattr(QuerySet, "first", first)
+        storage.model.objects.create(
+            key=database_key("key"), count=1, expires=time.time() + 60
+        )
+        return None
+
+    monkeypatch.setattr(QuerySet, "first", concurrent_first)
+    assert storage.incr("key", 60) == 2
+    assert storage.get("key") == 2
+
+
+def test_database_storage_in_settings(tmp_path):
+    # storage is created before apps are loaded
+    (tmp_path / "database_settings.py").write_text(
+        "from test_app.settings import *\n"
+        "from django_ratelimiter import AsyncDatabaseStorage, DatabaseStorage\n"
+        "DJANGO_RATELIMITER_STORAGE = DatabaseStorage()\n"
+        "DJANGO_RATELIMITER_ASYNC_STORAGE = AsyncDatabaseStorage()\n"
+    )
+    code = (
+        "import django; django.setup()\n"
+        "from django_ratelimiter.utils import get_storage\n"
+        "print(get_storage().model.__name__)"
+    )
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "database_settings",
+        "PYTHONPATH": os.pathsep.join([str(tmp_path), os.getcwd()]),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "RateLimitCounter"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_database_storage():
+    async def run():
+        storage = AsyncDatabaseStorage()
+        rate_limiter = get_async_rate_limiter("fixed-window", storage)
+        assert await rate_limiter.hit(parse("1/minute"), "key")
+        assert not await rate_limiter.hit(parse("1/minute"), "key")
+        assert await storage.reset() == 1
+
+    asyncio.run(run())
+
+
+def test_hash_ring():
+    keys = [f"key-{i}" for i in range(10000)]
+    ring = HashRing(["a", "b", "c"])
+    nodes = [ring.node_for(key) for key in keys]
+    for node in range(3):
+        assert 0.25 < nodes.count(node) / len(keys) < 0.42
+
+    # a new node only takes keys from other nodes
+    grown = HashRing(["a", "b", "c", "d"])
+    moved = [key for key, node in zip(keys, nodes) if grown.node_for(key) != node]
+    assert all(grown.node_for(key) == 3 for key in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+
+
+def test_sharded_storage():
+    storage = ShardedCacheStorage(["shard-1", "shard-2"])
+    storage.reset()
+    item = parse("1/minute")
+    rate_limiter = get_rate_limiter("fixed-window", storage)
+    for user in range(20):
+        assert rate_limiter.hit(item, str(user))
+        assert not rate_limiter.hit(item, str(user))
+
+    # each key is stored only in one of the caches
+    owners = set()
+    for user in range(20):
+        key = item.key_for(str(user))
+        owner = storage.shards.index(storage.shard_for(key))
+        assert storage.shards[owner].get(key) > 0
+        assert storage.shards[1 - owner].get(key) == 0
+        owners.add(owner)
+    assert owners == {0, 1}
+
+    entries = [(f"key-{i}", 60) for i in range(10)]
+    assert [count for count, _ in storage.incr_many(entries, 2)] == [2] * 10
+    storage.decr_many([key for key, _ in entries[:5]])
+    assert storage.get_many([key for key, _ in entries]) == [1] * 5 + [2] * 5
+
+    for strategy in ("sliding-window-counter", "gcra"):
+        rate_limiter = get_rate_limiter(strategy, storage)
+        assert rate_limiter.hit(item, "key")
+        assert not rate_limiter.hit(item, "key")
+
+    lease = storage.acquire_semaphore("semaphore", 1, 10)
+    assert lease is not None
+    assert storage.acquire_semaphore("semaphore", 1, 10) is None
+    storage.release_semaphore(*lease)
+    assert storage.acquire_semaphore("semaphore", 1, 10) is not None
+
+
+def test_async_sharded_storage():
+    async def run():
+        storage = AsyncShardedCacheStorage(["shard-1", "shard-2"])
+        await storage.reset()
+        rate_limiter = get_async_rate_limiter("fixed-window", storage)
+        for user in range(10):
+            assert await rate_limiter.hit(parse("1/minute"), str(user))
+            assert not await rate_limiter.hit(parse("1/minute"), str(user))
+        entries = [(f"key-{i}", 60) for i in range(10)]
+        assert [count for count, _ in await storage.incr_many(entries)] == [1] * 10
+        assert await storage.get_many([key for key, _ in entries]) == [1] * 10
+
+    asyncio.run(run())
+
+
+def test_sharded_storage_setting(settings):
+    settings.DJANGO_RATELIMITER_CACHE = ["shard-1", "shard-2"]
+    get_storage.cache_clear()
+    try:
+        assert isinstance(get_storage(), ShardedCacheStorage)
+    finally:
+        get_storage.cache_clear()
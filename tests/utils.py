@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import Any, Optional
 
-from django.test import Client
+from django.test import AsyncClient, Client
 
 
 def wait_for_rate_limit(
@@ -21,3 +21,42 @@ def wait_for_rate_limit(
             raise Exception(f"{response.status_code}: {response.content}")
         count += 1
     return count
+
+
+async def async_wait_for_rate_limit(
+    url: str,
+    method: str = "GET",
+    client: Optional[AsyncClient] = None,
+    status: int = 429,
+    ok_status: int = 200,
+) -> int:
+    client = client or AsyncClient()
+    count = 0
+    func = getattr(client, method.lower())
+    while True:
+        response = await func(url)
+        if response.status_code == status:
+            break
+        elif response.status_code != ok_status:
+            raise Exception(f"{response.status_code}: {response.content}")
+        count += 1
+    return count
+
+
+class CallCounter:
+    """Proxy that records method calls made to the wrapped object."""
+
+    def __init__(self, obj: Any) -> None:
+        self.obj = obj
+        self.calls: list[str] = []
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.obj, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args: Any, **kwargs: Any) -> Any:
+            self.calls.append(name)
+            return attr(*args, **kwargs)
+
+        return counted